@@ -0,0 +1,90 @@
+"""
+asyncio serving entry point, with the same routes and SSE events as main.py.
+
+Requests wait on the OpenAI and qdrant APIs without holding a thread or greenlet,
+so one worker process can serve many concurrent questions. Run with:
+    gunicorn asgi_main:app --worker-class uvicorn.workers.UvicornWorker --timeout 600
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.templating import Jinja2Templates
+from data_api.embeddings.vector_db.vector_store import SearchFilter
+from data_api.utils.metrics import Metrics, start_request
+from qa_bot.qa_bot import QABot
+from qa_bot.sse_events import (
+    chunk_event,
+    db_matches_event,
+    i_dont_know_event,
+    SSE_MIMETYPE,
+    SSEWriter,
+)
+
+# Resolved next to this file, so the server can start from any directory
+templates = Jinja2Templates(
+    directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+)
+
+podcast_gpt = QABot()
+Metrics.set_counters(podcast_gpt.counters)
+
+sse_writer = SSEWriter.from_env()
+
+
+async def home(request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def generate_response(user_text: str, search_filter: Optional[SearchFilter]):
+    request_metrics = start_request()
+    completed = False
+    try:
+        db_matches, response = await podcast_gpt.answer_question_async(
+            user_text, search_filter
+        )
+
+        yield i_dont_know_event(podcast_gpt.I_DONT_KNOW)
+
+        request_metrics.stream_started()
+        async for content in sse_writer.coalesce_async(response):
+            request_metrics.record_chunk(content)
+            yield chunk_event(content)
+
+        yield db_matches_event(db_matches)
+        completed = True
+    finally:
+        request_metrics.finish(completed)
+
+
+async def get_bot_response(request):
+    user_text = request.query_params.get("msg")
+
+    try:
+        search_filter = SearchFilter.from_params(request.query_params)
+    except ValueError as e:
+        return PlainTextResponse("Invalid filter: {}".format(e), status_code=400)
+
+    return StreamingResponse(
+        generate_response(user_text, search_filter), media_type=SSE_MIMETYPE
+    )
+
+
+async def metrics(request):
+    # Rendering reads every worker's metrics file
+    return PlainTextResponse(
+        await asyncio.to_thread(Metrics.render), media_type=Metrics.CONTENT_TYPE
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/", home),
+        Route("/get", get_bot_response),
+        Route("/metrics", metrics),
+    ]
+)
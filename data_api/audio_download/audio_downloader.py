@@ -2,7 +2,7 @@
 import abc
 from dataclasses import dataclass
 import json
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 # Third Party Imports
 from openai import OpenAI
@@ -19,12 +19,19 @@ from data_api.utils.file_utils import (
 from data_api.utils.gcs_utils import GCSClient
 from data_api.utils.parallel_utils import ParallelProcessExecutor
 from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import (
+    Artifact,
+    PipelineManifest,
+    Stage,
+    Status,
+)
 
 
 class MetadataKeys:
     CHAPTERS_KEY = "chapters"
     GUEST_KEY = "guest"
     URL_KEY = "url"
+    PUBLISHED_DATE_KEY = "published_date"
 
 
 @dataclass
@@ -48,11 +55,15 @@ class EpisodeMetadata:
     # Podcast guest
     podcast_guest: Optional[str]
 
+    # The date the episode was published, formatted as "YYYY-MM-DD"
+    published_date: Optional[str]
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             MetadataKeys.GUEST_KEY: self.podcast_guest,
             MetadataKeys.URL_KEY: self.url,
             MetadataKeys.CHAPTERS_KEY: self.chapters,
+            MetadataKeys.PUBLISHED_DATE_KEY: self.published_date,
         }
 
 
@@ -62,9 +73,15 @@ class AudioDownloader(metaclass=abc.ABCMeta):
     openai_client = OpenAI()
     model_version = "gpt-4-0125-preview"
 
-    def __init__(self, name: str, config: Union[YoutubeFeedConfig, RSSFeedConfig]):
+    def __init__(
+        self,
+        name: str,
+        config: Union[YoutubeFeedConfig, RSSFeedConfig],
+        manifest: PipelineManifest,
+    ):
         self.name = name
         self.config = config
+        self.manifest = manifest
         self.audio_folder = Paths.get_audio_data_folder(name)
 
     @abc.abstractmethod
@@ -75,6 +92,15 @@ class AudioDownloader(metaclass=abc.ABCMeta):
     def find_audios_to_download(self) -> List[EpisodeMetadata]:
         pass
 
+    @abc.abstractmethod
+    def list_published_dates(self) -> Dict[str, str]:
+        """
+        returns:
+                The publication date ("YYYY-MM-DD") of every episode in the feed,
+                by episode title
+        """
+        pass
+
     @classmethod
     def extract_guest(cls, title: str) -> Optional[str]:
         """
@@ -149,17 +175,65 @@ class AudioDownloader(metaclass=abc.ABCMeta):
 
         return files_to_download
 
+    def downloaded_titles(self) -> Set[str]:
+        """The titles of the episodes whose audio and metadata are both on GCS"""
+        return set(self.manifest.titles(Stage.DOWNLOAD, Status.DONE))
+
+    def backfill_published_dates(self) -> None:
+        """
+        Adds the publication date to metadata files written before dates were
+        recorded. Episodes no longer in the feed are left without a date.
+        """
+        # The title and publication date of each feed episode, by metadata file
+        published_dates = {
+            Paths.get_metadata_file_path(self.name, title): (title, published_date)
+            for title, published_date in self.list_published_dates().items()
+        }
+        num_updated = 0
+        metadata_files = GCSClient.list_files(self.audio_folder, Paths.JSON_EXT)
+        for metadata_file, metadata_text in zip(
+            metadata_files, GCSClient.read_texts(metadata_files)
+        ):
+            metadata = json.loads(metadata_text)
+            if metadata.get(MetadataKeys.PUBLISHED_DATE_KEY) is not None:
+                continue
+
+            if metadata_file not in published_dates:
+                print("No publication date found for: {}".format(metadata_file))
+                continue
+
+            title, published_date = published_dates[metadata_file]
+            metadata[MetadataKeys.PUBLISHED_DATE_KEY] = published_date
+            self.manifest.record(
+                title,
+                Artifact.METADATA,
+                GCSClient.upload_string_as_textfile(
+                    metadata_file, json.dumps(metadata)
+                ),
+            )
+            num_updated += 1
+
+        print("Added publication dates to {} metadata files".format(num_updated))
+
     def upload_metadata_to_gcs(self, episode_metadata: EpisodeMetadata) -> None:
-        GCSClient.upload_string_as_textfile(
-            Paths.get_metadata_file_path(self.name, episode_metadata.title),
-            json.dumps(episode_metadata.to_dict()),
+        self.manifest.record(
+            episode_metadata.title,
+            Artifact.METADATA,
+            GCSClient.upload_string_as_textfile(
+                Paths.get_metadata_file_path(self.name, episode_metadata.title),
+                json.dumps(episode_metadata.to_dict()),
+            ),
         )
 
     def upload_audio_to_gcs(self, episode_metadata: EpisodeMetadata) -> None:
-        GCSClient.upload_file(
-            Paths.get_audio_path(
-                self.name,
-                episode_metadata.title,
-                self.config.audio_extension,
-            )
+        self.manifest.record(
+            episode_metadata.title,
+            Artifact.AUDIO,
+            GCSClient.upload_file(
+                Paths.get_audio_path(
+                    self.name,
+                    episode_metadata.title,
+                    self.config.audio_extension,
+                )
+            ),
         )
@@ -11,14 +11,17 @@ from data_api.audio_download.rss.rss_audio_downloader import RSSAudioDownloader
 from data_api.audio_download.youtube.youtube_audio_downloader import (
     YoutubeAudioDownloader,
 )
+from data_api.utils.pipeline_manifest import PipelineManifest
 
 
 def DownloaderFactory(
-    name: str, config: Union[YoutubeFeedConfig, RSSFeedConfig]
+    name: str,
+    config: Union[YoutubeFeedConfig, RSSFeedConfig],
+    manifest: PipelineManifest,
 ) -> AudioDownloader:
     if type(config) == YoutubeFeedConfig:
-        return YoutubeAudioDownloader(name, config)
+        return YoutubeAudioDownloader(name, config, manifest)
     elif type(config) == RSSFeedConfig:
-        return RSSAudioDownloader(name, config)
+        return RSSAudioDownloader(name, config, manifest)
     else:
         raise ValueError("Unknown config type!")
@@ -0,0 +1,20 @@
+# Package Imports
+from podcasts import PODCASTS
+
+"""
+Adds publication dates to the metadata of episodes that were downloaded before
+dates were recorded. Run DBUpdate.generate_and_store_embeddings afterwards to
+copy the dates into the vector database, so the episodes can be filtered by date.
+"""
+
+
+def main():
+    for podcast in PODCASTS:
+        print("Backfilling publication dates for: {}".format(podcast.name))
+        podcast.manifest.load(podcast.feed_config.audio_extension)
+        podcast.audio_downloader.backfill_published_dates()
+        podcast.manifest.upload_to_gcs()
+
+
+if __name__ == "__main__":
+    main()
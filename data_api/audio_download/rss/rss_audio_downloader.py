@@ -1,7 +1,7 @@
 # System Imports
 import os
-import requests
-from typing import List
+import time
+from typing import Dict, List, Optional
 
 # Third Party Imports
 import feedparser
@@ -13,14 +13,21 @@ from data_api.audio_download.audio_downloader import (
     EpisodeMetadata,
 )
 from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.http_utils import HTTPStream
 from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact
+
+
+def get_published_date(entry) -> Optional[str]:
+    # feedparser parses the entry's pubDate into a UTC struct_time
+    published = entry.get("published_parsed")
+    return time.strftime("%Y-%m-%d", published) if published else None
 
 
 class RSSAudioDownloader(AudioDownloader):
 
     def download_audio_to_gcs(self, episode_metadata: EpisodeMetadata) -> None:
-        metadata_path = Paths.get_metadata_file_path(self.name, episode_metadata.title)
-        if not GCSClient.file_exists(metadata_path):
+        if self.manifest.artifact(episode_metadata.title, Artifact.METADATA) is None:
             self.upload_metadata_to_gcs(episode_metadata)
 
         audio_path = Paths.get_audio_path(
@@ -28,16 +35,18 @@ class RSSAudioDownloader(AudioDownloader):
         )
         file = os.path.basename(audio_path)
 
-        if not GCSClient.file_exists(audio_path):
+        if self.manifest.artifact(episode_metadata.title, Artifact.AUDIO) is None:
             print("Downloading {}".format(file))
+            # Streamed from the feed into GCS, so neither memory nor local disk
+            # holds more than a chunk of the episode
             try:
-                r = requests.get(episode_metadata.url)
-                with open(audio_path, "wb") as f:
-                    f.write(r.content)
+                with HTTPStream(episode_metadata.url) as stream:
+                    blob = GCSClient.upload_stream(audio_path, stream)
             except Exception as e:
                 print("Could not download: {}: {}".format(audio_path, e))
+                return
 
-            self.upload_audio_to_gcs(episode_metadata)
+            self.manifest.record(episode_metadata.title, Artifact.AUDIO, blob)
 
     def find_audios_to_download(self) -> List[EpisodeMetadata]:
         files_to_download = []
@@ -45,10 +54,7 @@ class RSSAudioDownloader(AudioDownloader):
         feed = feedparser.parse(self.config.url)
         print("Checking {} RSS entries ... ".format(len(feed.entries)))
 
-        audio_files = set(
-            GCSClient.list_files(self.audio_folder, self.config.audio_extension)
-        )
-        metadata_files = set(GCSClient.list_files(self.audio_folder, Paths.JSON_EXT))
+        downloaded_titles = self.downloaded_titles()
 
         for entry in tqdm(feed.entries):
             for link in entry.links:
@@ -59,14 +65,7 @@ class RSSAudioDownloader(AudioDownloader):
                     if any([f in title for f in self.config.filter_out]):
                         break
 
-                    if (
-                        Paths.get_audio_path(
-                            self.name, title, self.config.audio_extension
-                        )
-                        in audio_files
-                        and Paths.get_metadata_file_path(self.name, title)
-                        in metadata_files
-                    ):
+                    if title in downloaded_titles:
                         continue
 
                     if chapters:
@@ -77,9 +76,20 @@ class RSSAudioDownloader(AudioDownloader):
                                 title=title,
                                 chapters=chapters,
                                 podcast_guest=guest,
+                                published_date=get_published_date(entry),
                             )
                         )
 
                     break
 
         return files_to_download
+
+    def list_published_dates(self) -> Dict[str, str]:
+        feed = feedparser.parse(self.config.url)
+        published_dates = {}
+        for entry in feed.entries:
+            published_date = get_published_date(entry)
+            if published_date is not None:
+                published_dates[entry.title.replace("/", "")] = published_date
+
+        return published_dates
@@ -1,6 +1,6 @@
 # System Imports
 import os
-from typing import List
+from typing import Dict, List
 
 # Third Party Imports
 from pytube import YouTube
@@ -12,16 +12,24 @@ from data_api.audio_download.audio_downloader import (
     EpisodeMetadata,
 )
 from data_api.audio_download.youtube.video_lister import get_all_videos
-from data_api.utils.gcs_utils import GCSClient
 from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact
 
 YOUTUBE_PREFIX = "https://www.youtube.com/watch?v="
 
 
+def get_published_date(item: Dict) -> str:
+    # videoPublishedAt is an RFC 3339 timestamp, eg. "2023-05-01T12:00:01Z".
+    # The snippet's publishedAt is when the video was added to the playlist.
+    published_at = item["contentDetails"].get(
+        "videoPublishedAt", item["snippet"]["publishedAt"]
+    )
+    return published_at[:10]
+
+
 class YoutubeAudioDownloader(AudioDownloader):
     def download_audio_to_gcs(self, episode_metadata: EpisodeMetadata) -> None:
-        metadata_path = Paths.get_metadata_file_path(self.name, episode_metadata.title)
-        if not GCSClient.file_exists(metadata_path):
+        if self.manifest.artifact(episode_metadata.title, Artifact.METADATA) is None:
             self.upload_metadata_to_gcs(episode_metadata)
 
         audio_path = Paths.get_audio_path(
@@ -29,7 +37,7 @@ class YoutubeAudioDownloader(AudioDownloader):
         )
         folder, file = os.path.split(audio_path)
 
-        if not GCSClient.file_exists(audio_path):
+        if self.manifest.artifact(episode_metadata.title, Artifact.AUDIO) is None:
             try:
                 print("Downloading {}".format(file))
                 yt = YouTube(episode_metadata.url + ".")
@@ -53,20 +61,13 @@ class YoutubeAudioDownloader(AudioDownloader):
     def find_audios_to_download(self) -> List[EpisodeMetadata]:
         videos = get_all_videos(self.config.channel_id)
 
-        audio_files = set(
-            GCSClient.list_files(self.audio_folder, self.config.audio_extension)
-        )
-        metadata_files = set(GCSClient.list_files(self.audio_folder, Paths.JSON_EXT))
+        downloaded_titles = self.downloaded_titles()
 
         files_to_download = []
         for item in tqdm(videos):
             title = item["snippet"]["title"].replace("/", "")
 
-            if (
-                Paths.get_audio_path(self.name, title, self.config.audio_extension)
-                in audio_files
-                and Paths.get_metadata_file_path(self.name, title) in metadata_files
-            ):
+            if title in downloaded_titles:
                 continue
 
             chapters = self.config.chapter_extractor(item["snippet"]["description"])
@@ -84,7 +85,14 @@ class YoutubeAudioDownloader(AudioDownloader):
                         title=title,
                         chapters=chapters,
                         podcast_guest=guest,
+                        published_date=get_published_date(item),
                     )
                 )
 
         return files_to_download
+
+    def list_published_dates(self) -> Dict[str, str]:
+        return {
+            item["snippet"]["title"].replace("/", ""): get_published_date(item)
+            for item in get_all_videos(self.config.channel_id)
+        }
@@ -0,0 +1,289 @@
+# System Imports
+from dataclasses import asdict, dataclass
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Third Party Imports
+import tiktoken
+
+# Package Imports
+from data_api.audio_download.audio_downloader import MetadataKeys
+from data_api.chapterizer.transcript_chapterizer import (
+    construct_chapter_text,
+    count_num_speakers,
+    determine_chapter_word_ranges,
+    determine_sentence_boundaries,
+    determine_speaker_change_boundaries,
+)
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.parallel_utils import batched
+from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact, PipelineManifest, Stage
+
+
+@dataclass
+class Passage:
+    """
+    Encapsulates an overlapping window of a chapter transcript
+    """
+
+    # The title of the chapter the passage belongs to
+    chapter_title: str
+
+    # The position of the passage within its chapter, starting at 0
+    passage_index: int
+
+    # The passage spans words_list[start_word_index : end_word_index] of the
+    # Assembly AI transcript
+    start_word_index: int
+    end_word_index: int
+
+    # Timestamps of the first and last word in milliseconds
+    start_ms: int
+    end_ms: int
+
+    # The number of leading characters of text that repeat the end of the
+    # previous passage in the chapter (0 for the first passage)
+    overlap_characters: int
+
+    # The passage transcript, formatted like a chapter transcript
+    text: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def determine_passage_units(
+    words_list: json, start_index: int, end_index: int
+) -> List[Tuple[int, int]]:
+    """
+    Splits a range of words into the smallest units a passage may start or end on,
+    i.e. the spans between consecutive sentence ends and speaker changes
+
+    returns:
+            A list of (start index, end index) word ranges covering the input range
+    """
+    boundary_indices = set(
+        b.index
+        for b in determine_sentence_boundaries(words_list[start_index:end_index])
+        + determine_speaker_change_boundaries(words_list[start_index:end_index])
+    )
+    edges = sorted(start_index + i for i in boundary_indices) + [end_index]
+
+    return [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+
+def split_long_unit(
+    unit: Tuple[int, int],
+    max_tokens: int,
+    count_range_tokens: Callable[[int, int], int],
+) -> List[Tuple[int, int]]:
+    """
+    Splits a unit that is longer than max_tokens into consecutive word ranges
+    that each fit, e.g. a long monologue without sentence punctuation
+
+    params:
+            count_range_tokens:
+                    Returns the number of tokens in the text of a word range
+    """
+    pieces = []
+    piece_start = unit[0]
+    for index in range(unit[0] + 1, unit[1]):
+        if count_range_tokens(piece_start, index + 1) > max_tokens:
+            pieces.append((piece_start, index))
+            piece_start = index
+
+    pieces.append((piece_start, unit[1]))
+    return pieces
+
+
+def determine_passage_word_ranges(
+    units: List[Tuple[int, int]],
+    unit_tokens: List[int],
+    max_tokens: int,
+    overlap_tokens: int,
+) -> List[Tuple[int, int]]:
+    """
+    Greedily packs consecutive units into windows of at most max_tokens. Each
+    window after the first starts with up to overlap_tokens worth of units from
+    the end of the previous window.
+
+    returns:
+            A list of (start index, end index) word ranges, one per passage
+    """
+    word_ranges = []
+    first = 0
+    while first < len(units):
+        last = first
+        tokens = 0
+        while last < len(units) and (
+            last == first or tokens + unit_tokens[last] <= max_tokens
+        ):
+            tokens += unit_tokens[last]
+            last += 1
+
+        word_ranges.append((units[first][0], units[last - 1][1]))
+        if last == len(units):
+            break
+
+        # Step back into the window for the overlap, but always move forward
+        next_first = last
+        overlap = 0
+        while (
+            next_first - 1 > first
+            and overlap + unit_tokens[next_first - 1] <= overlap_tokens
+        ):
+            next_first -= 1
+            overlap += unit_tokens[next_first]
+
+        first = next_first
+
+    return word_ranges
+
+
+class PassageChunker:
+    """
+    Splits each chapter of a transcript into overlapping passages of a bounded
+    number of tokens, aligned to sentence and speaker boundaries.
+    """
+
+    PASSAGE_MAX_TOKENS = 512
+    PASSAGE_OVERLAP_TOKENS = 64
+
+    def __init__(
+        self, podcast_name: str, podcast_host: str, manifest: PipelineManifest
+    ):
+        self.podcast_name = podcast_name
+        self.podcast_host = podcast_host
+        self.manifest = manifest
+        self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def split_transcript_into_passages(
+        self, assembly_ai_transcript: json, metadata: json
+    ) -> List[Passage]:
+        """
+        Given a transcript and its metadata, returns the passages of every chapter
+
+        params:
+                assembly_ai_transcript:
+                        The raw transcript from assembly AI in json format
+                metadata:
+                        json formated metadata. with the following information:
+                                guest: The name of the podcast guest (or None) if there is no guest
+                                chapters: list of (timestamp, title) pairs describing chapters
+
+        returns:
+                The passages, in chapter order
+        """
+        podcast_guest: Optional[str] = metadata[MetadataKeys.GUEST_KEY]
+        words_list = assembly_ai_transcript["words"]
+        num_speakers = count_num_speakers(words_list)
+
+        def text_for(start_index: int, end_index: int) -> str:
+            return construct_chapter_text(
+                words_list,
+                start_index,
+                end_index,
+                num_speakers,
+                self.podcast_host,
+                podcast_guest,
+            )
+
+        def count_range_tokens(start_index: int, end_index: int) -> int:
+            return self.count_tokens(text_for(start_index, end_index))
+
+        passages = []
+        for chapter_title, start_index, end_index in determine_chapter_word_ranges(
+            words_list, metadata[MetadataKeys.CHAPTERS_KEY], num_speakers
+        ):
+            if start_index >= end_index:
+                continue
+
+            units = []
+            unit_tokens = []
+            for unit in determine_passage_units(words_list, start_index, end_index):
+                tokens = count_range_tokens(*unit)
+                if tokens > self.PASSAGE_MAX_TOKENS:
+                    pieces = split_long_unit(
+                        unit, self.PASSAGE_MAX_TOKENS, count_range_tokens
+                    )
+                    units.extend(pieces)
+                    unit_tokens.extend(count_range_tokens(*p) for p in pieces)
+                else:
+                    units.append(unit)
+                    unit_tokens.append(tokens)
+
+            previous_end = start_index
+            for passage_index, (start, end) in enumerate(
+                determine_passage_word_ranges(
+                    units,
+                    unit_tokens,
+                    self.PASSAGE_MAX_TOKENS,
+                    self.PASSAGE_OVERLAP_TOKENS,
+                )
+            ):
+                passages.append(
+                    Passage(
+                        chapter_title=chapter_title,
+                        passage_index=passage_index,
+                        start_word_index=start,
+                        end_word_index=end,
+                        start_ms=words_list[start]["start"],
+                        end_ms=words_list[end - 1]["end"],
+                        # The text of the overlapping words is a prefix of the text
+                        overlap_characters=(
+                            len(text_for(start, previous_end))
+                            if start < previous_end
+                            else 0
+                        ),
+                        text=text_for(start, end),
+                    )
+                )
+                previous_end = end
+
+        return passages
+
+    def chunk_all_transcripts(self) -> None:
+        """
+        Creates passages for each chapter in each transcript for this podcast
+
+        returns:
+                None
+
+                The passages are saved to gcs, one file per podcast episode, each
+                containing the list of Passage dictionaries for the episode.
+        """
+        print("Running passage chunking for {}".format(self.podcast_name))
+
+        # Episodes with a transcript and metadata, but no passages. Each batch's
+        # files are transferred in parallel.
+        titles = self.manifest.pending(Stage.CHUNK)
+        for batch in batched(titles, GCSClient.transfer_workers()):
+            texts = GCSClient.read_texts(
+                [
+                    path
+                    for title in batch
+                    for path in (
+                        Paths.get_aai_transcript_path(self.podcast_name, title),
+                        Paths.get_metadata_file_path(self.podcast_name, title),
+                    )
+                ]
+            )
+
+            passages_texts = {}
+            for title, transcript_text, metadata_text in zip(
+                batch, texts[0::2], texts[1::2]
+            ):
+                print("Chunking: {}".format(title))
+                passages = self.split_transcript_into_passages(
+                    json.loads(transcript_text), json.loads(metadata_text)
+                )
+                passages_texts[Paths.get_passages_path(self.podcast_name, title)] = (
+                    json.dumps([p.to_dict() for p in passages])
+                )
+
+            for title, blob in zip(batch, GCSClient.upload_texts(passages_texts)):
+                self.manifest.record(title, Artifact.PASSAGES, blob)
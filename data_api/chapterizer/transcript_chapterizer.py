@@ -2,12 +2,14 @@
 from bisect import bisect
 from dataclasses import dataclass
 import json
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 # Package Imports
 from data_api.audio_download.audio_downloader import MetadataKeys
 from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.parallel_utils import batched
 from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact, PipelineManifest, Stage
 
 SENTENCE_END_PUNCTUATIONS = [".", "?", "!"]
 
@@ -228,11 +230,79 @@ def convert_timestamp_string_to_milliseconds(timestamp_string: str) -> int:
     return milliseconds
 
 
+def determine_chapter_word_ranges(
+    words_list: json, chapters: List[Tuple[str, str]], num_speakers: int
+) -> List[Tuple[str, int, int]]:
+    """
+    Determines the range of words that belongs to each chapter of a transcript
+
+    Chapter edges are snapped to the nearest transcript break boundary, so that
+    chapters start and end on sentence or speaker boundaries.
+
+    params:
+            words_list:
+                    The list of words, each element is formatted as follows:
+                    {"text": "something", "start": 10345, "end": 10350, "confidence": 0.99, "speaker": "A"},
+                    where "start" and "end" are in milliseconds
+            chapters:
+                    list of (timestamp, title) pairs describing chapters
+            num_speakers:
+                    The number of speakers in the transcipt
+
+    returns:
+            A list of (chapter title, start index, end index) tuples, where the chapter
+            spans words_list[start index : end index]
+    """
+    transcript_break_boundaries = determine_break_boundaries(words_list, num_speakers)
+
+    word_ranges = []
+    curr_index = 0
+    for index, c in enumerate(chapters):
+        start_time_str = c[0]
+        title = c[1]
+
+        start_time_ms = convert_timestamp_string_to_milliseconds(start_time_str)
+        start_boundary_index = bisect(
+            transcript_break_boundaries,
+            start_time_ms,
+            lo=curr_index,
+            key=lambda elem: elem.timestamp,
+        )
+        start_elem = transcript_break_boundaries[max(0, start_boundary_index - 1)]
+
+        if index < len(chapters) - 1:
+            end_time_ms = convert_timestamp_string_to_milliseconds(
+                chapters[index + 1][0]
+            )
+            end_boundary_index = bisect(
+                transcript_break_boundaries,
+                end_time_ms,
+                lo=start_boundary_index,
+                key=lambda elem: elem.timestamp,
+            )
+        else:
+            end_boundary_index = len(transcript_break_boundaries) - 1
+
+        end_elem = (
+            transcript_break_boundaries[end_boundary_index]
+            if end_boundary_index < len(transcript_break_boundaries)
+            else transcript_break_boundaries[-1]
+        )
+
+        word_ranges.append((title, start_elem.index, end_elem.index))
+        curr_index = end_boundary_index
+
+    return word_ranges
+
+
 class TranscriptChapterizer:
 
-    def __init__(self, podcast_name: str, podcast_host: str):
+    def __init__(
+        self, podcast_name: str, podcast_host: str, manifest: PipelineManifest
+    ):
         self.podcast_name = podcast_name
         self.podcast_host = podcast_host
+        self.manifest = manifest
 
     def _split_transcript_into_chapters(
         self, assembly_ai_transcript: json, metadata: json
@@ -254,58 +324,22 @@ class TranscriptChapterizer:
 
         """
         podcast_guest = metadata[MetadataKeys.GUEST_KEY]
-        chapters = metadata[MetadataKeys.CHAPTERS_KEY]
-        chapter_transcripts = {}
         words_list = assembly_ai_transcript["words"]
         num_speakers = count_num_speakers(words_list)
-        transcript_break_boundaries = determine_break_boundaries(
-            words_list, num_speakers
-        )
-
-        curr_index = 0
-        for index, c in enumerate(chapters):
-            start_time_str = c[0]
-            title = c[1]
-
-            start_time_ms = convert_timestamp_string_to_milliseconds(start_time_str)
-            start_boundary_index = bisect(
-                transcript_break_boundaries,
-                start_time_ms,
-                lo=curr_index,
-                key=lambda elem: elem.timestamp,
-            )
-            start_elem = transcript_break_boundaries[max(0, start_boundary_index - 1)]
 
-            if index < len(chapters) - 1:
-                end_time_ms = convert_timestamp_string_to_milliseconds(
-                    chapters[index + 1][0]
-                )
-                end_boundary_index = bisect(
-                    transcript_break_boundaries,
-                    end_time_ms,
-                    lo=start_boundary_index,
-                    key=lambda elem: elem.timestamp,
-                )
-            else:
-                end_boundary_index = len(transcript_break_boundaries) - 1
-
-            end_elem = (
-                transcript_break_boundaries[end_boundary_index]
-                if end_boundary_index < len(transcript_break_boundaries)
-                else transcript_break_boundaries[-1]
-            )
-
-            chapter_transcripts[title] = construct_chapter_text(
+        return {
+            title: construct_chapter_text(
                 words_list,
-                start_elem.index,
-                end_elem.index,
+                start_index,
+                end_index,
                 num_speakers,
                 self.podcast_host,
                 podcast_guest,
             )
-            curr_index = end_boundary_index
-
-        return chapter_transcripts
+            for title, start_index, end_index in determine_chapter_word_ranges(
+                words_list, metadata[MetadataKeys.CHAPTERS_KEY], num_speakers
+            )
+        }
 
     def chapterize_all_transcripts(self) -> None:
         """
@@ -327,40 +361,34 @@ class TranscriptChapterizer:
         """
         print("Running chapterization for {}".format(self.podcast_name))
 
-        aai_transcripts_folder = Paths.get_aai_transcript_folder(self.podcast_name)
-        aai_transcripts = GCSClient.list_files(aai_transcripts_folder, Paths.JSON_EXT)
-
-        chapterized_data_folder = Paths.get_chapterized_data_folder(self.podcast_name)
-        chapterized_files = set(
-            GCSClient.list_files(chapterized_data_folder, Paths.JSON_EXT)
-        )
-
-        audio_data_folder = Paths.get_audio_data_folder(self.podcast_name)
-        metadata_files = set(
-            GCSClient.list_files(
-                audio_data_folder, Paths.METADATA_SUFFIX + Paths.JSON_EXT
-            )
-        )
-        for aai_transcript in aai_transcripts:
-            title = Paths.get_title_from_path(aai_transcript)
-
-            metadata_file = Paths.get_metadata_file_path(self.podcast_name, title)
-            if metadata_file not in metadata_files:
-                continue
-
-            chapterized_file = Paths.get_chapterized_transcript_path(
-                self.podcast_name, title
+        # Episodes with a transcript and metadata, but no chapterized transcript.
+        # Each batch's files are transferred in parallel.
+        titles = self.manifest.pending(Stage.CHAPTERIZE)
+        for batch in batched(titles, GCSClient.transfer_workers()):
+            texts = GCSClient.read_texts(
+                [
+                    path
+                    for title in batch
+                    for path in (
+                        Paths.get_aai_transcript_path(self.podcast_name, title),
+                        Paths.get_metadata_file_path(self.podcast_name, title),
+                    )
+                ]
             )
-            if chapterized_file in chapterized_files:
-                continue
-
-            print("Chapterizing: {}".format(title))
-            transcript_text = GCSClient.download_textfile_as_string(aai_transcript)
-            metadata_text = GCSClient.download_textfile_as_string(metadata_file)
 
-            chapterized_transcript = self._split_transcript_into_chapters(
-                json.loads(transcript_text), json.loads(metadata_text)
-            )
-            GCSClient.upload_string_as_textfile(
-                chapterized_file, json.dumps(chapterized_transcript)
-            )
+            chapterized_transcripts = {}
+            for title, transcript_text, metadata_text in zip(
+                batch, texts[0::2], texts[1::2]
+            ):
+                print("Chapterizing: {}".format(title))
+                chapterized_transcript = self._split_transcript_into_chapters(
+                    json.loads(transcript_text), json.loads(metadata_text)
+                )
+                chapterized_transcripts[
+                    Paths.get_chapterized_transcript_path(self.podcast_name, title)
+                ] = json.dumps(chapterized_transcript)
+
+            for title, blob in zip(
+                batch, GCSClient.upload_texts(chapterized_transcripts)
+            ):
+                self.manifest.record(title, Artifact.CHAPTERIZED_TRANSCRIPT, blob)
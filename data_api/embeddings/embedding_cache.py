@@ -0,0 +1,150 @@
+# System Imports
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.utils.gcs_utils import GCSClient
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of embeddings.
+
+    Entries are keyed by (model, dimensions, sha256 of the exact input text), so
+    an embedding is reused whenever the same text is embedded with the same
+    model settings, and edited text always gets a fresh embedding.
+
+    The cache is a local SQLite file that can be mirrored to GCS at the same path.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.filepath, check_same_thread=False, timeout=30
+            )
+            # Server workers share the file. With a write-ahead log, readers don't
+            # wait on writers, and a commit appends to the log without an fsync.
+            # Losing the last few embeddings in a crash only costs API calls.
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    dimensions INTEGER NOT NULL,
+                    text_sha256 TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    PRIMARY KEY (model, dimensions, text_sha256)
+                )
+                """
+            )
+            self._connection.commit()
+
+        return self._connection
+
+    def get_many(
+        self, model: str, dimensions: int, texts: List[str]
+    ) -> List[Optional[List[float]]]:
+        """
+        Looks up cached embeddings
+
+        returns:
+                One entry per text: the cached embedding, or None on a miss
+        """
+        hashes = [text_sha256(t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            connection = self._connect()
+            unique_hashes = list(set(hashes))
+            # Stay under SQLite's limit on the number of query parameters
+            for start in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[start : start + 500]
+                rows = connection.execute(
+                    "SELECT text_sha256, embedding FROM embeddings "
+                    "WHERE model = ? AND dimensions = ? AND text_sha256 IN ({})".format(
+                        ",".join("?" * len(chunk))
+                    ),
+                    [model, dimensions] + chunk,
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            results = [found.get(h) for h in hashes]
+            num_hits = sum(r is not None for r in results)
+            self.hits += num_hits
+            self.misses += len(results) - num_hits
+
+        return results
+
+    def put_many(
+        self,
+        model: str,
+        dimensions: int,
+        texts: List[str],
+        embeddings: List[List[float]],
+    ) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        model,
+                        dimensions,
+                        text_sha256(t),
+                        np.asarray(e, dtype=np.float32).tobytes(),
+                    )
+                    for t, e in zip(texts, embeddings)
+                ],
+            )
+            connection.commit()
+
+    def download_from_gcs(self) -> None:
+        """Merges the GCS copy of the cache (if any) into the local cache"""
+        if not GCSClient.file_exists(self.filepath):
+            return
+
+        print("Downloading embedding cache from GCS: {}".format(self.filepath))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            remote_copy = os.path.join(temp_dir, os.path.basename(self.filepath))
+            GCSClient.download_file(self.filepath, local_path=remote_copy)
+            with self._lock:
+                connection = self._connect()
+                connection.execute("ATTACH DATABASE ? AS remote", [remote_copy])
+                connection.execute(
+                    "INSERT OR IGNORE INTO embeddings SELECT * FROM remote.embeddings"
+                )
+                connection.commit()
+                connection.execute("DETACH DATABASE remote")
+
+    def upload_to_gcs(self) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.commit()
+            # Moves committed rows from the write-ahead log into the uploaded file
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            GCSClient.upload_file(self.filepath)
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return "Embedding cache: {} hits, {} misses ({:.1f}% hit rate)".format(
+            self.hits, self.misses, 100 * self.hits / total if total else 0.0
+        )
@@ -1,23 +1,251 @@
 # System Imports
-from typing import List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import time
+from typing import List, Optional
 
 # Third Party Imports
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI, OpenAI
+import tiktoken
+from tqdm import tqdm
+
+# Package Imports
+from data_api.embeddings.embedding_cache import EmbeddingCache
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.utils.paths import Paths
+
+
+def pack_batches(
+    token_counts: List[int], max_inputs: int, max_tokens: int
+) -> List[List[int]]:
+    """
+    Greedily packs consecutive inputs into batches under per-request limits
+
+    params:
+            token_counts:
+                    The number of tokens in each input
+            max_inputs:
+                    The maximum number of inputs per batch
+            max_tokens:
+                    The maximum total number of tokens per batch
+
+    returns:
+            A list of batches, each a list of input indices
+    """
+    batches = []
+    curr_batch = []
+    curr_tokens = 0
+    for index, count in enumerate(token_counts):
+        if curr_batch and (
+            len(curr_batch) == max_inputs or curr_tokens + count > max_tokens
+        ):
+            batches.append(curr_batch)
+            curr_batch = []
+            curr_tokens = 0
+
+        curr_batch.append(index)
+        curr_tokens += count
+
+    if curr_batch:
+        batches.append(curr_batch)
+
+    return batches
 
 
 class EmbeddingsGenerator:
 
     client = OpenAI()
+    async_client = AsyncOpenAI()
+    encoding = tiktoken.get_encoding("cl100k_base")
     EMBEDDING_TOKEN_LIMIT = 8191
     EMBEDDINGS_MODEL = "text-embedding-3-small"
+    # Passages are embedded at full dimension, see dimension_reduction.py
+    EMBEDDINGS_DIMENSION = VectorDBConstants.FULL_EMBEDDINGS_DIMENSION
+
+    # Every embedding request consults this cache first. The load test points
+    # EMBEDDING_CACHE_PATH elsewhere to keep fake embeddings out of the real cache.
+    cache = EmbeddingCache(
+        os.environ.get("EMBEDDING_CACHE_PATH", Paths.EMBEDDING_CACHE_PATH)
+    )
+
+    # Per-request limits of the embeddings endpoint
+    BATCH_MAX_INPUTS = 2048
+    BATCH_TOKEN_LIMIT = 300000
+
+    # Concurrency and retry settings for batched requests
+    MAX_CONCURRENT_REQUESTS = 8
+    MAX_RETRIES = 6
+    INITIAL_BACKOFF_SECONDS = 1.0
+    RETRYABLE_ERRORS = (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+
+    @classmethod
+    def count_tokens(cls, text: str) -> int:
+        return len(cls.encoding.encode(text))
 
     @classmethod
-    def get_embedding(cls, transcript: str) -> List[float]:
-        return (
+    def get_embedding(
+        cls, transcript: str, dimension: Optional[int] = None
+    ) -> List[float]:
+        """
+        params:
+                transcript:
+                        The text to embed
+                dimension:
+                        The number of leading dimensions to return, renormalized.
+                        Defaults to EMBEDDINGS_DIMENSION.
+        """
+        dimension = dimension or cls.EMBEDDINGS_DIMENSION
+        cached = cls.cache.get_many(cls.EMBEDDINGS_MODEL, dimension, [transcript])[0]
+        if cached is not None:
+            return cached
+
+        embedding = (
             cls.client.embeddings.create(
                 input=[transcript],
                 model=cls.EMBEDDINGS_MODEL,
+                dimensions=dimension,
             )
             .data[0]
             .embedding
         )
+        cls.cache.put_many(cls.EMBEDDINGS_MODEL, dimension, [transcript], [embedding])
+        return embedding
+
+    @classmethod
+    async def get_embedding_async(
+        cls, transcript: str, dimension: Optional[int] = None
+    ) -> List[float]:
+        """
+        Same as get_embedding, without blocking the event loop on the API call or
+        the SQLite embedding cache (which may wait on its lock and commits writes)
+        """
+        dimension = dimension or cls.EMBEDDINGS_DIMENSION
+        cached = (
+            await asyncio.to_thread(
+                cls.cache.get_many, cls.EMBEDDINGS_MODEL, dimension, [transcript]
+            )
+        )[0]
+        if cached is not None:
+            return cached
+
+        response = await cls.async_client.embeddings.create(
+            input=[transcript],
+            model=cls.EMBEDDINGS_MODEL,
+            dimensions=dimension,
+        )
+        embedding = response.data[0].embedding
+        await asyncio.to_thread(
+            cls.cache.put_many,
+            cls.EMBEDDINGS_MODEL,
+            dimension,
+            [transcript],
+            [embedding],
+        )
+        return embedding
+
+    @classmethod
+    def _create_embeddings_with_retries(
+        cls, texts: List[str], dimension: int
+    ) -> List[List[float]]:
+        backoff = cls.INITIAL_BACKOFF_SECONDS
+        for attempt in range(cls.MAX_RETRIES + 1):
+            try:
+                response = cls.client.embeddings.create(
+                    input=texts,
+                    model=cls.EMBEDDINGS_MODEL,
+                    dimensions=dimension,
+                )
+                # The response items carry their input index, so don't rely on order
+                return [
+                    d.embedding for d in sorted(response.data, key=lambda d: d.index)
+                ]
+            except cls.RETRYABLE_ERRORS as e:
+                if attempt == cls.MAX_RETRIES:
+                    raise e
+
+                print("Embeddings request failed ({}), retrying".format(e))
+                time.sleep(backoff * (1 + random.random()))
+                backoff *= 2
+
+    @classmethod
+    def get_embeddings_batch(
+        cls, texts: List[str], dimension: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Embeds many texts with as few requests as the per-request limits allow
+
+        Texts found in the embedding cache are not sent. The rest are packed into
+        requests of up to BATCH_MAX_INPUTS inputs and BATCH_TOKEN_LIMIT tokens, and
+        up to MAX_CONCURRENT_REQUESTS requests are in flight at once. Failed
+        requests are retried with exponential backoff.
+
+        params:
+                texts:
+                        The texts to embed. Each must fit in EMBEDDING_TOKEN_LIMIT tokens.
+                dimension:
+                        The number of leading dimensions to return, renormalized.
+                        Defaults to EMBEDDINGS_DIMENSION.
+
+        returns:
+                One embedding per text, in the same order as the texts
+        """
+        dimension = dimension or cls.EMBEDDINGS_DIMENSION
+        embeddings = cls.cache.get_many(cls.EMBEDDINGS_MODEL, dimension, texts)
+
+        # Identical texts are only sent once
+        missing_texts = list(
+            dict.fromkeys(t for t, e in zip(texts, embeddings) if e is None)
+        )
+        if len(missing_texts) > 0:
+            new_embeddings = cls._embed_uncached(missing_texts, dimension)
+            cls.cache.put_many(
+                cls.EMBEDDINGS_MODEL, dimension, missing_texts, new_embeddings
+            )
+
+            text_to_embedding = dict(zip(missing_texts, new_embeddings))
+            embeddings = [
+                e if e is not None else text_to_embedding[t]
+                for t, e in zip(texts, embeddings)
+            ]
+
+        return embeddings
+
+    @classmethod
+    def _embed_uncached(cls, texts: List[str], dimension: int) -> List[List[float]]:
+        token_counts = [cls.count_tokens(t) for t in texts]
+        for count in token_counts:
+            if count > cls.EMBEDDING_TOKEN_LIMIT:
+                raise ValueError(
+                    "Text with {} tokens exceeds the embedding token limit".format(
+                        count
+                    )
+                )
+
+        batches = pack_batches(
+            token_counts, cls.BATCH_MAX_INPUTS, cls.BATCH_TOKEN_LIMIT
+        )
+
+        embeddings = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=cls.MAX_CONCURRENT_REQUESTS) as executor:
+            futures = {
+                executor.submit(
+                    cls._create_embeddings_with_retries,
+                    [texts[i] for i in batch],
+                    dimension,
+                ): batch
+                for batch in batches
+            }
+
+            for future in tqdm(futures, desc="Embedding batches"):
+                for index, embedding in zip(futures[future], future.result()):
+                    embeddings[index] = embedding
+
+        return embeddings
@@ -0,0 +1,81 @@
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import (
+    embeddings_dimension,
+    reduce_dimension,
+)
+from data_api.embeddings.vector_db.ivf_index import IVFIndex
+from data_api.embeddings.vector_db.recall_eval import (
+    exact_search,
+    K_VALUES,
+    measure_search,
+    recall_at_k,
+    sample_query_ids,
+)
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+from data_api.utils.paths import Paths
+
+"""
+Reports recall@k of IVF search against exact search on the vector database,
+with queries sampled as described in recall_eval.py.
+"""
+
+NPROBE_VALUES = [1, 2, 4, 8, 16, 32, 64]
+
+
+def main():
+    embeddings, _ = ShardedStore(
+        Paths.VECTOR_DB_FOLDER, VectorDBConstants.ROW_KEY_FIELDS
+    ).read_all()
+    embeddings = normalize_rows(reduce_dimension(embeddings, embeddings_dimension()))
+    num_rows = embeddings.shape[0]
+
+    index = IVFIndex.build(embeddings)
+    print(
+        "Built IVF index with {} lists over {} chapters".format(
+            index.num_lists, num_rows
+        )
+    )
+
+    query_ids = sample_query_ids(num_rows)
+    exact_results, exact_ms = exact_search(embeddings, query_ids)
+
+    rows = [["exact", "-", 1.0] + [1.0] * len(K_VALUES) + [exact_ms]]
+    for nprobe in NPROBE_VALUES:
+        if nprobe > index.num_lists:
+            break
+
+        results, elapsed_ms = measure_search(
+            lambda query_id: index.search(
+                embeddings, embeddings[query_id], max(K_VALUES) + 1, nprobe
+            )[0],
+            query_ids,
+        )
+
+        scanned = 0
+        for query_id in query_ids:
+            scanned += len(index.candidate_ids(embeddings[query_id], nprobe))
+
+        rows.append(
+            ["ivf", nprobe, scanned / (len(query_ids) * num_rows)]
+            + recall_at_k(results, exact_results)
+            + [elapsed_ms]
+        )
+
+    print(
+        tabulate(
+            rows,
+            headers=["search", "nprobe", "fraction scanned"]
+            + ["recall@{}".format(k) for k in K_VALUES]
+            + ["ms/query"],
+            floatfmt=".3f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# System Imports
+import fcntl
+import json
+import mmap
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.quantization import (
+    QUANTIZED_INDEX_TYPES,
+    QuantizedIndex,
+)
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+from data_api.utils.file_utils import (
+    create_temp_local_directory,
+    delete_temp_local_directory,
+)
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.paths import Paths
+
+"""
+Binary on-disk format for the vector database, designed to be opened with mmap.
+
+A binary index is a folder with the following files:
+    header.json:
+        {"num_rows": n, "dimension": d, "dtype": "float32", "version": 1,
+         "partitions": {podcast: [first row, end row], ...},
+         "quantization": ["int8", "binary"]}
+    embeddings.f32:
+        The unit-norm embeddings as a raw, row-major n x d float32 matrix
+    payloads.jsonl:
+        One JSON encoded payload per line, in row order
+    payload_offsets.i64:
+        n + 1 raw int64 byte offsets into payloads.jsonl. Row i's payload is
+        payloads.jsonl[offsets[i] : offsets[i + 1]]
+    embeddings.i8, int8_ranges.f32, embeddings.b1:
+        Quantized copies of the embeddings (see quantization.py), for each
+        quantization listed in the header
+
+Rows are grouped by podcast, and the header records each podcast's range of
+rows, so searches filtered by podcast can be restricted to those rows without
+decoding any payloads. Indexes written before partitions were introduced have
+no "partitions" key, and indexes written before quantization was introduced
+have no "quantization" key.
+
+Every file is mapped read-only, so all processes that open the same folder
+share a single page cache copy, and opening an index does no parsing.
+"""
+
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.f32"
+PAYLOADS_FILE = "payloads.jsonl"
+PAYLOAD_OFFSETS_FILE = "payload_offsets.i64"
+LOCK_FILE = ".lock"
+
+NUM_ROWS_KEY = "num_rows"
+DIMENSION_KEY = "dimension"
+DTYPE_KEY = "dtype"
+VERSION_KEY = "version"
+PARTITIONS_KEY = "partitions"
+QUANTIZATION_KEY = "quantization"
+
+# The header is written last, so its presence marks a complete index
+DATA_FILES = [EMBEDDINGS_FILE, PAYLOADS_FILE, PAYLOAD_OFFSETS_FILE]
+
+
+def quantized_files(header: Dict[str, Any]) -> List[str]:
+    """The quantized embedding files of the quantizations listed in a header"""
+    return [
+        filename
+        for quantization in header.get(QUANTIZATION_KEY, [])
+        for filename in QUANTIZED_INDEX_TYPES[quantization].FILES
+    ]
+
+
+class MmapPayloads:
+    """
+    Read-only sequence of payloads backed by a memory mapped JSONL file.
+
+    Payloads are decoded on access, so only the rows returned by a search
+    are ever parsed.
+    """
+
+    def __init__(self, payloads_path: str, offsets: np.ndarray):
+        self.offsets = offsets
+        with open(payloads_path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        return json.loads(self.buffer[self.offsets[index] : self.offsets[index + 1]])
+
+
+def write_binary_index(
+    folder: str, embeddings: np.ndarray, payloads: List[Dict[str, Any]]
+) -> None:
+    """
+    Writes a binary index to a local folder
+
+    params:
+            folder:
+                    The folder to write to, created if needed
+            embeddings:
+                    The embeddings, one per row. They are normalized before writing.
+            payloads:
+                    One payload per embedding row. Rows are reordered to group
+                    them by podcast.
+    """
+    assert embeddings.shape[0] == len(payloads)
+    create_temp_local_directory(folder)
+
+    order = sorted(
+        range(len(payloads)),
+        key=lambda i: payloads[i][VectorDBConstants.PODCAST_TITLE_FIELD],
+    )
+    embeddings = embeddings[order]
+    payloads = [payloads[i] for i in order]
+
+    partitions = {}
+    for row, payload in enumerate(payloads):
+        podcast = payload[VectorDBConstants.PODCAST_TITLE_FIELD]
+        partitions.setdefault(podcast, [row, row])[1] = row + 1
+
+    embeddings = normalize_rows(embeddings)
+    embeddings.tofile(os.path.join(folder, EMBEDDINGS_FILE))
+    for index_type in QUANTIZED_INDEX_TYPES.values():
+        index_type.build(embeddings).save(folder)
+
+    offsets = [0]
+    with open(os.path.join(folder, PAYLOADS_FILE), "wb") as f:
+        for payload in payloads:
+            line = json.dumps(payload).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.array(offsets, dtype=np.int64).tofile(os.path.join(folder, PAYLOAD_OFFSETS_FILE))
+
+    with open(os.path.join(folder, HEADER_FILE), "w") as f:
+        json.dump(
+            {
+                NUM_ROWS_KEY: embeddings.shape[0],
+                DIMENSION_KEY: embeddings.shape[1],
+                DTYPE_KEY: "float32",
+                VERSION_KEY: FORMAT_VERSION,
+                PARTITIONS_KEY: partitions,
+                QUANTIZATION_KEY: list(QUANTIZED_INDEX_TYPES),
+            },
+            f,
+        )
+
+
+def open_binary_index(folder: str) -> Tuple[np.memmap, MmapPayloads]:
+    """
+    Memory maps a binary index from a local folder
+
+    returns:
+            A tuple of (read-only n x d float32 memmap, MmapPayloads)
+    """
+    with open(os.path.join(folder, HEADER_FILE)) as f:
+        header = json.load(f)
+    assert header[VERSION_KEY] == FORMAT_VERSION
+
+    num_rows = header[NUM_ROWS_KEY]
+    embeddings = np.memmap(
+        os.path.join(folder, EMBEDDINGS_FILE),
+        dtype=np.dtype(header[DTYPE_KEY]),
+        mode="r",
+        shape=(num_rows, header[DIMENSION_KEY]),
+    )
+    offsets = np.memmap(
+        os.path.join(folder, PAYLOAD_OFFSETS_FILE),
+        dtype=np.int64,
+        mode="r",
+        shape=(num_rows + 1,),
+    )
+
+    return embeddings, MmapPayloads(os.path.join(folder, PAYLOADS_FILE), offsets)
+
+
+def open_quantized_index(folder: str, quantization: str) -> Optional[QuantizedIndex]:
+    """
+    Memory maps one of the quantized copies of a local binary index's embeddings
+
+    params:
+            quantization:
+                    VectorDBConstants.INT8_QUANTIZATION or BINARY_QUANTIZATION
+
+    returns:
+            The quantized index, or None if the index was written without it
+    """
+    with open(os.path.join(folder, HEADER_FILE)) as f:
+        header = json.load(f)
+
+    if quantization not in header.get(QUANTIZATION_KEY, []):
+        return None
+
+    return QUANTIZED_INDEX_TYPES[quantization].load(
+        folder, header[NUM_ROWS_KEY], header[DIMENSION_KEY]
+    )
+
+
+def read_partitions(folder: str) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Reads the row ids of each podcast from a local binary index's header
+
+    returns:
+            The row ids by podcast name, or None for indexes written without them
+    """
+    with open(os.path.join(folder, HEADER_FILE)) as f:
+        partitions = json.load(f).get(PARTITIONS_KEY)
+
+    if partitions is None:
+        return None
+
+    return {
+        podcast: np.arange(start, end, dtype=np.int64)
+        for podcast, (start, end) in partitions.items()
+    }
+
+
+def upload_binary_index(folder: str) -> None:
+    with open(os.path.join(folder, HEADER_FILE)) as f:
+        header = json.load(f)
+
+    # The header goes last so a partially uploaded index is never picked up
+    GCSClient.upload_many(
+        [
+            os.path.join(folder, filename)
+            for filename in DATA_FILES + quantized_files(header)
+        ]
+    )
+    GCSClient.upload_file(os.path.join(folder, HEADER_FILE))
+
+
+def ensure_local_binary_index(folder: str) -> str:
+    """
+    Downloads the binary index from GCS into a local folder, unless the current
+    version is already there
+
+    Each GCS generation of the header is downloaded into its own subfolder, so a
+    rebuilt index never overwrites files that running processes have mapped.
+    Older subfolders are deleted once the new one is complete. Mapped files stay
+    readable until they are unmapped.
+
+    Concurrent callers (eg. gunicorn workers starting together) serialize on a
+    lock file, so the index is downloaded once and the rest reuse it.
+
+    returns:
+            The local folder holding the current index
+    """
+    create_temp_local_directory(folder)
+    header_path = os.path.join(folder, HEADER_FILE)
+
+    with open(os.path.join(folder, LOCK_FILE), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            header_blob = GCSClient.blob_info(header_path)
+            if header_blob is None:
+                raise FileNotFoundError(
+                    "No binary vector index on GCS: {}".format(folder)
+                )
+
+            local_folder = os.path.join(folder, str(header_blob.generation))
+            if os.path.exists(os.path.join(local_folder, HEADER_FILE)):
+                return local_folder
+
+            print("Downloading binary vector index from GCS: {}".format(folder))
+            create_temp_local_directory(local_folder)
+            header_bytes = GCSClient.download_as_bytes(header_path)
+            filenames = DATA_FILES + quantized_files(json.loads(header_bytes))
+            GCSClient.download_many(
+                [os.path.join(folder, filename) for filename in filenames],
+                [os.path.join(local_folder, filename) for filename in filenames],
+            )
+            # The header goes last, since its presence marks a complete download
+            with open(os.path.join(local_folder, HEADER_FILE), "wb") as f:
+                f.write(header_bytes)
+
+            # Older generations, and indexes downloaded before generations were
+            # used, which sit directly in the folder
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if path == local_folder or name == LOCK_FILE:
+                    continue
+                if os.path.isdir(path):
+                    delete_temp_local_directory(path)
+                else:
+                    os.remove(path)
+
+            return local_folder
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
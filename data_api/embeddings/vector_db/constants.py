@@ -1,6 +1,6 @@
 class VectorDBConstants:
     COLLECTION_NAME = "podcast_gpt_embeddings"
-    EMBEDDINGS_DIMENSION = 1536
+    FULL_EMBEDDINGS_DIMENSION = 1536
     PODCAST_TITLE_FIELD = "podcast_title"
     EPISODE_TITLE_FIELD = "episode_title"
     CHAPTER_TITLE_FIELD = "chapter_title"
@@ -8,7 +8,68 @@ class VectorDBConstants:
     END_TIMESTAMP_FIELD = "end_timestamp"
     EPISODE_URL_FIELD = "episode_url"
     PODCAST_GUEST_FIELD = "podcast_guest"
+    EPISODE_DATE_FIELD = "episode_date"
     CHAPTER_TRANSCRIPT_FIELD = "chapter_transcript"
+    PASSAGE_INDEX_FIELD = "passage_index"
+    START_WORD_FIELD = "start_word_index"
+    END_WORD_FIELD = "end_word_index"
+    OVERLAP_CHARACTERS_FIELD = "overlap_characters"
     EMBEDDINGS_FIELD = "embeddings"
     DATA_FIELD = "data"
     SCORE_FIELD = "score"
+    CONTENT_HASH_FIELD = "content_hash"
+
+    # Payload fields that identify a row of the vector database
+    ROW_KEY_FIELDS = [
+        PODCAST_TITLE_FIELD,
+        EPISODE_TITLE_FIELD,
+        CHAPTER_TITLE_FIELD,
+        PASSAGE_INDEX_FIELD,
+    ]
+
+    # Vector store backend selection
+    VECTOR_STORE_BACKEND_ENV_VAR = "VECTOR_STORE_BACKEND"
+    QDRANT_BACKEND = "qdrant"
+    NUMPY_BACKEND = "numpy"
+    IVF_BACKEND = "ivf"
+    MMAP_BACKEND = "mmap"
+    SYNTHETIC_BACKEND = "synthetic"
+    DEFAULT_BACKEND = QDRANT_BACKEND
+
+    # Number of rows in the synthetic backend's random database (load testing only)
+    SYNTHETIC_NUM_ROWS_ENV_VAR = "SYNTHETIC_NUM_ROWS"
+    DEFAULT_SYNTHETIC_NUM_ROWS = 10000
+
+    # Number of inverted lists scanned per query by the IVF backend.
+    # Higher values improve recall at the cost of latency.
+    NPROBE_ENV_VAR = "VECTOR_SEARCH_NPROBE"
+    DEFAULT_NPROBE = 8
+
+    # Quantized copies of the embeddings searched first, with the best
+    # k * VECTOR_RESCORE_OVERSAMPLING candidates rescored exactly
+    QUANTIZATION_ENV_VAR = "VECTOR_QUANTIZATION"
+    NO_QUANTIZATION = "none"
+    INT8_QUANTIZATION = "int8"
+    BINARY_QUANTIZATION = "binary"
+    DEFAULT_QUANTIZATION = NO_QUANTIZATION
+    RESCORE_OVERSAMPLING_ENV_VAR = "VECTOR_RESCORE_OVERSAMPLING"
+    DEFAULT_RESCORE_OVERSAMPLING = 4.0
+
+    # Number of leading (Matryoshka) embedding dimensions that are indexed and
+    # searched. The vector database always stores the full embeddings.
+    EMBEDDINGS_DIMENSION_ENV_VAR = "EMBEDDINGS_DIMENSION"
+    DEFAULT_EMBEDDINGS_DIMENSION = FULL_EMBEDDINGS_DIMENSION
+
+    # Query cache in front of VectorSearch.get_topk_matches
+    QUERY_CACHE_MAX_SIZE_ENV_VAR = "QUERY_CACHE_MAX_SIZE"
+    DEFAULT_QUERY_CACHE_MAX_SIZE = 1024
+    QUERY_CACHE_TTL_SECONDS_ENV_VAR = "QUERY_CACHE_TTL_SECONDS"
+    DEFAULT_QUERY_CACHE_TTL_SECONDS = 3600
+
+    # Seconds between two background lookups of the vector database version
+    DATABASE_VERSION_CHECK_SECONDS_ENV_VAR = "DATABASE_VERSION_CHECK_SECONDS"
+    DEFAULT_DATABASE_VERSION_CHECK_SECONDS = 60
+
+    # Merge search hits on consecutive passages of the same chapter into one match
+    MERGE_ADJACENT_PASSAGES_ENV_VAR = "MERGE_ADJACENT_PASSAGES"
+    DEFAULT_MERGE_ADJACENT_PASSAGES = "1"
@@ -2,24 +2,30 @@
 import json
 import numpy as np
 import os
-from typing import Dict, List, Tuple
+import time
+from typing import List, Optional
 
 # Third Party Imports
-from qdrant_client.models import (
-    Distance,
-    VectorParams,
-)
 import tiktoken
 from tqdm import tqdm
 
 # Package Imports
 from data_api.audio_download.audio_downloader import MetadataKeys
-from data_api.chapterizer.transcript_chapterizer import (
-    convert_timestamp_string_to_milliseconds,
-)
 from data_api.embeddings.embeddings_generator import EmbeddingsGenerator
+from data_api.embeddings.vector_db.binary_index import (
+    upload_binary_index,
+    write_binary_index,
+)
 from data_api.embeddings.vector_db.constants import VectorDBConstants
-from data_api.embeddings.vector_db.qdrant_client_provider import QdrantClientProvider
+from data_api.embeddings.vector_db.dimension_reduction import (
+    embeddings_dimension,
+    reduce_dimension,
+)
+from data_api.embeddings.vector_db.ivf_index import IVFIndex
+from data_api.embeddings.vector_db.qdrant_sync import QdrantSync
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+from data_api.utils.file_utils import delete_temp_local_directory
 from data_api.utils.gcs_utils import GCSClient
 from data_api.utils.paths import Paths
 
@@ -31,155 +37,259 @@ def num_tokens_from_string(string: str, encoding_name: str = "cl100k_base") -> i
     return num_tokens
 
 
-def create_chapter_title_to_timestamps_dict(
-    chapters_metadata: List[Tuple[str, str]]
-) -> Dict[str, Tuple[int, int]]:
-    second_timestamps = [
-        convert_timestamp_string_to_milliseconds(t[0]) // 1000
-        for t in chapters_metadata
-    ]
-
-    title_to_timestamps = {}
-    num_chapters = len(second_timestamps)
-    for index in range(num_chapters):
-        start_timestamp = second_timestamps[index]
-        next_index = index + 1
-        end_timestamp = (
-            second_timestamps[next_index] if next_index < num_chapters else None
-        )
-        title_to_timestamps[chapters_metadata[index][1]] = (
-            start_timestamp,
-            end_timestamp,
-        )
+class DBUpdate:
 
-    return title_to_timestamps
+    vector_db = ShardedStore(Paths.VECTOR_DB_FOLDER, VectorDBConstants.ROW_KEY_FIELDS)
 
+    @classmethod
+    def migrate_legacy_vector_db(cls) -> None:
+        """
+        Converts the monolithic vector_db.json (if present) into the first shard
+        of the sharded vector database. Does nothing once the sharded store exists.
+        """
+        if cls.vector_db.exists() or not GCSClient.file_exists(Paths.VECTOR_DB_PATH):
+            return
 
-class DBUpdate:
+        print("Migrating {} to sharded storage".format(Paths.VECTOR_DB_PATH))
+        js = json.loads(GCSClient.download_textfile_as_string(Paths.VECTOR_DB_PATH))
+        rows = [
+            (embedding, data)
+            for embedding, data in zip(
+                js[VectorDBConstants.EMBEDDINGS_FIELD], js[VectorDBConstants.DATA_FIELD]
+            )
+            if data[VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD] != ""
+        ]
+        cls.vector_db.append_shard(
+            np.array([r[0] for r in rows], dtype=np.float32), [r[1] for r in rows]
+        )
 
     @classmethod
     def generate_and_store_embeddings(cls, podcast_names: List[str]) -> None:
         print("Creating Vector Database")
         count_exceeds = 0
-        total_chapters = 0
+        count_changed = 0
+        total_passages = 0
 
-        js = json.loads(GCSClient.download_textfile_as_string(Paths.VECTOR_DB_PATH))
-        js_embeddings = js[VectorDBConstants.EMBEDDINGS_FIELD]
-        js_data = js[VectorDBConstants.DATA_FIELD]
+        cls.migrate_legacy_vector_db()
+        EmbeddingsGenerator.cache.download_from_gcs()
+
+        # Only the payloads are needed to find passages that are already embedded.
+        # A passage is re-embedded if its transcript has changed since, and the new
+        # row supersedes the old one. Rows whose episode metadata (eg. the guest or
+        # publication date) changed are rewritten too, with the cached embedding.
+        existing_payloads = {
+            cls.vector_db.row_key(d): d for d in cls.vector_db.read_payloads()
+        }
 
-        embeddings = []
+        texts = []
         data = []
-        for index in range(len(js_data)):
-            if js_data[index][VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD] == "":
-                continue
-
-            embeddings.append(js_embeddings[index])
-            data.append(js_data[index])
-
-        searchable_embeddings = set(
-            [
-                d[VectorDBConstants.PODCAST_TITLE_FIELD]
-                + d[VectorDBConstants.EPISODE_TITLE_FIELD]
-                + d[VectorDBConstants.CHAPTER_TITLE_FIELD]
-                for d in data
-            ]
-        )
+        episodes = set()
+        current_keys = set()
+        count_refreshed = 0
 
         for podcast_name in podcast_names:
-            chapterized_data_folder = Paths.get_chapterized_data_folder(podcast_name)
-            chapterized_files = GCSClient.list_files(
-                chapterized_data_folder, Paths.JSON_EXT
+            passages_folder = Paths.get_passages_folder(podcast_name)
+            passages_files = GCSClient.list_files(passages_folder, Paths.JSON_EXT)
+            # Listing the metadata files lets the GCS mirror serve the unchanged
+            # ones without a request each
+            GCSClient.list_files(
+                Paths.get_audio_data_folder(podcast_name),
+                Paths.METADATA_SUFFIX + Paths.JSON_EXT,
             )
-            print("Generating embeddings for {}".format(podcast_name))
-            for chapterized_file in tqdm(chapterized_files):
-                text = GCSClient.download_textfile_as_string(chapterized_file)
-                chapters = json.loads(text)
-
-                episode_title = Paths.get_title_from_path(chapterized_file)
-                metadata_file = Paths.get_metadata_file_path(
-                    podcast_name, episode_title
-                )
-                metadata = json.loads(
-                    GCSClient.download_textfile_as_string(metadata_file)
-                )
-                chapter_title_to_timestamps = create_chapter_title_to_timestamps_dict(
-                    metadata[MetadataKeys.CHAPTERS_KEY]
-                )
-
-                for chapter_title, chapter_text in chapters.items():
-                    if chapter_text == "":
-                        continue
+            episode_titles = [Paths.get_title_from_path(f) for f in passages_files]
+            passages_texts = GCSClient.read_texts(passages_files)
+            metadata_texts = GCSClient.read_texts(
+                [
+                    Paths.get_metadata_file_path(podcast_name, episode_title)
+                    for episode_title in episode_titles
+                ]
+            )
+            print("Finding passages to embed for {}".format(podcast_name))
+            for episode_title, text, metadata_text in tqdm(
+                list(zip(episode_titles, passages_texts, metadata_texts))
+            ):
+                passages = json.loads(text)
+                episodes.add((podcast_name, episode_title))
+                metadata = json.loads(metadata_text)
 
-                    if (
-                        podcast_name + episode_title + chapter_title
-                        in searchable_embeddings
-                    ):
-                        continue
+                for passage in passages:
+                    chapter_title = passage[VectorDBConstants.CHAPTER_TITLE_FIELD]
+                    passage_text = passage["text"]
+                    row_key = (
+                        podcast_name,
+                        episode_title,
+                        chapter_title,
+                        passage[VectorDBConstants.PASSAGE_INDEX_FIELD],
+                    )
+                    current_keys.add(row_key)
+                    payload = {
+                        VectorDBConstants.PODCAST_TITLE_FIELD: podcast_name,
+                        VectorDBConstants.EPISODE_TITLE_FIELD: episode_title,
+                        VectorDBConstants.CHAPTER_TITLE_FIELD: chapter_title,
+                        VectorDBConstants.PASSAGE_INDEX_FIELD: passage[
+                            VectorDBConstants.PASSAGE_INDEX_FIELD
+                        ],
+                        VectorDBConstants.START_WORD_FIELD: passage[
+                            VectorDBConstants.START_WORD_FIELD
+                        ],
+                        VectorDBConstants.END_WORD_FIELD: passage[
+                            VectorDBConstants.END_WORD_FIELD
+                        ],
+                        VectorDBConstants.OVERLAP_CHARACTERS_FIELD: passage[
+                            VectorDBConstants.OVERLAP_CHARACTERS_FIELD
+                        ],
+                        VectorDBConstants.EPISODE_URL_FIELD: metadata[
+                            MetadataKeys.URL_KEY
+                        ],
+                        VectorDBConstants.PODCAST_GUEST_FIELD: metadata[
+                            MetadataKeys.GUEST_KEY
+                        ],
+                        VectorDBConstants.EPISODE_DATE_FIELD: metadata.get(
+                            MetadataKeys.PUBLISHED_DATE_KEY
+                        ),
+                        VectorDBConstants.START_TIMESTAMP_FIELD: passage["start_ms"]
+                        // 1000,
+                        VectorDBConstants.END_TIMESTAMP_FIELD: passage["end_ms"]
+                        // 1000,
+                        VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD: passage_text,
+                    }
+                    if row_key in existing_payloads:
+                        # Fields added since the row was written count as None
+                        existing_payload = existing_payloads[row_key]
+                        if all(
+                            existing_payload.get(field) == value
+                            for field, value in payload.items()
+                        ):
+                            continue
+
+                        if (
+                            existing_payload[VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD]
+                            == passage_text
+                        ):
+                            count_refreshed += 1
+                        else:
+                            count_changed += 1
 
                     full_text = "Title: {} \n\nTranscript\n: {}".format(
-                        chapter_title, chapter_text
+                        chapter_title, passage_text
                     )
                     token_count = num_tokens_from_string(full_text)
-                    total_chapters += 1
+                    total_passages += 1
                     if token_count > EmbeddingsGenerator.EMBEDDING_TOKEN_LIMIT:
                         count_exceeds += 1
                         continue
 
-                    start_timestamp, end_timestamp = chapter_title_to_timestamps[
-                        chapter_title
-                    ]
-
-                    embeddings.append(EmbeddingsGenerator.get_embedding(full_text))
-                    data.append(
-                        {
-                            VectorDBConstants.PODCAST_TITLE_FIELD: podcast_name,
-                            VectorDBConstants.EPISODE_TITLE_FIELD: episode_title,
-                            VectorDBConstants.CHAPTER_TITLE_FIELD: chapter_title,
-                            VectorDBConstants.EPISODE_URL_FIELD: metadata[
-                                MetadataKeys.URL_KEY
-                            ],
-                            VectorDBConstants.PODCAST_GUEST_FIELD: metadata[
-                                MetadataKeys.GUEST_KEY
-                            ],
-                            VectorDBConstants.START_TIMESTAMP_FIELD: start_timestamp,
-                            VectorDBConstants.END_TIMESTAMP_FIELD: end_timestamp,
-                            VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD: chapter_text,
-                        }
-                    )
+                    texts.append(full_text)
+                    data.append(payload)
 
-        GCSClient.upload_string_as_textfile(
-            Paths.VECTOR_DB_PATH,
-            json.dumps(
-                {
-                    VectorDBConstants.EMBEDDINGS_FIELD: embeddings,
-                    VectorDBConstants.DATA_FIELD: data,
-                }
+        # Rows of re-chunked episodes that are no longer produced, including the
+        # whole chapter rows written before passages were introduced, are deleted
+        deleted_keys = [
+            key
+            for key in existing_payloads
+            if key[:2] in episodes and key not in current_keys
+        ]
+
+        print("Generating embeddings for {} passages".format(len(texts)))
+        start_time = time.perf_counter()
+        embeddings = EmbeddingsGenerator.get_embeddings_batch(texts)
+        elapsed_seconds = time.perf_counter() - start_time
+        print(
+            "Embedded {} passages in {:.1f}s ({:.1f} passages/sec)".format(
+                len(texts), elapsed_seconds, len(texts) / max(elapsed_seconds, 1e-9)
+            )
+        )
+
+        # New passages are appended as a new shard, existing shards are untouched
+        cls.vector_db.append_shard(
+            np.array(embeddings, dtype=np.float32).reshape(
+                len(embeddings), VectorDBConstants.FULL_EMBEDDINGS_DIMENSION
             ),
+            data,
+            deleted_keys=deleted_keys,
         )
 
+        EmbeddingsGenerator.cache.upload_to_gcs()
+
         print(
-            "{} chapters exceeded token limit out of {}".format(
-                count_exceeds, total_chapters
+            "{} passages exceeded token limit out of {}".format(
+                count_exceeds, total_passages
             )
         )
+        print(
+            "{} passages were re-embedded because their text changed".format(
+                count_changed
+            )
+        )
+        print(
+            "{} passages were rewritten because their episode metadata changed".format(
+                count_refreshed
+            )
+        )
+        print("{} stale rows were deleted".format(len(deleted_keys)))
+        print(EmbeddingsGenerator.cache.report())
+        if GCSClient.mirror() is not None:
+            print(GCSClient.mirror().report())
 
     @classmethod
-    def create_and_deploy_index_and_endpoint(cls):
-        print("Uploading database to qdrant")
-        QdrantClientProvider.client.recreate_collection(
-            collection_name=VectorDBConstants.COLLECTION_NAME,
-            vectors_config=VectorParams(
-                size=VectorDBConstants.EMBEDDINGS_DIMENSION,
-                distance=Distance.COSINE,
-            ),
-        )
+    def create_and_deploy_index_and_endpoint(cls, full_rebuild: bool = False) -> None:
+        """
+        Brings the qdrant collection up to date with the vector database
+
+        params:
+                full_rebuild:
+                        If False, only added or changed points are upserted and removed
+                        points are deleted. If True, a new collection is built and the
+                        collection alias is swapped to it atomically.
+        """
+        if full_rebuild:
+            QdrantSync.full_rebuild(cls.vector_db)
+        else:
+            QdrantSync.delta_sync(cls.vector_db)
+
+    @classmethod
+    def build_and_store_ann_index(cls, num_lists: Optional[int] = None) -> None:
+        """
+        Builds an IVF index over the first EMBEDDINGS_DIMENSION dimensions of the
+        vector database and uploads it to GCS next to the database itself
+
+        params:
+                num_lists:
+                        The number of inverted lists, defaults to sqrt(num rows)
+        """
+        print("Building IVF index")
+        store_version, embeddings, _ = cls.vector_db.read_all_with_version()
+        if embeddings.shape[0] == 0:
+            print("The vector database is empty, not building an IVF index")
+            return
 
-        database = json.loads(
-            GCSClient.download_textfile_as_string(Paths.VECTOR_DB_PATH)
+        embeddings = normalize_rows(
+            reduce_dimension(embeddings, embeddings_dimension())
         )
 
-        QdrantClientProvider.client.upload_collection(
-            collection_name=VectorDBConstants.COLLECTION_NAME,
-            vectors=np.array(database[VectorDBConstants.EMBEDDINGS_FIELD]),
-            payload=database[VectorDBConstants.DATA_FIELD],
+        index = IVFIndex.build(
+            embeddings, num_lists=num_lists, store_version=store_version
         )
+        print(
+            "Built IVF index with {} lists over {} rows".format(
+                index.num_lists, embeddings.shape[0]
+            )
+        )
+
+        index.save(Paths.IVF_INDEX_PATH)
+        GCSClient.upload_file(Paths.IVF_INDEX_PATH)
+        os.remove(Paths.IVF_INDEX_PATH)
+
+    @classmethod
+    def build_and_store_binary_index(cls) -> None:
+        """
+        Converts the sharded vector database into the memory mappable binary index format
+        (see binary_index.py), keeping the first EMBEDDINGS_DIMENSION dimensions, and
+        uploads it to GCS
+        """
+        print("Building binary vector index")
+        embeddings, payloads = cls.vector_db.read_all()
+        embeddings = reduce_dimension(embeddings, embeddings_dimension())
+        write_binary_index(Paths.BINARY_INDEX_FOLDER, embeddings, payloads)
+        upload_binary_index(Paths.BINARY_INDEX_FOLDER)
+        delete_temp_local_directory(Paths.BINARY_INDEX_FOLDER)
@@ -0,0 +1,70 @@
+# System Imports
+import os
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+
+"""
+Reduced-dimension (Matryoshka) embeddings.
+
+text-embedding-3 models are trained so that the first d dimensions of an
+embedding, renormalized, are themselves a good embedding. Asking the API for
+`dimensions=d` returns exactly that. So the vector database keeps the full
+embeddings, and the searchable indexes (the binary and IVF indexes, the Qdrant
+collection and the in-memory stores) and query embeddings use only the first
+EMBEDDINGS_DIMENSION dimensions. Changing the setting means rebuilding the
+indexes, but never re-embedding passages.
+"""
+
+
+def embeddings_dimension() -> int:
+    """
+    returns:
+            The number of leading embedding dimensions that are indexed and
+            searched (EMBEDDINGS_DIMENSION)
+    """
+    dimension = int(
+        os.environ.get(
+            VectorDBConstants.EMBEDDINGS_DIMENSION_ENV_VAR,
+            VectorDBConstants.DEFAULT_EMBEDDINGS_DIMENSION,
+        )
+    )
+    if not 0 < dimension <= VectorDBConstants.FULL_EMBEDDINGS_DIMENSION:
+        raise ValueError(
+            "Embeddings dimension must be between 1 and {}: {}".format(
+                VectorDBConstants.FULL_EMBEDDINGS_DIMENSION, dimension
+            )
+        )
+
+    return dimension
+
+
+def reduce_dimension(embeddings: np.ndarray, dimension: int) -> np.ndarray:
+    """
+    Keeps the first dimension columns of the embeddings and renormalizes them
+
+    params:
+            embeddings:
+                    The embeddings, one per row
+            dimension:
+                    The number of leading dimensions to keep
+
+    returns:
+            The embeddings themselves if they already have dimension columns,
+            else a unit-norm float32 n x dimension copy
+    """
+    if dimension > embeddings.shape[1]:
+        raise ValueError(
+            "Cannot reduce {} dimensional embeddings to {} dimensions".format(
+                embeddings.shape[1], dimension
+            )
+        )
+
+    if dimension == embeddings.shape[1]:
+        return embeddings
+
+    return normalize_rows(embeddings[:, :dimension])
@@ -0,0 +1,69 @@
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import reduce_dimension
+from data_api.embeddings.vector_db.recall_eval import (
+    exact_search,
+    K_VALUES,
+    recall_at_k,
+    sample_query_ids,
+)
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+from data_api.utils.paths import Paths
+
+"""
+Reports the size, recall@k and latency of exact search over reduced-dimension
+(Matryoshka) embeddings against exact search over the full embeddings, to choose
+EMBEDDINGS_DIMENSION.
+
+Queries are sampled as described in recall_eval.py. Each query is reduced like
+the rows, as the API's `dimensions` parameter would.
+"""
+
+DIMENSIONS = [256, 384, 512, 768, 1024, 1536]
+
+
+def main():
+    embeddings, _ = ShardedStore(
+        Paths.VECTOR_DB_FOLDER, VectorDBConstants.ROW_KEY_FIELDS
+    ).read_all()
+    num_rows, full_dimension = embeddings.shape
+    print("Loaded {} passages of {} dimensions".format(num_rows, full_dimension))
+
+    query_ids = sample_query_ids(num_rows)
+
+    full_embeddings = normalize_rows(embeddings)
+    exact_results, _ = exact_search(full_embeddings, query_ids)
+    full_mb = full_embeddings.nbytes / 2**20
+    del full_embeddings
+
+    rows = []
+    for dimension in DIMENSIONS:
+        if dimension > full_dimension:
+            break
+
+        reduced = normalize_rows(reduce_dimension(embeddings, dimension))
+        results, elapsed_ms = exact_search(reduced, query_ids)
+
+        rows.append(
+            [dimension, reduced.nbytes / 2**20, full_mb / (reduced.nbytes / 2**20)]
+            + recall_at_k(results, exact_results)
+            + [elapsed_ms]
+        )
+
+    print(
+        tabulate(
+            rows,
+            headers=["dimension", "MB", "compression"]
+            + ["recall@{}".format(k) for k in K_VALUES]
+            + ["ms/query"],
+            floatfmt=".3f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
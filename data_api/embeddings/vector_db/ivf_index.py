@@ -0,0 +1,226 @@
+# System Imports
+from typing import Optional, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.vector_math import (
+    normalize_rows,
+    top_k_indices,
+)
+
+# Number of rows scored against the centroids at a time during k-means
+ASSIGNMENT_BATCH_SIZE = 8192
+
+
+def assign_to_centroids(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Assigns each (unit-norm) embedding to its most similar (unit-norm) centroid
+
+    returns:
+            An int64 array with the centroid index of each row
+    """
+    assignments = np.empty(embeddings.shape[0], dtype=np.int64)
+    for start in range(0, embeddings.shape[0], ASSIGNMENT_BATCH_SIZE):
+        batch = embeddings[start : start + ASSIGNMENT_BATCH_SIZE]
+        assignments[start : start + batch.shape[0]] = np.argmax(
+            batch @ centroids.T, axis=1
+        )
+
+    return assignments
+
+
+def spherical_kmeans(
+    embeddings: np.ndarray, num_lists: int, num_iterations: int, seed: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Clusters unit-norm embeddings with k-means under cosine similarity
+
+    params:
+            embeddings:
+                    Unit-norm float32 embeddings, one per row
+            num_lists:
+                    The number of clusters
+            num_iterations:
+                    The number of Lloyd iterations to run
+            seed:
+                    Seed for centroid initialization
+
+    returns:
+            A tuple of (unit-norm centroids, cluster assignment per row)
+    """
+    rng = np.random.default_rng(seed)
+    num_rows = embeddings.shape[0]
+    centroids = embeddings[rng.choice(num_rows, size=num_lists, replace=False)]
+
+    for _ in range(num_iterations):
+        assignments = assign_to_centroids(embeddings, centroids)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, embeddings)
+        counts = np.bincount(assignments, minlength=num_lists)
+
+        # Re-seed empty clusters with random rows so every list stays usable
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = embeddings[rng.choice(num_rows, size=len(empty))]
+
+        centroids = normalize_rows(sums)
+
+    return centroids, assign_to_centroids(embeddings, centroids)
+
+
+class IVFIndex:
+    """
+    Inverted file index over unit-norm embeddings.
+
+    Rows are clustered with spherical k-means. A query is compared against the
+    centroids first and only the rows in the nprobe closest lists are scored
+    exactly, so nprobe trades recall for latency.
+
+    The lists are stored in CSR layout: the row ids of list i are
+    list_ids[list_offsets[i] : list_offsets[i + 1]].
+
+    Row ids are positions in the rows the index was built over, so the index
+    also records their number and the version of the store they were read from.
+    It must not be used with any other rows (see matches).
+    """
+
+    CENTROIDS_KEY = "centroids"
+    LIST_OFFSETS_KEY = "list_offsets"
+    LIST_IDS_KEY = "list_ids"
+    STORE_VERSION_KEY = "store_version"
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_ids: np.ndarray,
+        store_version: Optional[str] = None,
+    ):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.store_version = store_version
+
+    @property
+    def num_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def num_rows(self) -> int:
+        return self.list_ids.shape[0]
+
+    @classmethod
+    def default_num_lists(cls, num_rows: int) -> int:
+        return max(1, int(np.sqrt(num_rows)))
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        num_lists: Optional[int] = None,
+        num_iterations: int = 20,
+        seed: int = 0,
+        store_version: Optional[str] = None,
+    ) -> "IVFIndex":
+        """
+        Builds an index over unit-norm embeddings
+
+        params:
+                embeddings:
+                        Unit-norm float32 embeddings, one per row
+                num_lists:
+                        The number of inverted lists, defaults to sqrt(num rows)
+                num_iterations:
+                        The number of k-means iterations
+                seed:
+                        Seed for centroid initialization
+                store_version:
+                        The version of the store the embeddings were read from
+        """
+        num_rows = embeddings.shape[0]
+        if num_rows == 0:
+            # k-means needs at least one row per list
+            raise ValueError("Can't build an IVF index over 0 rows")
+        if num_lists is None:
+            num_lists = cls.default_num_lists(num_rows)
+        num_lists = min(num_lists, num_rows)
+
+        centroids, assignments = spherical_kmeans(
+            embeddings, num_lists, num_iterations, seed
+        )
+
+        list_ids = np.argsort(assignments, kind="stable").astype(np.int64)
+        counts = np.bincount(assignments, minlength=num_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(centroids.astype(np.float32), list_offsets, list_ids, store_version)
+
+    def save(self, filepath: str) -> None:
+        arrays = {
+            self.CENTROIDS_KEY: self.centroids,
+            self.LIST_OFFSETS_KEY: self.list_offsets,
+            self.LIST_IDS_KEY: self.list_ids,
+        }
+        if self.store_version is not None:
+            arrays[self.STORE_VERSION_KEY] = np.array(self.store_version)
+        with open(filepath, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, filepath: str) -> "IVFIndex":
+        with np.load(filepath) as data:
+            # Indexes saved before store versions were recorded have none
+            return cls(
+                data[cls.CENTROIDS_KEY],
+                data[cls.LIST_OFFSETS_KEY],
+                data[cls.LIST_IDS_KEY],
+                (
+                    str(data[cls.STORE_VERSION_KEY])
+                    if cls.STORE_VERSION_KEY in data
+                    else None
+                ),
+            )
+
+    def matches(self, num_rows: int, store_version: str) -> bool:
+        """Whether the index was built over the given rows of a store"""
+        return self.num_rows == num_rows and self.store_version == store_version
+
+    def candidate_ids(self, query_vector: np.ndarray, nprobe: int) -> np.ndarray:
+        """Returns the row ids in the nprobe lists closest to a unit-norm query"""
+        if self.num_lists == 0:
+            # Indexes saved before empty stores were refused
+            return np.zeros(0, dtype=np.int64)
+
+        probed_lists = top_k_indices(self.centroids @ query_vector, nprobe)
+        return np.concatenate(
+            [
+                self.list_ids[self.list_offsets[i] : self.list_offsets[i + 1]]
+                for i in probed_lists
+            ]
+        )
+
+    def search(
+        self, embeddings: np.ndarray, query_vector: np.ndarray, k: int, nprobe: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k search
+
+        params:
+                embeddings:
+                        The unit-norm embeddings the index was built over
+                query_vector:
+                        The unit-norm query
+                k:
+                        The number of matches to return
+                nprobe:
+                        The number of inverted lists to scan
+
+        returns:
+                A tuple of (row ids, scores) sorted by descending score
+        """
+        ids = self.candidate_ids(query_vector, nprobe)
+        scores = embeddings[ids] @ query_vector
+        best = top_k_indices(scores, k)
+        return ids[best], scores[best]
@@ -0,0 +1,357 @@
+# System Imports
+from datetime import date, timedelta
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.binary_index import (
+    ensure_local_binary_index,
+    open_binary_index,
+    open_quantized_index,
+    read_partitions,
+)
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import reduce_dimension
+from data_api.embeddings.vector_db.ivf_index import IVFIndex
+from data_api.embeddings.vector_db.quantization import (
+    build_quantized_index,
+    QuantizedIndex,
+)
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_math import (
+    normalize_rows,
+    normalize_vector,
+    top_k_indices,
+)
+from data_api.embeddings.vector_db.vector_store import (
+    ScoredPayload,
+    SearchFilter,
+    VectorStore,
+)
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.paths import Paths
+
+
+def partition_by_podcast(payloads: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Groups row ids by the podcast of their payload"""
+    partitions = {}
+    for row, payload in enumerate(payloads):
+        partitions.setdefault(
+            payload[VectorDBConstants.PODCAST_TITLE_FIELD], []
+        ).append(row)
+
+    return {
+        podcast: np.array(rows, dtype=np.int64) for podcast, rows in partitions.items()
+    }
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process vector store that answers cosine similarity queries with one matmul.
+
+    The rows are normalized once at load time, so a query only needs to be
+    normalized before taking dot products. This gives the same scores as
+    Qdrant's cosine distance on the same data.
+
+    If an IVF index is provided, only the rows in the nprobe closest inverted
+    lists are scored, which trades recall for latency.
+
+    Embeddings that are already normalized (eg. a read-only memmap of a binary
+    index) are used as is, without copying them into process memory.
+
+    Row ids are partitioned by podcast up front, so a search filtered by podcast
+    only scores that podcast's rows. Guest and date filters are checked against
+    per-row columns that are extracted from the payloads on the first search
+    that needs them. The IVF index is only used for unfiltered searches.
+
+    If a quantized index is provided (see quantization.py), every search first
+    ranks the quantized rows and then rescores the best k * rescore_oversampling
+    of them exactly. With a memmapped binary index only the quantized rows and
+    the rescored full-precision rows are read.
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        payloads: Sequence[Dict[str, Any]],
+        ivf_index: Optional[IVFIndex] = None,
+        nprobe: int = VectorDBConstants.DEFAULT_NPROBE,
+        is_normalized: bool = False,
+        fixed_version: Optional[str] = None,
+        partitions: Optional[Dict[str, np.ndarray]] = None,
+        quantized_index: Optional[QuantizedIndex] = None,
+        rescore_oversampling: float = VectorDBConstants.DEFAULT_RESCORE_OVERSAMPLING,
+    ):
+        assert embeddings.shape[0] == len(payloads)
+        self.embeddings = embeddings if is_normalized else normalize_rows(embeddings)
+        self.payloads = payloads
+        self.ivf_index = ivf_index
+        self.nprobe = nprobe
+        self.fixed_version = fixed_version
+        self.partitions = (
+            partitions if partitions is not None else partition_by_podcast(payloads)
+        )
+        self._guests: Optional[np.ndarray] = None
+        self._episode_dates: Optional[np.ndarray] = None
+        self.quantized_index = quantized_index
+        self.rescore_oversampling = rescore_oversampling
+
+    @classmethod
+    def from_gcs(
+        cls,
+        use_ivf_index: bool = False,
+        quantization: str = VectorDBConstants.NO_QUANTIZATION,
+        rescore_oversampling: float = VectorDBConstants.DEFAULT_RESCORE_OVERSAMPLING,
+        dimension: int = VectorDBConstants.DEFAULT_EMBEDDINGS_DIMENSION,
+    ) -> "NumpyVectorStore":
+        """
+        params:
+                use_ivf_index:
+                        Whether to load the IVF index built by the data pipeline
+                quantization:
+                        The quantized index to build at load time and search first.
+                        Ignored if the IVF index is used.
+                rescore_oversampling:
+                        How many more candidates than k to rescore exactly
+                dimension:
+                        The number of leading embedding dimensions to search
+        """
+        print("Loading vector database from GCS: {}".format(Paths.VECTOR_DB_FOLDER))
+        store_version, embeddings, payloads = ShardedStore(
+            Paths.VECTOR_DB_FOLDER, VectorDBConstants.ROW_KEY_FIELDS
+        ).read_all_with_version()
+        embeddings = normalize_rows(reduce_dimension(embeddings, dimension))
+
+        ivf_index = None
+        if use_ivf_index:
+            print("Loading IVF index from GCS: {}".format(Paths.IVF_INDEX_PATH))
+            GCSClient.download_file(Paths.IVF_INDEX_PATH)
+            ivf_index = IVFIndex.load(Paths.IVF_INDEX_PATH)
+            os.remove(Paths.IVF_INDEX_PATH)
+            if ivf_index.centroids.shape[1] != dimension:
+                raise ValueError(
+                    "The IVF index has {} dimensions, rebuild it for {}".format(
+                        ivf_index.centroids.shape[1], dimension
+                    )
+                )
+            if not ivf_index.matches(len(payloads), store_version):
+                # Its row ids would point at the wrong passages
+                print(
+                    "The IVF index was built over {} rows of store version {}, "
+                    "but the store has {} rows at version {}. Searching without it, "
+                    "rebuild the index to use it.".format(
+                        ivf_index.num_rows,
+                        ivf_index.store_version,
+                        len(payloads),
+                        store_version,
+                    )
+                )
+                ivf_index = None
+
+        quantized_index = None
+        if quantization != VectorDBConstants.NO_QUANTIZATION and ivf_index is None:
+            print("Building {} quantized index".format(quantization))
+            quantized_index = build_quantized_index(quantization, embeddings)
+
+        return cls(
+            embeddings,
+            payloads,
+            ivf_index=ivf_index,
+            nprobe=int(
+                os.environ.get(
+                    VectorDBConstants.NPROBE_ENV_VAR, VectorDBConstants.DEFAULT_NPROBE
+                )
+            ),
+            is_normalized=True,
+            quantized_index=quantized_index,
+            rescore_oversampling=rescore_oversampling,
+        )
+
+    @classmethod
+    def from_binary_index(
+        cls,
+        quantization: str = VectorDBConstants.NO_QUANTIZATION,
+        rescore_oversampling: float = VectorDBConstants.DEFAULT_RESCORE_OVERSAMPLING,
+        dimension: int = VectorDBConstants.DEFAULT_EMBEDDINGS_DIMENSION,
+    ) -> "NumpyVectorStore":
+        """
+        params:
+                quantization:
+                        The quantized copy of the index to search first
+                rescore_oversampling:
+                        How many more candidates than k to rescore exactly
+                dimension:
+                        The number of embedding dimensions the index must have
+        """
+        folder = ensure_local_binary_index(Paths.BINARY_INDEX_FOLDER)
+        embeddings, payloads = open_binary_index(folder)
+        print("Memory mapped vector database with {} rows".format(len(payloads)))
+        if embeddings.shape[1] != dimension:
+            # Reducing a memory mapped index would copy it into memory
+            raise ValueError(
+                "The binary index has {} dimensions, rebuild it for {}".format(
+                    embeddings.shape[1], dimension
+                )
+            )
+
+        quantized_index = None
+        if quantization != VectorDBConstants.NO_QUANTIZATION:
+            quantized_index = open_quantized_index(folder, quantization)
+            if quantized_index is None:
+                # Indexes written before quantization was introduced
+                print("Building {} quantized index".format(quantization))
+                quantized_index = build_quantized_index(quantization, embeddings)
+
+        # Older indexes have no partitions in their header, so every payload
+        # is decoded once to compute them
+        return cls(
+            embeddings,
+            payloads,
+            is_normalized=True,
+            partitions=read_partitions(folder),
+            quantized_index=quantized_index,
+            rescore_oversampling=rescore_oversampling,
+        )
+
+    @classmethod
+    def synthetic(
+        cls,
+        num_rows: int,
+        seed: int = 0,
+        dimension: int = VectorDBConstants.DEFAULT_EMBEDDINGS_DIMENSION,
+    ) -> "NumpyVectorStore":
+        """
+        A store of random embeddings and placeholder passages, for load testing
+        without GCS or Qdrant. Payloads have the same fields as real rows, and
+        transcripts are about as long as real passages. Episodes alternate between
+        the two podcasts and are published a day apart, so filters select subsets.
+        """
+        print("Generating synthetic vector database with {} rows".format(num_rows))
+        rng = np.random.default_rng(seed)
+        embeddings = rng.standard_normal((num_rows, dimension), dtype=np.float32)
+        transcript = " ".join(["Speaker: this is a synthetic passage."] * 60)
+        payloads = [
+            {
+                VectorDBConstants.PODCAST_TITLE_FIELD: ["hubermanlab", "PeterAttiaMD"][
+                    (i // 50) % 2
+                ],
+                VectorDBConstants.EPISODE_TITLE_FIELD: "Episode {}".format(i // 50),
+                VectorDBConstants.CHAPTER_TITLE_FIELD: "Chapter {}".format(i // 5),
+                VectorDBConstants.PASSAGE_INDEX_FIELD: i % 5,
+                VectorDBConstants.START_WORD_FIELD: 0,
+                VectorDBConstants.END_WORD_FIELD: 0,
+                VectorDBConstants.OVERLAP_CHARACTERS_FIELD: 0,
+                VectorDBConstants.EPISODE_URL_FIELD: "https://example.com/{}".format(
+                    i // 50
+                ),
+                VectorDBConstants.PODCAST_GUEST_FIELD: None,
+                VectorDBConstants.EPISODE_DATE_FIELD: (
+                    date(2020, 1, 1) + timedelta(days=i // 50)
+                ).isoformat(),
+                VectorDBConstants.START_TIMESTAMP_FIELD: 0,
+                VectorDBConstants.END_TIMESTAMP_FIELD: 60,
+                VectorDBConstants.CHAPTER_TRANSCRIPT_FIELD: transcript,
+            }
+            for i in range(num_rows)
+        ]
+
+        return cls(embeddings, payloads, fixed_version="synthetic")
+
+    def version(self) -> Optional[str]:
+        return self.fixed_version
+
+    def exact_search(
+        self, query_vector: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores every row against a unit-norm query, returns (row ids, scores)"""
+        scores = self.embeddings @ query_vector
+        best = top_k_indices(scores, k)
+        return best, scores[best]
+
+    def _payload_columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The guest and the episode date ("" if unknown) of every row, extracted
+        from the payloads on first use
+        """
+        if self._guests is None:
+            self._guests = np.array(
+                [p.get(VectorDBConstants.PODCAST_GUEST_FIELD) for p in self.payloads],
+                dtype=object,
+            )
+            self._episode_dates = np.array(
+                [
+                    p.get(VectorDBConstants.EPISODE_DATE_FIELD) or ""
+                    for p in self.payloads
+                ],
+                dtype="U10",
+            )
+
+        return self._guests, self._episode_dates
+
+    def filtered_rows(self, search_filter: SearchFilter) -> np.ndarray:
+        """Returns the ids of the rows that match a filter, in increasing order"""
+        if search_filter.podcast is not None:
+            rows = self.partitions.get(
+                search_filter.podcast, np.empty(0, dtype=np.int64)
+            )
+        else:
+            rows = np.arange(len(self.payloads), dtype=np.int64)
+
+        if search_filter.guest is None and not search_filter.has_date_range():
+            return rows
+
+        guests, episode_dates = self._payload_columns()
+        keep = np.ones(len(rows), dtype=bool)
+        if search_filter.guest is not None:
+            keep &= guests[rows] == search_filter.guest
+        if search_filter.has_date_range():
+            dates = episode_dates[rows]
+            keep &= dates != ""
+            if search_filter.start_date is not None:
+                keep &= dates >= search_filter.start_date
+            if search_filter.end_date is not None:
+                keep &= dates <= search_filter.end_date
+
+        return rows[keep]
+
+    def filtered_search(
+        self, query_vector: np.ndarray, k: int, search_filter: SearchFilter
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Searches the rows that match a filter, returns (row ids, scores)"""
+        rows = self.filtered_rows(search_filter)
+        if self.quantized_index is not None:
+            return self.quantized_index.search(
+                self.embeddings, query_vector, k, self.rescore_oversampling, rows
+            )
+
+        scores = self.embeddings[rows] @ query_vector
+        best = top_k_indices(scores, k)
+        return rows[best], scores[best]
+
+    def search(
+        self,
+        query: List[float],
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+    ) -> List[ScoredPayload]:
+        query_vector = normalize_vector(query)
+        if search_filter is not None and not search_filter.is_empty():
+            ids, scores = self.filtered_search(query_vector, k, search_filter)
+        elif self.ivf_index is not None:
+            ids, scores = self.ivf_index.search(
+                self.embeddings, query_vector, k, self.nprobe
+            )
+        elif self.quantized_index is not None:
+            ids, scores = self.quantized_index.search(
+                self.embeddings, query_vector, k, self.rescore_oversampling
+            )
+        else:
+            ids, scores = self.exact_search(query_vector, k)
+
+        return [
+            ScoredPayload(score=float(score), payload=self.payloads[i])
+            for i, score in zip(ids, scores)
+        ]
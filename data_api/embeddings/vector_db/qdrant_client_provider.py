@@ -2,12 +2,20 @@
 import os
 
 # Third Party Imports
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 
 
 class QdrantClientProvider:
 
+    QDRANT_URL = "https://f9b5e12e-96e8-4a0d-92e3-154fad93523a.us-east4-0.gcp.cloud.qdrant.io:6333"
+
     client = QdrantClient(
-        url="https://f9b5e12e-96e8-4a0d-92e3-154fad93523a.us-east4-0.gcp.cloud.qdrant.io:6333",
+        url=QDRANT_URL,
+        api_key=os.environ["QDRANT_API_KEY"],
+    )
+
+    # Used by the asyncio serving path (see asgi_main.py)
+    async_client = AsyncQdrantClient(
+        url=QDRANT_URL,
         api_key=os.environ["QDRANT_API_KEY"],
     )
@@ -0,0 +1,366 @@
+# System Imports
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+import uuid
+
+# Third Party Imports
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    Disabled,
+    Distance,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    VectorParams,
+)
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import (
+    embeddings_dimension,
+    reduce_dimension,
+)
+from data_api.embeddings.vector_db.qdrant_client_provider import QdrantClientProvider
+from data_api.embeddings.vector_db.quantization import quantization_settings
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.paths import Paths
+
+# Namespace for deriving stable point ids from row keys
+POINT_ID_NAMESPACE = uuid.UUID("5a1d3c8e-2f4b-4e7a-9c61-0b8d7f3e2a94")
+
+# Fields of the sync record at Paths.QDRANT_SYNC_PATH
+SYNC_COLLECTION_KEY = "collection"
+SYNC_STORE_VERSION_KEY = "store_version"
+SYNC_TIME_KEY = "synced_at"
+
+
+def point_id(store: ShardedStore, payload: Dict[str, Any]) -> str:
+    """
+    Derives a stable Qdrant point id from a row's (podcast, episode, chapter,
+    passage index) key. Whole chapter rows indexed before passages have no
+    passage index.
+    """
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, json.dumps(store.row_key(payload))))
+
+
+def content_hash(embedding, payload: Dict[str, Any]) -> str:
+    """Hashes everything that is uploaded for a point, to detect changed points"""
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8"))
+    digest.update(embedding.tobytes())
+    return digest.hexdigest()
+
+
+def quantization_config(quantization: str):
+    """
+    The qdrant quantization config for a VECTOR_QUANTIZATION setting, or None.
+    Quantized vectors are kept in RAM and the originals on disk.
+    """
+    if quantization == VectorDBConstants.INT8_QUANTIZATION:
+        # Dimensions are clipped to their 0.99 quantile range before quantizing
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=0.99, always_ram=True
+            )
+        )
+    elif quantization == VectorDBConstants.BINARY_QUANTIZATION:
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+
+    return None
+
+
+class QdrantSync:
+
+    client = QdrantClientProvider.client
+    BATCH_SIZE = 256
+    MAX_PARALLEL_REQUESTS = 8
+    SCROLL_PAGE_SIZE = 1000
+
+    # Payload fields that searches filter on (see SearchFilter), by index type.
+    # Without an index qdrant has to check the payload of every candidate point.
+    PAYLOAD_INDEXES = {
+        VectorDBConstants.PODCAST_TITLE_FIELD: PayloadSchemaType.KEYWORD,
+        VectorDBConstants.PODCAST_GUEST_FIELD: PayloadSchemaType.KEYWORD,
+        VectorDBConstants.EPISODE_DATE_FIELD: PayloadSchemaType.DATETIME,
+    }
+
+    @classmethod
+    def _create_collection(cls, collection_name: str) -> None:
+        quantization, _ = quantization_settings()
+        config = quantization_config(quantization)
+        cls.client.create_collection(
+            collection_name=collection_name,
+            vectors_config=VectorParams(
+                size=embeddings_dimension(),
+                distance=Distance.COSINE,
+                on_disk=config is not None,
+            ),
+            quantization_config=config,
+        )
+        cls._create_payload_indexes(collection_name)
+
+    @classmethod
+    def _update_quantization(cls, collection_name: str) -> None:
+        """
+        Applies the VECTOR_QUANTIZATION setting to an existing collection.
+        Where the original vectors are stored only changes on a full rebuild.
+        """
+        quantization, _ = quantization_settings()
+        config = quantization_config(quantization)
+        current = cls.client.get_collection(collection_name).config.quantization_config
+        if current == config:
+            return
+
+        print("Setting quantization of {} to {}".format(collection_name, quantization))
+        cls.client.update_collection(
+            collection_name=collection_name,
+            quantization_config=config if config is not None else Disabled.DISABLED,
+        )
+
+    @classmethod
+    def _create_payload_indexes(cls, collection_name: str) -> None:
+        # Creating an index that already exists does nothing
+        for field_name, field_schema in cls.PAYLOAD_INDEXES.items():
+            cls.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True,
+            )
+
+    @classmethod
+    def _collection_names(cls) -> List[str]:
+        return [c.name for c in cls.client.get_collections().collections]
+
+    @classmethod
+    def _alias_target(cls, alias_name: str):
+        for alias in cls.client.get_aliases().aliases:
+            if alias.alias_name == alias_name:
+                return alias.collection_name
+
+        return None
+
+    @classmethod
+    def _record_sync(cls, collection_name: str, store: ShardedStore) -> None:
+        # Servers compare it to tell that the collection changed, even when the
+        # sync appended nothing to the store
+        record = {
+            SYNC_COLLECTION_KEY: collection_name,
+            SYNC_STORE_VERSION_KEY: store.version(),
+            SYNC_TIME_KEY: time.time(),
+        }
+        GCSClient.upload_string_as_textfile(Paths.QDRANT_SYNC_PATH, json.dumps(record))
+
+    @classmethod
+    def last_sync(cls) -> Optional[Dict[str, Any]]:
+        """The record of the last delta_sync or full_rebuild, None if there is none"""
+        if not GCSClient.file_exists(Paths.QDRANT_SYNC_PATH):
+            return None
+
+        return json.loads(GCSClient.download_textfile_as_string(Paths.QDRANT_SYNC_PATH))
+
+    @classmethod
+    def collection_version(cls) -> str:
+        """
+        Identifies the contents of the COLLECTION_NAME collection by the collection
+        the alias points at and the last sync recorded on GCS
+        """
+        alias_name = VectorDBConstants.COLLECTION_NAME
+        collection_name = cls._alias_target(alias_name) or alias_name
+        last_sync = cls.last_sync()
+        if last_sync is None:
+            return collection_name
+
+        return "{}:{}:{}".format(
+            collection_name,
+            last_sync[SYNC_STORE_VERSION_KEY],
+            last_sync[SYNC_TIME_KEY],
+        )
+
+    @classmethod
+    def _existing_hashes(cls, collection_name: str) -> Dict[str, str]:
+        """Maps every point id in a collection to its stored content hash"""
+        hashes = {}
+        offset = None
+        while True:
+            points, offset = cls.client.scroll(
+                collection_name=collection_name,
+                limit=cls.SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=[VectorDBConstants.CONTENT_HASH_FIELD],
+                with_vectors=False,
+            )
+            for p in points:
+                hashes[str(p.id)] = (p.payload or {}).get(
+                    VectorDBConstants.CONTENT_HASH_FIELD
+                )
+
+            if offset is None:
+                return hashes
+
+    @classmethod
+    def _run_in_parallel(cls, func, batches: List) -> None:
+        with ThreadPoolExecutor(max_workers=cls.MAX_PARALLEL_REQUESTS) as executor:
+            # Consume results so that exceptions are raised here
+            list(executor.map(func, batches))
+
+    @classmethod
+    def _upsert_points(cls, collection_name: str, points: List[PointStruct]) -> None:
+        batches = [
+            points[i : i + cls.BATCH_SIZE]
+            for i in range(0, len(points), cls.BATCH_SIZE)
+        ]
+        cls._run_in_parallel(
+            lambda batch: cls.client.upsert(
+                collection_name=collection_name, points=batch, wait=True
+            ),
+            batches,
+        )
+
+    @classmethod
+    def _delete_points(cls, collection_name: str, ids: List[str]) -> None:
+        batches = [
+            ids[i : i + cls.BATCH_SIZE] for i in range(0, len(ids), cls.BATCH_SIZE)
+        ]
+        cls._run_in_parallel(
+            lambda batch: cls.client.delete(
+                collection_name=collection_name,
+                points_selector=PointIdsList(points=batch),
+                wait=True,
+            ),
+            batches,
+        )
+
+    @classmethod
+    def _sync_into(
+        cls, collection_name: str, store: ShardedStore, existing: Dict[str, str]
+    ) -> None:
+        """
+        Makes a collection match the store, given the collection's current
+        point id -> content hash map
+        """
+        dimension = embeddings_dimension()
+        desired_ids = set()
+        num_upserted = 0
+        for shard_embeddings, shard_payloads in store.iterate_shards():
+            shard_embeddings = reduce_dimension(shard_embeddings, dimension)
+            points = []
+            for embedding, payload in zip(shard_embeddings, shard_payloads):
+                pid = point_id(store, payload)
+                desired_ids.add(pid)
+
+                digest = content_hash(embedding, payload)
+                if existing.get(pid) == digest:
+                    continue
+
+                points.append(
+                    PointStruct(
+                        id=pid,
+                        vector=embedding.tolist(),
+                        payload={
+                            **payload,
+                            VectorDBConstants.CONTENT_HASH_FIELD: digest,
+                        },
+                    )
+                )
+
+            # Upsert per shard so the whole database is never held in memory
+            cls._upsert_points(collection_name, points)
+            num_upserted += len(points)
+
+        removed_ids = [pid for pid in existing if pid not in desired_ids]
+        cls._delete_points(collection_name, removed_ids)
+
+        print(
+            "Upserted {} points and deleted {} points, {} unchanged".format(
+                num_upserted, len(removed_ids), len(desired_ids) - num_upserted
+            )
+        )
+
+    @classmethod
+    def delta_sync(cls, store: ShardedStore) -> None:
+        """
+        Upserts only added or changed points and deletes removed ones.
+        Search stays available throughout. Falls back to a full rebuild if the
+        collection was built with a different EMBEDDINGS_DIMENSION.
+        """
+        collection_name = VectorDBConstants.COLLECTION_NAME
+        if (
+            collection_name not in cls._collection_names()
+            and cls._alias_target(collection_name) is None
+        ):
+            cls._create_collection(collection_name)
+        else:
+            collection_dimension = cls.client.get_collection(
+                collection_name
+            ).config.params.vectors.size
+            if collection_dimension != embeddings_dimension():
+                # Points can't be resized in place
+                print(
+                    "Collection has {} dimensions instead of {}, rebuilding it".format(
+                        collection_dimension, embeddings_dimension()
+                    )
+                )
+                cls.full_rebuild(store)
+                return
+
+            # Collections created before payload indexes or quantization
+            cls._create_payload_indexes(collection_name)
+            cls._update_quantization(collection_name)
+
+        print(
+            "Syncing vector database to qdrant collection: {}".format(collection_name)
+        )
+        cls._sync_into(collection_name, store, cls._existing_hashes(collection_name))
+        cls._record_sync(cls._alias_target(collection_name) or collection_name, store)
+
+    @classmethod
+    def full_rebuild(cls, store: ShardedStore) -> None:
+        """
+        Builds a fresh collection from the store and then atomically points the
+        COLLECTION_NAME alias at it, so searches never see a partial collection.
+        The previously aliased collection is deleted afterwards.
+        """
+        alias_name = VectorDBConstants.COLLECTION_NAME
+        new_collection_name = "{}_{}".format(alias_name, int(time.time()))
+
+        print("Building qdrant collection: {}".format(new_collection_name))
+        cls._create_collection(new_collection_name)
+        cls._sync_into(new_collection_name, store, {})
+
+        previous_collection_name = cls._alias_target(alias_name)
+        if alias_name in cls._collection_names():
+            # A plain collection (from before aliases were used) holds the name.
+            # It has to be removed before the alias can be created.
+            print("Replacing collection {} with an alias".format(alias_name))
+            cls.client.delete_collection(collection_name=alias_name)
+
+        operations = []
+        if previous_collection_name is not None:
+            operations.append(
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias_name))
+            )
+        operations.append(
+            CreateAliasOperation(
+                create_alias=CreateAlias(
+                    collection_name=new_collection_name, alias_name=alias_name
+                )
+            )
+        )
+        cls.client.update_collection_aliases(change_aliases_operations=operations)
+        print("Alias {} now points to {}".format(alias_name, new_collection_name))
+        cls._record_sync(new_collection_name, store)
+
+        if previous_collection_name is not None:
+            cls.client.delete_collection(collection_name=previous_collection_name)
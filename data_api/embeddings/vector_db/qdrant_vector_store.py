@@ -0,0 +1,120 @@
+# System Imports
+from datetime import datetime
+from typing import List, Optional
+
+# Third Party Imports
+from qdrant_client.models import (
+    DatetimeRange,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    QuantizationSearchParams,
+    SearchParams,
+)
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.qdrant_client_provider import QdrantClientProvider
+from data_api.embeddings.vector_db.qdrant_sync import QdrantSync
+from data_api.embeddings.vector_db.quantization import quantization_settings
+from data_api.embeddings.vector_db.vector_store import (
+    ScoredPayload,
+    SearchFilter,
+    VectorStore,
+)
+
+
+def to_qdrant_filter(search_filter: Optional[SearchFilter]) -> Optional[Filter]:
+    """
+    Converts a search filter into a qdrant filter. The filtered fields have
+    payload indexes (see QdrantSync.PAYLOAD_INDEXES).
+    """
+    if search_filter is None or search_filter.is_empty():
+        return None
+
+    conditions = []
+    if search_filter.podcast is not None:
+        conditions.append(
+            FieldCondition(
+                key=VectorDBConstants.PODCAST_TITLE_FIELD,
+                match=MatchValue(value=search_filter.podcast),
+            )
+        )
+    if search_filter.guest is not None:
+        conditions.append(
+            FieldCondition(
+                key=VectorDBConstants.PODCAST_GUEST_FIELD,
+                match=MatchValue(value=search_filter.guest),
+            )
+        )
+    if search_filter.has_date_range():
+        # Dates are stored as "YYYY-MM-DD", which qdrant reads as midnight UTC
+        conditions.append(
+            FieldCondition(
+                key=VectorDBConstants.EPISODE_DATE_FIELD,
+                range=DatetimeRange(
+                    gte=(
+                        datetime.fromisoformat(search_filter.start_date)
+                        if search_filter.start_date is not None
+                        else None
+                    ),
+                    lte=(
+                        datetime.fromisoformat(search_filter.end_date)
+                        if search_filter.end_date is not None
+                        else None
+                    ),
+                ),
+            )
+        )
+
+    return Filter(must=conditions)
+
+
+class QdrantVectorStore(VectorStore):
+
+    def __init__(self):
+        # If the collection is quantized, qdrant ranks the quantized vectors and
+        # rescores the best k * oversampling points with the original vectors
+        quantization, rescore_oversampling = quantization_settings()
+        self.search_params = None
+        if quantization != VectorDBConstants.NO_QUANTIZATION:
+            self.search_params = SearchParams(
+                quantization=QuantizationSearchParams(
+                    rescore=True, oversampling=rescore_oversampling
+                )
+            )
+
+    def search(
+        self,
+        query: List[float],
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+    ) -> List[ScoredPayload]:
+        neighbors = QdrantClientProvider.client.search(
+            collection_name=VectorDBConstants.COLLECTION_NAME,
+            query_vector=query,
+            query_filter=to_qdrant_filter(search_filter),
+            search_params=self.search_params,
+            limit=k,
+        )
+
+        return [ScoredPayload(score=n.score, payload=n.payload) for n in neighbors]
+
+    async def search_async(
+        self,
+        query: List[float],
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+    ) -> List[ScoredPayload]:
+        neighbors = await QdrantClientProvider.async_client.search(
+            collection_name=VectorDBConstants.COLLECTION_NAME,
+            query_vector=query,
+            query_filter=to_qdrant_filter(search_filter),
+            search_params=self.search_params,
+            limit=k,
+        )
+
+        return [ScoredPayload(score=n.score, payload=n.payload) for n in neighbors]
+
+    def version(self) -> Optional[str]:
+        return QdrantSync.collection_version()
@@ -0,0 +1,305 @@
+# System Imports
+import abc
+import os
+from typing import Optional, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.vector_math import top_k_indices
+
+"""
+Quantized copies of the unit-norm embeddings, for a fast first search pass.
+
+A quantized index scores every candidate row approximately, keeps the best
+k * oversampling rows and rescores only those exactly against the full-precision
+embeddings. Full-precision rows are only read for the rescored candidates, so
+they can stay on disk (eg. a memmap of the binary index).
+
+    int8:
+        Each dimension is mapped linearly from its [min, max] over the rows onto
+        256 levels. 4x smaller than float32.
+    binary:
+        Only the sign of each dimension is kept, packed 8 per byte, and rows are
+        ranked by Hamming distance to the query's signs. 32x smaller than float32.
+
+numpy has no fast int8 matrix product, so the int8 first pass converts batches
+of codes to float32 and is slower than exact search on in-memory float32 rows
+(about 1.4x on 1536 dimensions). Its benefit here is memory. The binary first
+pass is about 1.25x faster than exact search.
+"""
+
+# Rows scored at a time by the int8 first pass, which bounds the size of the
+# temporary float32 copy of the codes
+SCORING_BATCH_SIZE = 1024
+
+# The number of set bits in each 16 bit value. Counting 16 bits per lookup is
+# about twice as fast as 8, and the table still fits in cache.
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(2**16)], dtype=np.uint8)
+
+
+class QuantizedIndex(metaclass=abc.ABCMeta):
+
+    @property
+    @abc.abstractmethod
+    def nbytes(self) -> int:
+        """The memory used by the quantized rows"""
+        pass
+
+    @abc.abstractmethod
+    def approximate_scores(
+        self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Scores rows against a unit-norm query. Higher is more similar.
+
+        params:
+                query_vector:
+                        The unit-norm query
+                rows:
+                        The row ids to score, all rows if None
+
+        returns:
+                One score per scored row, in the order of rows
+        """
+        pass
+
+    @abc.abstractmethod
+    def save(self, folder: str) -> None:
+        """Writes the files listed in FILES to a folder"""
+        pass
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query_vector: np.ndarray,
+        k: int,
+        oversampling: float,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the top k rows with an approximate pass over the quantized rows,
+        followed by exact rescoring of the best k * oversampling of them
+
+        params:
+                embeddings:
+                        The full-precision unit-norm embeddings the index was built from
+                query_vector:
+                        The unit-norm query
+                k:
+                        The number of matches to return
+                oversampling:
+                        How many more candidates than k to rescore exactly
+                rows:
+                        The row ids to search, all rows if None
+
+        returns:
+                A tuple of (row ids, exact scores) sorted by descending score
+        """
+        candidates = top_k_indices(
+            self.approximate_scores(query_vector, rows), int(np.ceil(k * oversampling))
+        )
+        ids = candidates if rows is None else rows[candidates]
+
+        # Sorted ids read the rows of a memmap in file order
+        ids = np.sort(ids)
+        scores = embeddings[ids] @ query_vector
+        best = top_k_indices(scores, k)
+        return ids[best], scores[best]
+
+
+class ScalarQuantizedIndex(QuantizedIndex):
+
+    CODES_FILE = "embeddings.i8"
+    RANGES_FILE = "int8_ranges.f32"
+    FILES = [CODES_FILE, RANGES_FILE]
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray, steps: np.ndarray):
+        """
+        params:
+                codes:
+                        n x d int8 codes. Dimension j of a row is approximately
+                        offsets[j] + steps[j] * (code + 128)
+                offsets:
+                        The minimum of each dimension
+                steps:
+                        The width of one quantization level of each dimension
+        """
+        self.codes = codes
+        self.offsets = offsets
+        self.steps = steps
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray) -> "ScalarQuantizedIndex":
+        offsets = embeddings.min(axis=0).astype(np.float32)
+        steps = ((embeddings.max(axis=0) - offsets) / 255).astype(np.float32)
+        steps[steps == 0] = 1.0
+
+        codes = np.empty(embeddings.shape, dtype=np.int8)
+        for start in range(0, embeddings.shape[0], SCORING_BATCH_SIZE):
+            batch = embeddings[start : start + SCORING_BATCH_SIZE]
+            levels = np.rint((batch - offsets) / steps)
+            codes[start : start + batch.shape[0]] = (
+                np.clip(levels, 0, 255) - 128
+            ).astype(np.int8)
+
+        return cls(codes, offsets, steps)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.offsets.nbytes + self.steps.nbytes
+
+    def approximate_scores(
+        self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # x . q = sum_j (offsets[j] + steps[j] * (code_j + 128)) * q[j]
+        scaled_query = self.steps * query_vector
+        bias = self.offsets @ query_vector + 128 * scaled_query.sum()
+
+        num_rows = self.codes.shape[0] if rows is None else len(rows)
+        scores = np.empty(num_rows, dtype=np.float32)
+        for start in range(0, num_rows, SCORING_BATCH_SIZE):
+            end = min(start + SCORING_BATCH_SIZE, num_rows)
+            batch = (
+                self.codes[start:end] if rows is None else self.codes[rows[start:end]]
+            )
+            scores[start:end] = batch.astype(np.float32) @ scaled_query
+
+        return scores + bias
+
+    def save(self, folder: str) -> None:
+        self.codes.tofile(os.path.join(folder, self.CODES_FILE))
+        np.stack([self.offsets, self.steps]).tofile(
+            os.path.join(folder, self.RANGES_FILE)
+        )
+
+    @classmethod
+    def load(cls, folder: str, num_rows: int, dimension: int) -> "ScalarQuantizedIndex":
+        codes = np.memmap(
+            os.path.join(folder, cls.CODES_FILE),
+            dtype=np.int8,
+            mode="r",
+            shape=(num_rows, dimension),
+        )
+        ranges = np.fromfile(os.path.join(folder, cls.RANGES_FILE), dtype=np.float32)
+        ranges = ranges.reshape(2, dimension)
+        return cls(codes, ranges[0], ranges[1])
+
+
+class BinaryQuantizedIndex(QuantizedIndex):
+
+    CODES_FILE = "embeddings.b1"
+    FILES = [CODES_FILE]
+
+    def __init__(self, codes: np.ndarray, dimension: int):
+        """
+        params:
+                codes:
+                        n x code_width(d) uint8 array of packed sign bits (1 if
+                        positive), zero padded to a whole number of 16 bit words
+                dimension:
+                        The number of dimensions d of the unpacked rows
+        """
+        self.codes = codes
+        self.dimension = dimension
+
+    @classmethod
+    def code_width(cls, dimension: int) -> int:
+        return 2 * ((dimension + 15) // 16)
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray) -> np.ndarray:
+        bits = np.packbits(vectors > 0, axis=-1)
+        padding = cls.code_width(vectors.shape[-1]) - bits.shape[-1]
+        if padding:
+            pad_width = [(0, 0)] * (bits.ndim - 1) + [(0, padding)]
+            bits = np.pad(bits, pad_width)
+
+        return bits
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray) -> "BinaryQuantizedIndex":
+        return cls(cls.quantize(embeddings), embeddings.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def approximate_scores(
+        self, query_vector: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        query_words = self.quantize(query_vector).view(np.uint16)
+
+        num_rows = self.codes.shape[0] if rows is None else len(rows)
+        differing_bits = np.empty(num_rows, dtype=np.int32)
+        for start in range(0, num_rows, SCORING_BATCH_SIZE):
+            end = min(start + SCORING_BATCH_SIZE, num_rows)
+            batch = (
+                self.codes[start:end] if rows is None else self.codes[rows[start:end]]
+            )
+            differing_bits[start:end] = POPCOUNT_TABLE[
+                np.ascontiguousarray(batch).view(np.uint16) ^ query_words
+            ].sum(axis=1, dtype=np.int32)
+
+        # Proportional to the cosine similarity of the sign vectors
+        return (self.dimension - 2 * differing_bits).astype(np.float32)
+
+    def save(self, folder: str) -> None:
+        self.codes.tofile(os.path.join(folder, self.CODES_FILE))
+
+    @classmethod
+    def load(cls, folder: str, num_rows: int, dimension: int) -> "BinaryQuantizedIndex":
+        codes = np.memmap(
+            os.path.join(folder, cls.CODES_FILE),
+            dtype=np.uint8,
+            mode="r",
+            shape=(num_rows, cls.code_width(dimension)),
+        )
+        return cls(codes, dimension)
+
+
+# Quantized index classes by the quantization name used in settings
+QUANTIZED_INDEX_TYPES = {
+    VectorDBConstants.INT8_QUANTIZATION: ScalarQuantizedIndex,
+    VectorDBConstants.BINARY_QUANTIZATION: BinaryQuantizedIndex,
+}
+
+
+def quantization_settings() -> Tuple[str, float]:
+    """
+    returns:
+            The quantization to search with (VECTOR_QUANTIZATION) and the rescoring
+            oversampling factor (VECTOR_RESCORE_OVERSAMPLING)
+    """
+    quantization = os.environ.get(
+        VectorDBConstants.QUANTIZATION_ENV_VAR, VectorDBConstants.DEFAULT_QUANTIZATION
+    )
+    if (
+        quantization != VectorDBConstants.NO_QUANTIZATION
+        and quantization not in QUANTIZED_INDEX_TYPES
+    ):
+        raise ValueError("Unknown quantization: {}".format(quantization))
+
+    oversampling = float(
+        os.environ.get(
+            VectorDBConstants.RESCORE_OVERSAMPLING_ENV_VAR,
+            VectorDBConstants.DEFAULT_RESCORE_OVERSAMPLING,
+        )
+    )
+    return quantization, oversampling
+
+
+def build_quantized_index(quantization: str, embeddings: np.ndarray) -> QuantizedIndex:
+    """
+    params:
+            quantization:
+                    VectorDBConstants.INT8_QUANTIZATION or BINARY_QUANTIZATION
+            embeddings:
+                    Unit-norm float32 embeddings, one per row
+    """
+    if quantization not in QUANTIZED_INDEX_TYPES:
+        raise ValueError("Unknown quantization: {}".format(quantization))
+
+    return QUANTIZED_INDEX_TYPES[quantization].build(embeddings)
@@ -0,0 +1,88 @@
+# System Imports
+import time
+
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import (
+    embeddings_dimension,
+    reduce_dimension,
+)
+from data_api.embeddings.vector_db.quantization import QUANTIZED_INDEX_TYPES
+from data_api.embeddings.vector_db.recall_eval import (
+    exact_search,
+    K_VALUES,
+    measure_search,
+    recall_at_k,
+    sample_query_ids,
+)
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_math import normalize_rows
+from data_api.utils.paths import Paths
+
+"""
+Reports the memory, recall@k and latency of quantized search with exact rescoring
+against exact float32 search on the vector database, with queries sampled as
+described in recall_eval.py.
+"""
+
+OVERSAMPLING_VALUES = [1, 2, 4, 8]
+
+
+def main():
+    embeddings, _ = ShardedStore(
+        Paths.VECTOR_DB_FOLDER, VectorDBConstants.ROW_KEY_FIELDS
+    ).read_all()
+    embeddings = normalize_rows(reduce_dimension(embeddings, embeddings_dimension()))
+    num_rows = embeddings.shape[0]
+    print("Loaded {} passages".format(num_rows))
+
+    query_ids = sample_query_ids(num_rows)
+    exact_results, exact_ms = exact_search(embeddings, query_ids)
+
+    float32_mb = embeddings.nbytes / 2**20
+    rows = [["float32", "-", float32_mb, 1.0] + [1.0] * len(K_VALUES) + [exact_ms]]
+    for quantization, index_type in QUANTIZED_INDEX_TYPES.items():
+        start = time.perf_counter()
+        index = index_type.build(embeddings)
+        print(
+            "Built {} index in {:.1f}s".format(
+                quantization, time.perf_counter() - start
+            )
+        )
+
+        for oversampling in OVERSAMPLING_VALUES:
+            results, elapsed_ms = measure_search(
+                lambda query_id: index.search(
+                    embeddings, embeddings[query_id], max(K_VALUES) + 1, oversampling
+                )[0],
+                query_ids,
+            )
+
+            rows.append(
+                [
+                    quantization,
+                    oversampling,
+                    index.nbytes / 2**20,
+                    float32_mb / (index.nbytes / 2**20),
+                ]
+                + recall_at_k(results, exact_results)
+                + [elapsed_ms]
+            )
+
+    print(
+        tabulate(
+            rows,
+            headers=["vectors", "oversampling", "MB", "compression"]
+            + ["recall@{}".format(k) for k in K_VALUES]
+            + ["ms/query"],
+            floatfmt=".3f",
+        )
+    )
+    print("Quantized searches also read the k * oversampling rescored float32 rows")
+
+
+if __name__ == "__main__":
+    main()
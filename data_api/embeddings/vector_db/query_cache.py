@@ -0,0 +1,70 @@
+# System Imports
+from dataclasses import dataclass
+import threading
+from typing import Any, Dict, Hashable, List, Optional
+
+# Third Party Imports
+from cachetools import TTLCache
+
+# Characters stripped from both ends of a question before it is used as a key
+QUESTION_STRIP_CHARACTERS = " \t\n\"'?!.,"
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a question so that trivially different phrasings share a cache key, eg:
+    '"How to improve  sleep?"' -> 'how to improve sleep'
+    """
+    return " ".join(question.lower().split()).strip(QUESTION_STRIP_CHARACTERS)
+
+
+@dataclass
+class CachedQuery:
+    """Encapsulates everything computed for one query"""
+
+    # The query embedding
+    embedding: List[float]
+
+    # The search results for the query
+    matches: List[Any]
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed time to live.
+    Counts hits and misses.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[CachedQuery]:
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return value
+
+    def put(self, key: Hashable, value: CachedQuery) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
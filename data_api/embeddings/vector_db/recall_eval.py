@@ -0,0 +1,84 @@
+# System Imports
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.vector_math import top_k_indices
+
+"""
+Shared recall@k measurement for the vector search reports.
+
+Queries are a random sample of the stored passage embeddings. Each query's own
+row is excluded from both result lists, so the reports measure how well a search
+finds the *other* passages closest to a real passage embedding.
+"""
+
+NUM_QUERIES = 200
+K_VALUES = [1, 4, 10]
+SEED = 0
+
+
+def exclude_self(ids: np.ndarray, query_id: int, k: int) -> np.ndarray:
+    return ids[ids != query_id][:k]
+
+
+def sample_query_ids(num_rows: int) -> np.ndarray:
+    """Samples the same NUM_QUERIES rows on every run over the same database"""
+    rng = np.random.default_rng(SEED)
+    return rng.choice(num_rows, size=min(NUM_QUERIES, num_rows), replace=False)
+
+
+def measure_search(
+    search: Callable[[int], np.ndarray], query_ids: np.ndarray
+) -> Tuple[Dict[int, np.ndarray], float]:
+    """
+    Runs a search for every query, without the query's own row
+
+    params:
+            search:
+                    Returns the ids of the best max(K_VALUES) + 1 rows for a
+                    query's row id, best first
+            query_ids:
+                    The queries' row ids
+
+    returns:
+            The best max(K_VALUES) other rows by query id, and the mean search
+            time in ms
+    """
+    max_k = max(K_VALUES)
+    results = {}
+    start = time.perf_counter()
+    for query_id in query_ids:
+        results[query_id] = exclude_self(search(query_id), query_id, max_k)
+    elapsed_ms = 1000 * (time.perf_counter() - start) / len(query_ids)
+    return results, elapsed_ms
+
+
+def exact_search(
+    embeddings: np.ndarray, query_ids: np.ndarray
+) -> Tuple[Dict[int, np.ndarray], float]:
+    """measure_search for exact search over unit-norm rows, the ground truth"""
+    return measure_search(
+        lambda query_id: top_k_indices(
+            embeddings @ embeddings[query_id], max(K_VALUES) + 1
+        ),
+        query_ids,
+    )
+
+
+def recall_at_k(
+    results: Dict[int, np.ndarray], exact_results: Dict[int, np.ndarray]
+) -> List[float]:
+    """Mean recall@k of search results against exact results, for each of K_VALUES"""
+    recalls = []
+    for k in K_VALUES:
+        hits = sum(
+            len(np.intersect1d(ids[:k], exact_results[query_id][:k]))
+            for query_id, ids in results.items()
+        )
+        recalls.append(hits / (k * len(results)))
+
+    return recalls
@@ -0,0 +1,245 @@
+# System Imports
+import io
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.paths import Paths
+
+"""
+Append-only sharded storage for embeddings and their payloads on GCS.
+
+A store is a GCS folder laid out as follows:
+    manifest.json:
+        {"version": 1, "dimension": d, "shards": [{"name": "shard_00000", "num_rows": n}, ...]}
+    shards/shard_00000.npy:
+        The shard's embeddings as an n x d float32 .npy array
+    shards/shard_00000.jsonl:
+        One JSON encoded payload per line, in the same row order as the .npy file
+
+New rows are written as a new shard and the (small) manifest is rewritten last,
+so existing shards are never downloaded or rewritten when appending, and readers
+never see a shard that is not fully uploaded. Only one writer may append at a time.
+
+Rows of a keyed store are deleted by appending a tombstone: a payload holding the
+row's key fields and TOMBSTONE_KEY, with an all zero embedding. A tombstone
+supersedes earlier rows like any other row, and is never returned by readers.
+"""
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+SHARDS_FOLDER = "shards"
+
+VERSION_KEY = "version"
+DIMENSION_KEY = "dimension"
+SHARDS_KEY = "shards"
+SHARD_NAME_KEY = "name"
+SHARD_NUM_ROWS_KEY = "num_rows"
+TOMBSTONE_KEY = "deleted"
+
+
+class ShardedStore:
+    """
+    params:
+            folder:
+                    The GCS folder holding the store
+            key_fields:
+                    Optional payload fields that identify a row. When given, a row
+                    supersedes every earlier row with the same values for these
+                    fields, and readers only return the latest version of each row.
+    """
+
+    def __init__(self, folder: str, key_fields: Optional[List[str]] = None):
+        self.folder = folder
+        self.key_fields = key_fields
+        self.manifest_path = os.path.join(folder, MANIFEST_FILE)
+
+    def row_key(self, payload: Dict[str, Any]) -> Tuple:
+        # Fields added to the key later are None for rows written before then
+        return tuple(payload.get(f) for f in self.key_fields)
+
+    def _shard_path(self, shard_name: str, extension: str) -> str:
+        return os.path.join(self.folder, SHARDS_FOLDER, shard_name + extension)
+
+    def exists(self) -> bool:
+        return GCSClient.file_exists(self.manifest_path)
+
+    def read_manifest(self) -> Dict[str, Any]:
+        if not self.exists():
+            return {VERSION_KEY: FORMAT_VERSION, DIMENSION_KEY: None, SHARDS_KEY: []}
+
+        manifest = json.loads(GCSClient.download_textfile_as_string(self.manifest_path))
+        assert manifest[VERSION_KEY] == FORMAT_VERSION
+        return manifest
+
+    @classmethod
+    def manifest_version(cls, manifest: Dict[str, Any]) -> str:
+        return str(len(manifest[SHARDS_KEY]))
+
+    def version(self) -> str:
+        """Identifies the store's contents, changes every time a shard is appended"""
+        return self.manifest_version(self.read_manifest())
+
+    def num_rows(self) -> int:
+        # Includes superseded rows and tombstones
+        return sum(s[SHARD_NUM_ROWS_KEY] for s in self.read_manifest()[SHARDS_KEY])
+
+    def append_shard(
+        self,
+        embeddings: np.ndarray,
+        payloads: List[Dict[str, Any]],
+        deleted_keys: Optional[List[Tuple]] = None,
+    ) -> None:
+        """
+        Appends rows to the store as a new shard
+
+        params:
+                embeddings:
+                        The embeddings to append, one per row
+                payloads:
+                        One payload per embedding row
+                deleted_keys:
+                        Keys (see row_key) of rows to delete, keyed stores only
+        """
+        assert embeddings.shape[0] == len(payloads)
+        if deleted_keys:
+            assert self.key_fields
+            tombstones = [
+                dict(zip(self.key_fields, key), **{TOMBSTONE_KEY: True})
+                for key in deleted_keys
+            ]
+            embeddings = np.concatenate(
+                [
+                    embeddings,
+                    np.zeros((len(tombstones), embeddings.shape[1]), dtype=np.float32),
+                ]
+            )
+            payloads = payloads + tombstones
+
+        if len(payloads) == 0:
+            return
+
+        manifest = self.read_manifest()
+        if manifest[DIMENSION_KEY] is None:
+            manifest[DIMENSION_KEY] = embeddings.shape[1]
+        assert manifest[DIMENSION_KEY] == embeddings.shape[1]
+
+        shard_name = "shard_{:05d}".format(len(manifest[SHARDS_KEY]))
+
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(embeddings, dtype=np.float32))
+        GCSClient.upload_bytes(
+            self._shard_path(shard_name, Paths.NPY_EXT), buffer.getvalue()
+        )
+        GCSClient.upload_string_as_textfile(
+            self._shard_path(shard_name, Paths.JSONL_EXT),
+            "".join(json.dumps(p) + "\n" for p in payloads),
+        )
+
+        manifest[SHARDS_KEY].append(
+            {SHARD_NAME_KEY: shard_name, SHARD_NUM_ROWS_KEY: len(payloads)}
+        )
+        GCSClient.upload_string_as_textfile(self.manifest_path, json.dumps(manifest))
+
+    def _read_shard_payloads(
+        self, shard_names: List[str]
+    ) -> List[List[Dict[str, Any]]]:
+        texts = GCSClient.read_texts(
+            [self._shard_path(name, Paths.JSONL_EXT) for name in shard_names]
+        )
+        return [[json.loads(line) for line in text.splitlines()] for text in texts]
+
+    def _read_shard_embeddings(self, shard_name: str) -> np.ndarray:
+        return np.load(
+            io.BytesIO(
+                GCSClient.download_as_bytes(self._shard_path(shard_name, Paths.NPY_EXT))
+            )
+        )
+
+    def _read_latest(
+        self,
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, List[Dict[str, Any]], np.ndarray]]]:
+        """
+        Reads every shard's payloads and works out which rows are current
+
+        returns:
+                A tuple of (manifest, [(shard name, payloads, boolean mask of
+                current rows) for each shard])
+        """
+        manifest = self.read_manifest()
+        shard_names = [s[SHARD_NAME_KEY] for s in manifest[SHARDS_KEY]]
+        shard_payloads = self._read_shard_payloads(shard_names)
+        masks = [np.ones(len(payloads), dtype=bool) for payloads in shard_payloads]
+
+        if self.key_fields:
+            latest = {}
+            for shard_index, payloads in enumerate(shard_payloads):
+                for row_index, payload in enumerate(payloads):
+                    key = self.row_key(payload)
+                    if key in latest:
+                        previous_shard_index, previous_row_index = latest[key]
+                        masks[previous_shard_index][previous_row_index] = False
+                    latest[key] = (shard_index, row_index)
+
+            for shard_index, row_index in latest.values():
+                if shard_payloads[shard_index][row_index].get(TOMBSTONE_KEY):
+                    masks[shard_index][row_index] = False
+
+        return manifest, list(zip(shard_names, shard_payloads, masks))
+
+    def iterate_shards(self) -> Iterator[Tuple[np.ndarray, List[Dict[str, Any]]]]:
+        """Yields the current (embeddings, payloads) one shard at a time"""
+        _, shards = self._read_latest()
+        for shard_name, payloads, mask in shards:
+            if not mask.any():
+                continue
+
+            yield (
+                self._read_shard_embeddings(shard_name)[mask],
+                [p for p, keep in zip(payloads, mask) if keep],
+            )
+
+    def read_payloads(self) -> List[Dict[str, Any]]:
+        """Reads every current payload without downloading any embeddings"""
+        _, shards = self._read_latest()
+        return [
+            p for _, payloads, mask in shards for p, keep in zip(payloads, mask) if keep
+        ]
+
+    def read_all(self) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Reads every current row of the store
+
+        returns:
+                A tuple of (n x d float32 embeddings, list of n payloads)
+        """
+        _, embeddings, payloads = self.read_all_with_version()
+        return embeddings, payloads
+
+    def read_all_with_version(self) -> Tuple[str, np.ndarray, List[Dict[str, Any]]]:
+        """
+        Same as read_all, with the version of the rows read (see version)
+        """
+        manifest, shards = self._read_latest()
+        num_rows = sum(int(mask.sum()) for _, _, mask in shards)
+        embeddings = np.empty(
+            (num_rows, manifest[DIMENSION_KEY] or 0), dtype=np.float32
+        )
+        payloads = []
+
+        row = 0
+        for shard_name, shard_payloads, mask in shards:
+            if not mask.any():
+                continue
+
+            shard_embeddings = self._read_shard_embeddings(shard_name)[mask]
+            embeddings[row : row + shard_embeddings.shape[0]] = shard_embeddings
+            row += shard_embeddings.shape[0]
+            payloads.extend(p for p, keep in zip(shard_payloads, mask) if keep)
+
+        return self.manifest_version(manifest), embeddings, payloads
@@ -0,0 +1,40 @@
+# Third Party Imports
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scales each row of a matrix to unit L2 norm
+
+    Rows with zero norm are left as zeros, so they score 0 against every query.
+
+    params:
+            matrix:
+                    A 2D array with one embedding per row
+
+    returns:
+            A contiguous float32 copy of the matrix with unit-norm rows
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def normalize_vector(vector) -> np.ndarray:
+    """Returns a unit-norm float32 copy of a single vector"""
+    return normalize_rows(np.asarray(vector).reshape(1, -1))[0]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the indices of the k largest scores, sorted by descending score
+
+    argpartition selects the top k in linear time, so only those k are sorted.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
@@ -1,14 +1,23 @@
 # System Imports
-from dataclasses import dataclass
-from typing import List, Optional
-
-# Third Party Imports
-from qdrant_client import QdrantClient
+from dataclasses import dataclass, replace
+import os
+from typing import List, Optional, Tuple
 
 # Package Imports
 from data_api.embeddings.embeddings_generator import EmbeddingsGenerator
 from data_api.embeddings.vector_db.constants import VectorDBConstants
-from data_api.embeddings.vector_db.qdrant_client_provider import QdrantClientProvider
+from data_api.embeddings.vector_db.dimension_reduction import embeddings_dimension
+from data_api.embeddings.vector_db.query_cache import (
+    CachedQuery,
+    normalize_question,
+    QueryCache,
+)
+from data_api.embeddings.vector_db.sharded_store import ShardedStore
+from data_api.embeddings.vector_db.vector_store import ScoredPayload, SearchFilter
+from data_api.embeddings.vector_db.vector_store_factory import VectorStoreFactory
+from data_api.embeddings.vector_db.version_watcher import VersionWatcher
+from data_api.utils.metrics import time_request_value
+from data_api.utils.paths import Paths
 
 
 @dataclass
@@ -27,22 +36,37 @@ class DatabaseMatch:
     # The chapter title within the episode
     chapter_title: str
 
-    # The chapter transcript
+    # The transcript of the matched passage (or whole chapter for rows indexed
+    # before passages were introduced)
     chapter_transcript: str
 
     # The episode's media url
     url: str
 
-    # The timestamp in seconds when the chapter starts
+    # The timestamp in seconds when the passage starts
     start_timestamp: int
 
-    # The timestamp in seconds when the chapter ends
-    # If the end of the chapter is the end of the episode it is None
+    # The timestamp in seconds when the passage ends
+    # For whole chapter rows ending at the end of the episode it is None
     end_timestamp: Optional[int]
 
     # The guest on this episode (can be None)
     guest: Optional[str]
 
+    # The episode's publication date as "YYYY-MM-DD" (None if unknown)
+    episode_date: Optional[str] = None
+
+    # The position of the passage within its chapter (None for whole chapter rows)
+    passage_index: Optional[int] = None
+
+    # The range of words of the episode transcript covered by the passage
+    start_word_index: Optional[int] = None
+    end_word_index: Optional[int] = None
+
+    # The number of leading characters of chapter_transcript that repeat the
+    # previous passage of the chapter
+    overlap_characters: int = 0
+
     def to_dict(self):
         return {
             VectorDBConstants.SCORE_FIELD: self.score,
@@ -55,9 +79,62 @@ class DatabaseMatch:
             VectorDBConstants.START_TIMESTAMP_FIELD: self.start_timestamp,
             VectorDBConstants.END_TIMESTAMP_FIELD: self.end_timestamp,
             VectorDBConstants.PODCAST_GUEST_FIELD: self.guest,
+            VectorDBConstants.EPISODE_DATE_FIELD: self.episode_date,
         }
 
 
+def merge_adjacent_matches(matches: List[DatabaseMatch]) -> List[DatabaseMatch]:
+    """
+    Merges matches on consecutive passages of the same chapter into a single match
+    spanning all of them, dropping the text the passages have in common
+
+    params:
+            matches:
+                    Matches ordered by decreasing score
+
+    returns:
+            The merged matches, ordered by decreasing score. A merged match has the
+            best score of its passages.
+    """
+    chapters = {}
+    for match in matches:
+        if match.passage_index is None:
+            chapters[id(match)] = [match]
+        else:
+            key = (match.podcast_title, match.episode_title, match.chapter_title)
+            chapters.setdefault(key, []).append(match)
+
+    merged = []
+    for chapter_matches in chapters.values():
+        chapter_matches = sorted(chapter_matches, key=lambda m: m.passage_index)
+        run = chapter_matches[0]
+        last_index = run.passage_index
+        for match in chapter_matches[1:]:
+            if match.passage_index != last_index + 1:
+                merged.append(run)
+                run = match
+                last_index = match.passage_index
+                continue
+
+            run = replace(
+                run,
+                score=max(run.score, match.score),
+                chapter_transcript=run.chapter_transcript
+                + (
+                    match.chapter_transcript[match.overlap_characters :]
+                    if match.overlap_characters
+                    else "\n\n" + match.chapter_transcript
+                ),
+                end_timestamp=match.end_timestamp,
+                end_word_index=match.end_word_index,
+            )
+            last_index = match.passage_index
+
+        merged.append(run)
+
+    return sorted(merged, key=lambda m: m.score, reverse=True)
+
+
 class VectorSearch:
 
     podcast_name_to_title = {
@@ -65,16 +142,162 @@ class VectorSearch:
         "PeterAttiaMD": "The Peter Attia Drive Podcast",
     }
 
+    # Select the backend with the VECTOR_STORE_BACKEND environment variable
+    store = VectorStoreFactory(
+        os.environ.get(
+            VectorDBConstants.VECTOR_STORE_BACKEND_ENV_VAR,
+            VectorDBConstants.DEFAULT_BACKEND,
+        )
+    )
+
+    # Queries are embedded at the dimension the store was indexed with
+    query_dimension = embeddings_dimension()
+
+    # Caches query embeddings and search results for repeated questions. Entries
+    # of earlier database versions are never hit again and age out.
+    query_cache = QueryCache(
+        max_size=int(
+            os.environ.get(
+                VectorDBConstants.QUERY_CACHE_MAX_SIZE_ENV_VAR,
+                VectorDBConstants.DEFAULT_QUERY_CACHE_MAX_SIZE,
+            )
+        ),
+        ttl_seconds=float(
+            os.environ.get(
+                VectorDBConstants.QUERY_CACHE_TTL_SECONDS_ENV_VAR,
+                VectorDBConstants.DEFAULT_QUERY_CACHE_TTL_SECONDS,
+            )
+        ),
+    )
+
+    # Looks up database_version in the background, for invalidating caches
+    version_watcher = VersionWatcher(
+        lambda: VectorSearch.database_version(),
+        interval_seconds=float(
+            os.environ.get(
+                VectorDBConstants.DATABASE_VERSION_CHECK_SECONDS_ENV_VAR,
+                VectorDBConstants.DEFAULT_DATABASE_VERSION_CHECK_SECONDS,
+            )
+        ),
+    )
+
+    # Merge hits on consecutive passages of a chapter, see merge_adjacent_matches
+    merge_adjacent_passages = (
+        os.environ.get(
+            VectorDBConstants.MERGE_ADJACENT_PASSAGES_ENV_VAR,
+            VectorDBConstants.DEFAULT_MERGE_ADJACENT_PASSAGES,
+        )
+        == "1"
+    )
+
     @classmethod
-    def get_topk_matches(cls, query_string: str, k: int) -> List[DatabaseMatch]:
-        query = EmbeddingsGenerator.get_embedding(query_string)
-        neighbors = QdrantClientProvider.client.search(
-            collection_name=VectorDBConstants.COLLECTION_NAME,
-            query_vector=query,
-            limit=k,
+    def get_topk_matches(
+        cls, query_string: str, k: int, search_filter: Optional[SearchFilter] = None
+    ) -> List[DatabaseMatch]:
+        """
+        Finds the k passages most similar to a question. Hits on consecutive
+        passages of a chapter are merged unless MERGE_ADJACENT_PASSAGES is "0",
+        so fewer than k matches may be returned.
+
+        Repeated questions (after normalization) with the same filter are answered
+        from the query cache without calling the embeddings API or the vector store.
+
+        params:
+                query_string:
+                        The question
+                k:
+                        The number of passages to find
+                search_filter:
+                        If set, only passages of episodes that match it are searched
+        """
+        _, matches = cls.get_query_embedding_and_matches(query_string, k, search_filter)
+        return matches
+
+    @classmethod
+    def _query_cache_key(
+        cls, query_string: str, k: int, search_filter: Optional[SearchFilter]
+    ) -> Optional[Tuple]:
+        """
+        Keys results on the database version they were searched in, None (don't
+        cache) while the version is unknown
+        """
+        version = cls.version_watcher.version()
+        if version is None:
+            return None
+
+        return (version, normalize_question(query_string), k, search_filter)
+
+    @classmethod
+    def get_query_embedding_and_matches(
+        cls, query_string: str, k: int, search_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[float], List[DatabaseMatch]]:
+        """Same as get_topk_matches, but also returns the query embedding"""
+        cache_key = cls._query_cache_key(query_string, k, search_filter)
+        cached = cls.query_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return cached.embedding, list(cached.matches)
+
+        with time_request_value("embedding_seconds"):
+            query = EmbeddingsGenerator.get_embedding(query_string, cls.query_dimension)
+        with time_request_value("vector_search_seconds"):
+            matches = cls.search_by_embedding(query, k, search_filter)
+        if cache_key is not None:
+            cls.query_cache.put(
+                cache_key, CachedQuery(embedding=query, matches=matches)
+            )
+
+        return query, list(matches)
+
+    @classmethod
+    async def get_query_embedding_and_matches_async(
+        cls, query_string: str, k: int, search_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[float], List[DatabaseMatch]]:
+        """Same as get_query_embedding_and_matches, for use from an event loop"""
+        cache_key = cls._query_cache_key(query_string, k, search_filter)
+        cached = cls.query_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return cached.embedding, list(cached.matches)
+
+        with time_request_value("embedding_seconds"):
+            query = await EmbeddingsGenerator.get_embedding_async(
+                query_string, cls.query_dimension
+            )
+        with time_request_value("vector_search_seconds"):
+            matches = await cls.search_by_embedding_async(query, k, search_filter)
+        if cache_key is not None:
+            cls.query_cache.put(
+                cache_key, CachedQuery(embedding=query, matches=matches)
+            )
+
+        return query, list(matches)
+
+    @classmethod
+    def database_version(cls) -> str:
+        """
+        Identifies the current contents of the vector database. Makes GCS (and
+        Qdrant) calls, use version_watcher on the request path.
+        """
+        return cls.store.version() or ShardedStore(Paths.VECTOR_DB_FOLDER).version()
+
+    @classmethod
+    def search_by_embedding(
+        cls, query: List[float], k: int, search_filter: Optional[SearchFilter] = None
+    ) -> List[DatabaseMatch]:
+        return cls._to_database_matches(cls.store.search(query, k, search_filter))
+
+    @classmethod
+    async def search_by_embedding_async(
+        cls, query: List[float], k: int, search_filter: Optional[SearchFilter] = None
+    ) -> List[DatabaseMatch]:
+        return cls._to_database_matches(
+            await cls.store.search_async(query, k, search_filter)
         )
 
-        return [
+    @classmethod
+    def _to_database_matches(
+        cls, neighbors: List[ScoredPayload]
+    ) -> List[DatabaseMatch]:
+        matches = [
             DatabaseMatch(
                 score=n.score,
                 podcast_title=n.payload[VectorDBConstants.PODCAST_TITLE_FIELD],
@@ -87,6 +310,18 @@ class VectorSearch:
                 start_timestamp=n.payload[VectorDBConstants.START_TIMESTAMP_FIELD],
                 end_timestamp=n.payload[VectorDBConstants.END_TIMESTAMP_FIELD],
                 guest=n.payload[VectorDBConstants.PODCAST_GUEST_FIELD],
+                episode_date=n.payload.get(VectorDBConstants.EPISODE_DATE_FIELD),
+                passage_index=n.payload.get(VectorDBConstants.PASSAGE_INDEX_FIELD),
+                start_word_index=n.payload.get(VectorDBConstants.START_WORD_FIELD),
+                end_word_index=n.payload.get(VectorDBConstants.END_WORD_FIELD),
+                overlap_characters=n.payload.get(
+                    VectorDBConstants.OVERLAP_CHARACTERS_FIELD, 0
+                ),
             )
             for n in neighbors
         ]
+
+        if cls.merge_adjacent_passages:
+            matches = merge_adjacent_matches(matches)
+
+        return matches
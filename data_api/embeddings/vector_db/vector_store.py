@@ -0,0 +1,154 @@
+# System Imports
+import abc
+import asyncio
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+
+
+@dataclass
+class ScoredPayload:
+    """Encapsulates one row returned by a vector store search"""
+
+    # The cosine similarity match score
+    score: float
+
+    # The payload stored alongside the matched vector
+    payload: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Restricts a search to rows whose payload matches every field that is set.
+    Filters are hashable, so they can be part of cache keys.
+    """
+
+    # The podcast name, eg. "hubermanlab"
+    podcast: Optional[str] = None
+
+    # The episode guest, matched exactly
+    guest: Optional[str] = None
+
+    # Inclusive range of episode dates, formatted as "YYYY-MM-DD". Rows without
+    # an episode date don't match if either bound is set.
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+    PODCAST_PARAM = "podcast"
+    GUEST_PARAM = "guest"
+    START_DATE_PARAM = "start_date"
+    END_DATE_PARAM = "end_date"
+
+    @classmethod
+    def from_params(cls, params: Mapping[str, str]) -> Optional["SearchFilter"]:
+        """
+        Builds a filter from request parameters, ignoring empty ones
+
+        returns:
+                The filter, or None if no parameter was set
+
+        raises:
+                ValueError if a parameter is not a string, or a date is not
+                formatted as "YYYY-MM-DD"
+        """
+        values = {
+            name: params.get(name) or None
+            for name in [
+                cls.PODCAST_PARAM,
+                cls.GUEST_PARAM,
+                cls.START_DATE_PARAM,
+                cls.END_DATE_PARAM,
+            ]
+        }
+        for name, value in values.items():
+            # JSON parameters (eg. of batch questions) may hold any type
+            if value is not None and not isinstance(value, str):
+                raise ValueError("{} must be a string, got: {!r}".format(name, value))
+
+        for name in [cls.START_DATE_PARAM, cls.END_DATE_PARAM]:
+            if values[name] is not None:
+                values[name] = date.fromisoformat(values[name]).isoformat()
+
+        search_filter = cls(**values)
+        return None if search_filter.is_empty() else search_filter
+
+    def is_empty(self) -> bool:
+        return self == SearchFilter()
+
+    def has_date_range(self) -> bool:
+        return self.start_date is not None or self.end_date is not None
+
+    def matches(self, payload: Dict[str, Any]) -> bool:
+        if (
+            self.podcast is not None
+            and payload[VectorDBConstants.PODCAST_TITLE_FIELD] != self.podcast
+        ):
+            return False
+
+        if (
+            self.guest is not None
+            and payload.get(VectorDBConstants.PODCAST_GUEST_FIELD) != self.guest
+        ):
+            return False
+
+        if self.has_date_range():
+            episode_date = payload.get(VectorDBConstants.EPISODE_DATE_FIELD)
+            if episode_date is None:
+                return False
+            if self.start_date is not None and episode_date < self.start_date:
+                return False
+            if self.end_date is not None and episode_date > self.end_date:
+                return False
+
+        return True
+
+
+# Abstract class for vector stores
+class VectorStore(metaclass=abc.ABCMeta):
+
+    @abc.abstractmethod
+    def search(
+        self,
+        query: List[float],
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+    ) -> List[ScoredPayload]:
+        """
+        Finds the k rows whose vectors are most similar to the query
+
+        params:
+                query:
+                        The query embedding
+                k:
+                        The number of matches to return
+                search_filter:
+                        If set, only rows that match it are returned
+
+        returns:
+                Up to k scored payloads, sorted by descending cosine similarity
+        """
+        pass
+
+    def version(self) -> Optional[str]:
+        """
+        Identifies the store's contents if they are fixed for the store's lifetime
+        or tracked by the store itself. None means the contents follow the vector
+        database on GCS. Looked up in the background, see VersionWatcher.
+        """
+        return None
+
+    async def search_async(
+        self,
+        query: List[float],
+        k: int,
+        search_filter: Optional[SearchFilter] = None,
+    ) -> List[ScoredPayload]:
+        """
+        Same as search, for use from an event loop. By default the search runs in a
+        worker thread, stores backed by a network service should override this.
+        """
+        return await asyncio.to_thread(self.search, query, k, search_filter)
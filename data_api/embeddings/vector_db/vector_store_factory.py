@@ -0,0 +1,50 @@
+# System Imports
+import os
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.embeddings.vector_db.dimension_reduction import embeddings_dimension
+from data_api.embeddings.vector_db.numpy_vector_store import NumpyVectorStore
+from data_api.embeddings.vector_db.quantization import quantization_settings
+from data_api.embeddings.vector_db.vector_store import VectorStore
+
+
+def VectorStoreFactory(backend: str) -> VectorStore:
+    # VECTOR_QUANTIZATION applies to the numpy and mmap backends. Quantization
+    # of the qdrant collection is set when it is synced (see QdrantSync).
+    quantization, rescore_oversampling = quantization_settings()
+    dimension = embeddings_dimension()
+
+    if backend == VectorDBConstants.QDRANT_BACKEND:
+        # Imported here so that local backends do not need Qdrant credentials
+        from data_api.embeddings.vector_db.qdrant_vector_store import (
+            QdrantVectorStore,
+        )
+
+        return QdrantVectorStore()
+    elif backend == VectorDBConstants.NUMPY_BACKEND:
+        return NumpyVectorStore.from_gcs(
+            quantization=quantization,
+            rescore_oversampling=rescore_oversampling,
+            dimension=dimension,
+        )
+    elif backend == VectorDBConstants.IVF_BACKEND:
+        return NumpyVectorStore.from_gcs(use_ivf_index=True, dimension=dimension)
+    elif backend == VectorDBConstants.MMAP_BACKEND:
+        return NumpyVectorStore.from_binary_index(
+            quantization=quantization,
+            rescore_oversampling=rescore_oversampling,
+            dimension=dimension,
+        )
+    elif backend == VectorDBConstants.SYNTHETIC_BACKEND:
+        return NumpyVectorStore.synthetic(
+            int(
+                os.environ.get(
+                    VectorDBConstants.SYNTHETIC_NUM_ROWS_ENV_VAR,
+                    VectorDBConstants.DEFAULT_SYNTHETIC_NUM_ROWS,
+                )
+            ),
+            dimension=dimension,
+        )
+    else:
+        raise ValueError("Unknown vector store backend: {}".format(backend))
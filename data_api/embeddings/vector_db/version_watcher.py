@@ -0,0 +1,84 @@
+# System Imports
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+"""
+Tracks the vector database version in the background, so that requests never
+wait for (or fail on) the GCS and Qdrant calls that look it up.
+"""
+
+
+class VersionWatcher:
+    """
+    Polls get_version every interval_seconds on a daemon thread, started by the
+    first call to version() in each process (threads don't survive a fork, eg.
+    into gunicorn workers).
+
+    Listeners are called with the new version whenever it differs from the last
+    version that was fetched successfully.
+
+    params:
+            get_version:
+                    Fetches the current version
+            interval_seconds:
+                    The time between two fetches
+    """
+
+    def __init__(self, get_version: Callable[[], str], interval_seconds: float):
+        self.get_version = get_version
+        self.interval_seconds = interval_seconds
+
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._pid = None
+        # None until the first fetch succeeds, and after a failed fetch
+        self._version: Optional[str] = None
+        self._last_known_version: Optional[str] = None
+
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def version(self) -> Optional[str]:
+        """
+        returns:
+                The version found by the last fetch, or None if it is unknown. Data
+                cached for an unknown version may be stale.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, daemon=True).start()
+
+        return self._version
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print("Vector database version check failed: {}".format(e))
+            time.sleep(self.interval_seconds)
+
+    def check(self) -> None:
+        """Fetches the version and notifies the listeners if it has changed"""
+        try:
+            version = self.get_version()
+        except Exception as e:
+            print("Could not get the vector database version: {}".format(e))
+            self._version = None
+            return
+
+        if self._last_known_version is not None and version != self._last_known_version:
+            print("Vector database changed to version {}".format(version))
+            # Caches are cleared before the new version is published
+            self._version = None
+            with self._lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                listener(version)
+
+        self._last_known_version = version
+        self._version = version
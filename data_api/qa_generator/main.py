@@ -49,8 +49,8 @@ def main():
             )
 
             print("Counting tokens for {}".format(podcast.name))
-            for t in tqdm(chapterized_files):
-                text = GCSClient.download_textfile_as_string(t)
+            chapterized_texts = GCSClient.read_texts(chapterized_files)
+            for t, text in tqdm(list(zip(chapterized_files, chapterized_texts))):
                 chapters_json = json.loads(text)
                 episode_title = Paths.get_title_from_path(t)
 
@@ -15,6 +15,7 @@ from data_api.utils.file_utils import (
 from data_api.utils.gcs_utils import GCSClient
 from data_api.utils.parallel_utils import ParallelProcessExecutor
 from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact, PipelineManifest, Stage
 
 aai.settings.api_key = os.environ.get("ASSEMBLYAI_API_KEY")
 
@@ -34,9 +35,10 @@ def get_aai_transcript(aai_transcript_id: str) -> str:
 
 class AudioTranscriber:
 
-    def __init__(self, podcast_name: str, extension: str):
+    def __init__(self, podcast_name: str, extension: str, manifest: PipelineManifest):
         self.podcast_name = podcast_name
         self.extension = extension
+        self.manifest = manifest
 
     def find_untranscribed_episodes(self) -> List[str]:
         """
@@ -47,49 +49,10 @@ class AudioTranscriber:
         """
 
         print("Looking for untranscribed_files for {} ...".format(self.podcast_name))
-        untranscribed_files = []
 
-        # Get a list of all audio files for this podcast
-        audio_folder = Paths.get_audio_data_folder(self.podcast_name)
-        audio_files = GCSClient.list_files(audio_folder, self.extension)
-
-        # Create a set of the existing transcripts (raw, speaker labeled and original from Assembly AI)
-        raw_transcript_folder = Paths.get_raw_transcript_folder(self.podcast_name)
-        raw_transcript_files = set(
-            GCSClient.list_files(raw_transcript_folder, Paths.TXT_EXT)
-        )
-        speaker_transcript_folder = Paths.get_speaker_transcript_folder(
-            self.podcast_name
-        )
-        speaker_transcript_files = set(
-            GCSClient.list_files(speaker_transcript_folder, Paths.TXT_EXT)
-        )
-        aai_transcript_folder = Paths.get_aai_transcript_folder(self.podcast_name)
-        aai_transcript_files = set(
-            GCSClient.list_files(aai_transcript_folder, Paths.JSON_EXT)
-        )
-
-        for audio_file in audio_files:
-            title = Paths.get_title_from_path(audio_file)
-            raw_transcript_file = Paths.get_raw_transcript_path(
-                self.podcast_name, title
-            )
-            speaker_transcript_file = Paths.get_speaker_transcript_path(
-                self.podcast_name, title
-            )
-            aai_transcript_file = Paths.get_aai_transcript_path(
-                self.podcast_name, title
-            )
-
-            # Check if any of the transcripts do not exist
-            if (
-                raw_transcript_file not in raw_transcript_files
-                or speaker_transcript_file not in speaker_transcript_files
-                or aai_transcript_file not in aai_transcript_files
-            ):
-                untranscribed_files.append(Paths.get_title_from_path(audio_file))
-
-        return untranscribed_files
+        # Episodes with audio, but without any of the transcripts (raw, speaker
+        # labeled and original from Assembly AI)
+        return self.manifest.pending(Stage.TRANSCRIBE)
 
     def transcribe_audio(self, episode_title: str) -> None:
         """
@@ -113,40 +76,36 @@ class AudioTranscriber:
         # Transcribe with AAI
         transcript = transcriber.transcribe(audio_path, config=config)
 
-        raw_transcript_path = Paths.get_raw_transcript_path(
-            self.podcast_name, episode_title
+        raw_transcript = "".join(
+            utterance.text + " \n" for utterance in transcript.utterances
         )
-
-        # Save raw transcript locally
-        with open(raw_transcript_path, "w") as f:
-            f.writelines(
-                [utterance.text + " \n" for utterance in transcript.utterances]
-            )
-            f.close()
-
-        # Upload raw transcript to GCS
-        GCSClient.upload_file(raw_transcript_path)
-
-        speaker_transcript_path = Paths.get_speaker_transcript_path(
-            self.podcast_name, episode_title
+        speaker_transcript = "".join(
+            "Speaker {}: \n{}\n\n".format(utterance.speaker, utterance.text)
+            for utterance in transcript.utterances
         )
 
-        # Save speaker transcript locally
-        with open(speaker_transcript_path, "w") as f:
-            for utterance in transcript.utterances:
-                f.write("Speaker {}: \n".format(utterance.speaker))
-                f.write(utterance.text)
-                f.write("\n\n")
-
-            f.close()
-
-        # Upload speaker transcript to GCS
-        GCSClient.upload_file(speaker_transcript_path)
+        # Upload raw and speaker transcripts to GCS, compressed like other text
+        raw_blob, speaker_blob = GCSClient.upload_texts(
+            {
+                Paths.get_raw_transcript_path(
+                    self.podcast_name, episode_title
+                ): raw_transcript,
+                Paths.get_speaker_transcript_path(
+                    self.podcast_name, episode_title
+                ): speaker_transcript,
+            }
+        )
+        self.manifest.record(episode_title, Artifact.RAW_TRANSCRIPT, raw_blob)
+        self.manifest.record(episode_title, Artifact.SPEAKER_TRANSCRIPT, speaker_blob)
 
         # Upload AAI json transcript to GCS
-        GCSClient.upload_string_as_textfile(
-            Paths.get_aai_transcript_path(self.podcast_name, episode_title),
-            json.dumps(get_aai_transcript(transcript.id)),
+        self.manifest.record(
+            episode_title,
+            Artifact.AAI_TRANSCRIPT,
+            GCSClient.upload_string_as_textfile(
+                Paths.get_aai_transcript_path(self.podcast_name, episode_title),
+                json.dumps(get_aai_transcript(transcript.id)),
+            ),
         )
 
     def transcribe_all_audio_files(self) -> None:
@@ -156,14 +115,8 @@ class AudioTranscriber:
         The resulting transcripts are saved to GCS
         """
 
-        # Create temporary local directories
-        temp_folders = [
-            Paths.get_audio_data_folder(self.podcast_name),
-            Paths.get_raw_transcript_folder(self.podcast_name),
-            Paths.get_speaker_transcript_folder(self.podcast_name),
-        ]
-        for tf in temp_folders:
-            create_temp_local_directory(tf)
+        # Create a temporary local directory for the audio
+        create_temp_local_directory(Paths.get_audio_data_folder(self.podcast_name))
 
         # Find untranscribed files among the titles
         untranscribed_files = self.find_untranscribed_episodes()
@@ -8,7 +8,6 @@ from typing import Dict
 import assemblyai as aai
 
 # Package Imports
-from data_api.utils.file_utils import create_temp_local_directory
 from data_api.utils.gcs_utils import GCSClient
 from data_api.utils.paths import Paths
 
@@ -26,17 +25,11 @@ def download_all_raw_transcript_texts() -> Dict[str, str]:
         raw_text_folder = os.path.join(
             podcast_name, Paths.TEXT_DATA_FOLDER, Paths.RAW_TRANSCRIPT_FOLDER
         )
-        create_temp_local_directory(raw_text_folder)
-        for file_name in GCSClient.list_files(raw_text_folder, Paths.TXT_EXT):
-            if not os.path.exists(file_name):
-                GCSClient.download_file(file_name)
-
-            curr_text = ""
-            with open(file_name, "r") as f:
-                for line in f.readlines():
-                    curr_text += line.rstrip() + " "
-
-                ret[file_name] = curr_text.rstrip()
+        file_names = GCSClient.list_files(raw_text_folder, Paths.TXT_EXT)
+        for file_name, text in zip(file_names, GCSClient.read_texts(file_names)):
+            ret[file_name] = " ".join(
+                line.rstrip() for line in text.splitlines()
+            ).rstrip()
 
     return ret
 
@@ -70,18 +63,31 @@ def match_aai_transcript_to_gcs_transcript(
     return None
 
 
-def save_assembly_ai_transcript(transcript: json, file_name: str) -> None:
-    transcript_file_name = file_name.replace(
+def get_aai_transcript_file_name(file_name: str) -> str:
+    return file_name.replace(
         Paths.RAW_TRANSCRIPT_FOLDER, Paths.ASSEMBLY_AI_FOLDER
     ).replace(Paths.TXT_EXT, Paths.JSON_EXT)
-    if GCSClient.file_exists(transcript_file_name):
-        print("File already exists, skipping!")
-        return
 
-    GCSClient.upload_string_as_textfile(transcript_file_name, json.dumps(transcript))
+
+def save_assembly_ai_transcript(transcript: json, file_name: str) -> None:
+    GCSClient.upload_string_as_textfile(
+        get_aai_transcript_file_name(file_name), json.dumps(transcript)
+    )
 
 
 def process_aai_transcripts(gcs_transcripts: Dict[str, str]) -> None:
+    # The raw transcripts whose Assembly AI transcript is already on GCS
+    file_names = list(gcs_transcripts)
+    existing_transcripts = {
+        file_name
+        for file_name, exists in zip(
+            file_names,
+            GCSClient.exists_many(
+                [get_aai_transcript_file_name(f) for f in file_names]
+            ),
+        )
+        if exists
+    }
     curr_url = "https://api.assemblyai.com/v2/transcript?limit=200&status=completed"
     urls = set()
     while curr_url:
@@ -93,13 +99,16 @@ def process_aai_transcripts(gcs_transcripts: Dict[str, str]) -> None:
                     file_name = match_aai_transcript_to_gcs_transcript(
                         aai_transcript["text"], gcs_transcripts
                     )
-                    if file_name:
+                    if file_name in existing_transcripts:
+                        print("File already exists, skipping!")
+                    elif file_name:
                         print(
                             "Matched transcript id: {} to file: {}".format(
                                 t["id"], file_name
                             )
                         )
                         save_assembly_ai_transcript(aai_transcript, file_name)
+                        existing_transcripts.add(file_name)
                     else:
                         print(
                             "Failed to match transcript id: {} to any gcs file".format(
@@ -21,8 +21,7 @@ def main():
         total_words = 0
         file_count = 0
         max_file_size = 0
-        for t in text_files:
-            text = GCSClient.download_textfile_as_string(t)
+        for text in GCSClient.read_texts(text_files):
             total_words += len(text.split())
             file_count += 1
             max_file_size = max(max_file_size, len(text.split()))
@@ -34,8 +33,8 @@ def main():
 
         chapters_count = 0
         max_chapter_size = 0
-        for cf in chapterized_files:
-            chapters = json.loads(GCSClient.download_textfile_as_string(cf))
+        for chapterized_text in GCSClient.read_texts(chapterized_files):
+            chapters = json.loads(chapterized_text)
             for chapter_content in chapters.values():
                 chapters_count += 1
                 num_words = len(chapter_content.split())
@@ -63,6 +62,9 @@ def main():
             )
         )
 
+    if GCSClient.mirror() is not None:
+        print(GCSClient.mirror().report())
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,219 @@
+# System Imports
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+"""
+Local read-through mirror of GCS objects, so tools that read the same artifacts
+on every run (eg. chapterized transcripts, passages and metadata) download each
+object only once per generation.
+
+Objects are stored on local disk keyed by name and generation. GCS gives an
+object a new generation every time it is overwritten, so a cached copy is
+current exactly when its generation matches the object's. Generations come for
+free from bulk listings (GCSClient.list_blobs) and uploads, so reading a listed
+object that hasn't changed makes no request at all. A listed generation is only
+trusted by the next read of the object, since the object may be overwritten by
+another process afterwards. Other reads revalidate with a metadata request,
+which is much cheaper than a download, so long-running processes (eg. the web
+app) see every new generation.
+
+The mirror holds at most GCS_MIRROR_MAX_MB megabytes, evicting the least
+recently read objects first. Set it to 0 to disable the mirror. It is shared by
+all tools and processes on the machine, under GCS_MIRROR_FOLDER.
+"""
+
+MIRROR_FOLDER_ENV_VAR = "GCS_MIRROR_FOLDER"
+DEFAULT_MIRROR_FOLDER = os.path.join(
+    os.path.expanduser("~"), ".cache", "podcast_gpt", "gcs_mirror"
+)
+MIRROR_MAX_MB_ENV_VAR = "GCS_MIRROR_MAX_MB"
+DEFAULT_MIRROR_MAX_MB = 2048
+INDEX_FILENAME = "index.sqlite"
+
+
+def mirror_settings() -> Optional["GCSMirror"]:
+    """
+    returns:
+            The mirror configured by GCS_MIRROR_FOLDER and GCS_MIRROR_MAX_MB,
+            or None if it is disabled
+    """
+    max_mb = int(os.environ.get(MIRROR_MAX_MB_ENV_VAR, DEFAULT_MIRROR_MAX_MB))
+    if max_mb < 0:
+        raise ValueError("GCS mirror size must not be negative: {}".format(max_mb))
+    if max_mb == 0:
+        return None
+
+    return GCSMirror(
+        os.environ.get(MIRROR_FOLDER_ENV_VAR, DEFAULT_MIRROR_FOLDER),
+        max_mb * 2**20,
+    )
+
+
+class GCSMirror:
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # The generation of objects just listed or uploaded, until they are read
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited from a forked parent process must not be used
+        if self._connection is None or self._connection_pid != os.getpid():
+            os.makedirs(self.folder, exist_ok=True)
+            self._connection = sqlite3.connect(
+                os.path.join(self.folder, INDEX_FILENAME),
+                check_same_thread=False,
+                timeout=30,
+            )
+            self._connection_pid = os.getpid()
+            # Losing the last few index updates in a crash only costs downloads
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS objects (
+                    path TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_read REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS objects_by_last_read
+                    ON objects (last_read);
+                """
+            )
+            self._connection.commit()
+
+        return self._connection
+
+    def _local_path(self, path: str, generation: int) -> str:
+        return os.path.join(
+            self.folder,
+            "{}-{}".format(
+                hashlib.sha256(path.encode("utf-8")).hexdigest(), generation
+            ),
+        )
+
+    def _remove(self, path: str, generation: int) -> None:
+        try:
+            os.remove(self._local_path(path, generation))
+        except FileNotFoundError:
+            pass
+
+    def pop_generation(self, path: str) -> Optional[int]:
+        """
+        returns:
+                The generation of an object listed or uploaded since it was last
+                read, or None if it has to be revalidated
+        """
+        return self._generations.pop(path, None)
+
+    def remember(self, path: str, generation: int) -> None:
+        """Notes the current generation of a listed or uploaded object"""
+        self._generations[path] = generation
+
+    def get(self, path: str, generation: int) -> Optional[bytes]:
+        """
+        returns:
+                The cached contents of the given generation of an object, or None
+                if they aren't cached
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT generation FROM objects WHERE path = ?", [path]
+            ).fetchone()
+            try:
+                if row is None or row[0] != generation:
+                    raise FileNotFoundError(path)
+                with open(self._local_path(path, generation), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+
+            connection.execute(
+                "UPDATE objects SET last_read = ? WHERE path = ?", [time.time(), path]
+            )
+            connection.commit()
+            self.hits += 1
+
+        return data
+
+    def put(self, path: str, generation: int, data: bytes) -> None:
+        """Caches the contents of a generation of an object, replacing older ones"""
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            local_path = self._local_path(path, generation)
+            # Written under a temporary name, so other processes never read a
+            # partial file
+            temp_path = "{}.{}.tmp".format(local_path, os.getpid())
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, local_path)
+
+            row = connection.execute(
+                "SELECT generation FROM objects WHERE path = ?", [path]
+            ).fetchone()
+            if row is not None and row[0] != generation:
+                self._remove(path, row[0])
+            connection.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)",
+                [path, generation, len(data), time.time()],
+            )
+            self._evict(connection)
+            connection.commit()
+
+    def forget(self, path: str) -> None:
+        """Drops a deleted object from the mirror"""
+        self._generations.pop(path, None)
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT generation FROM objects WHERE path = ?", [path]
+            ).fetchone()
+            if row is not None:
+                self._remove(path, row[0])
+                connection.execute("DELETE FROM objects WHERE path = ?", [path])
+                connection.commit()
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        # Evicts the least recently read objects until the mirror fits its cap
+        total_bytes = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM objects"
+        ).fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        evicted = []
+        for path, generation, size in connection.execute(
+            "SELECT path, generation, size FROM objects ORDER BY last_read"
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            evicted.append((path, generation))
+            total_bytes -= size
+
+        for path, generation in evicted:
+            self._remove(path, generation)
+        connection.executemany(
+            "DELETE FROM objects WHERE path = ?", [[path] for path, _ in evicted]
+        )
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        return "GCS mirror: {} hits, {} misses ({:.1f}% hit rate)".format(
+            self.hits, self.misses, 100 * self.hits / total if total else 0.0
+        )
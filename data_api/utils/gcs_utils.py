@@ -1,45 +1,334 @@
 # System Imports
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import mimetypes
+import os
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+# Third Party Imports
+from google.cloud.storage.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
 
 # Package Imports
+from data_api.utils.gcs_mirror import GCSMirror, mirror_settings
+from data_api.utils.text_compression import (
+    compress,
+    content_encoding,
+    decompress,
+    text_compression,
+)
 from google_client_provider import GoogleClientProvider
 
+# The number of threads of the bulk transfer methods
+TRANSFER_WORKERS_ENV_VAR = "GCS_TRANSFER_WORKERS"
+DEFAULT_TRANSFER_WORKERS = 16
+
+# Files larger than this (eg. audio) are uploaded in chunks, and an interrupted
+# upload resumes from the last chunk GCS received. Interrupted downloads are
+# resumed from the last byte received by the storage library itself. Streamed
+# uploads are always chunked.
+CHUNKED_UPLOAD_THRESHOLD_BYTES = 16 * 2**20
+# Must be a multiple of 256 KiB
+UPLOAD_CHUNK_BYTES = 8 * 2**20
+
+
+@dataclass
+class BlobInfo:
+    """A GCS object, as uploaded or listed"""
+
+    # The object's path in the bucket
+    path: str
+
+    # The object's size in bytes
+    size: int
+
+    # Changes every time the object is overwritten
+    generation: int
+
+    # How the stored data is compressed, eg. "zstd" (None if it isn't)
+    content_encoding: Optional[str] = None
+
+    @classmethod
+    def from_blob(cls, blob) -> "BlobInfo":
+        return cls(
+            path=blob.name,
+            size=blob.size,
+            generation=blob.generation,
+            content_encoding=blob.content_encoding,
+        )
+
 
 class GCSClient:
 
-    client_provider = GoogleClientProvider()
+    # Connected on first use, so that processes which never touch GCS (eg. the
+    # web app with a local vector store) start without Google credentials
+    _client_provider = None
+
+    # The local mirror that downloads read through (None when it is disabled)
+    _mirror = None
+    _mirror_configured = False
+
+    @classmethod
+    def transfer_workers(cls) -> int:
+        return int(os.environ.get(TRANSFER_WORKERS_ENV_VAR, DEFAULT_TRANSFER_WORKERS))
+
+    @classmethod
+    def bucket(cls):
+        if cls._client_provider is None:
+            cls._client_provider = GoogleClientProvider()
+            # All transfer threads share the client's session, so its pool keeps
+            # a connection open for each of them
+            cls._client_provider.STORAGE_CLIENT._http.mount(
+                "https://", HTTPAdapter(pool_maxsize=cls.transfer_workers())
+            )
+        return cls._client_provider.DATA_BUCKET
+
+    @classmethod
+    def mirror(cls) -> Optional[GCSMirror]:
+        if not cls._mirror_configured:
+            cls._mirror = mirror_settings()
+            cls._mirror_configured = True
+        return cls._mirror
+
+    @classmethod
+    def _remember(cls, blob: BlobInfo, data: Optional[bytes] = None) -> BlobInfo:
+        # Uploaded contents are mirrored, so reading them back is free
+        mirror = cls.mirror()
+        if mirror is not None:
+            mirror.remember(blob.path, blob.generation)
+            if data is not None:
+                mirror.put(blob.path, blob.generation, data)
+        return blob
+
+    @classmethod
+    def _download_bytes(cls, filepath: str) -> bytes:
+        # Objects are downloaded (and mirrored) as stored, so GCS never
+        # decompresses gzip encoded text before sending it
+        mirror = cls.mirror()
+        if mirror is None:
+            return cls.bucket().blob(filepath).download_as_bytes(raw_download=True)
+
+        generation = mirror.pop_generation(filepath)
+        if generation is None:
+            # Not just listed or uploaded: revalidate with a metadata request
+            blob = cls.bucket().get_blob(filepath)
+            generation = blob.generation if blob is not None else None
+
+        data = mirror.get(filepath, generation) if generation is not None else None
+        if data is None:
+            blob = cls.bucket().blob(filepath)
+            data = blob.download_as_bytes(raw_download=True)
+            mirror.put(filepath, blob.generation, data)
+
+        return data
+
+    @classmethod
+    def blob_info(cls, filepath: str) -> Optional[BlobInfo]:
+        """An object's size and generation (a metadata request), or None if it doesn't exist"""
+        blob = cls.bucket().get_blob(filepath)
+        return BlobInfo.from_blob(blob) if blob is not None else None
 
     @classmethod
     def file_exists(cls, filepath: str) -> bool:
-        return cls.client_provider.DATA_BUCKET.blob(filepath).exists()
+        return cls.bucket().blob(filepath).exists()
 
     @classmethod
-    def upload_file(cls, filepath: str) -> None:
+    def upload_file(cls, filepath: str) -> BlobInfo:
         print("Uploading to GCS: {}".format(filepath))
-        cls.client_provider.DATA_BUCKET.blob(filepath).upload_from_filename(filepath)
+        if os.path.getsize(filepath) > CHUNKED_UPLOAD_THRESHOLD_BYTES:
+            # Overwriting with the same contents is idempotent, so chunks are
+            # retried even without a generation precondition
+            blob = cls.bucket().blob(filepath, chunk_size=UPLOAD_CHUNK_BYTES)
+            blob.upload_from_filename(filepath, retry=DEFAULT_RETRY)
+        else:
+            blob = cls.bucket().blob(filepath)
+            blob.upload_from_filename(filepath)
+        return cls._remember(BlobInfo.from_blob(blob))
 
     @classmethod
-    def list_files(cls, prefix: str, extension: str) -> List[str]:
+    def upload_stream(cls, filepath: str, stream: BinaryIO) -> BlobInfo:
+        """
+        Uploads everything read from a stream, eg. an HTTPStream, without a
+        local copy. The stream is read and uploaded one chunk at a time, and an
+        upload that fails midway is not finalized, so it never leaves a partial
+        object.
+        """
+        print("Streaming to GCS: {}".format(filepath))
+        blob = cls.bucket().blob(filepath, chunk_size=UPLOAD_CHUNK_BYTES)
+        blob.upload_from_file(
+            stream,
+            content_type=mimetypes.guess_type(filepath)[0],
+            retry=DEFAULT_RETRY,
+        )
+        return cls._remember(BlobInfo.from_blob(blob))
+
+    @classmethod
+    def list_blobs(cls, prefix: str, extension: str) -> List[BlobInfo]:
+        # The extension is matched by GCS, and only the listed fields are sent.
+        # The listed generations let the mirror serve unchanged objects without
+        # revalidating them.
         return [
-            f.name
-            for f in cls.client_provider.DATA_BUCKET.list_blobs(prefix=prefix)
-            if f.name.endswith(extension)
+            cls._remember(BlobInfo.from_blob(blob))
+            for blob in cls.bucket().list_blobs(
+                prefix=prefix,
+                match_glob="{}**{}".format(prefix, extension),
+                fields="items(name,size,generation,contentEncoding),nextPageToken",
+            )
         ]
 
+    @classmethod
+    def list_files(cls, prefix: str, extension: str) -> List[str]:
+        return [blob.path for blob in cls.list_blobs(prefix, extension)]
+
     # Use this for audio files
     @classmethod
-    def download_file(cls, filepath: str) -> None:
-        cls.client_provider.DATA_BUCKET.blob(filepath).download_to_filename(filepath)
+    def download_file(cls, filepath: str, local_path: Optional[str] = None) -> None:
+        # Downloads to the same relative path locally unless local_path is given
+        cls.bucket().blob(filepath).download_to_filename(local_path or filepath)
 
     @classmethod
     def download_textfile_as_string(cls, filepath: str) -> str:
-        return cls.client_provider.DATA_BUCKET.blob(filepath).download_as_text()
+        # Compressed text is decompressed whatever the current compression setting
+        return decompress(cls._download_bytes(filepath)).decode("utf-8")
 
     @classmethod
-    def upload_string_as_textfile(cls, filepath: str, string: str) -> None:
+    def upload_string_as_textfile(
+        cls, filepath: str, string: str, compression: Optional[str] = None
+    ) -> BlobInfo:
+        """
+        Uploads a string as a text file, compressed with the given compression
+        (GCS_TEXT_COMPRESSION by default)
+        """
         print("Uploading to GCS: {}".format(filepath))
-        cls.client_provider.DATA_BUCKET.blob(filepath).upload_from_string(string)
+        compression = compression or text_compression()
+        data = compress(string.encode("utf-8"), compression)
+        blob = cls.bucket().blob(filepath)
+        blob.content_encoding = content_encoding(compression)
+        blob.upload_from_string(data, content_type="text/plain")
+        return cls._remember(BlobInfo.from_blob(blob), data)
+
+    @classmethod
+    def download_as_bytes(cls, filepath: str) -> bytes:
+        return cls._download_bytes(filepath)
+
+    @classmethod
+    def upload_bytes(cls, filepath: str, data: bytes) -> BlobInfo:
+        print("Uploading to GCS: {}".format(filepath))
+        blob = cls.bucket().blob(filepath)
+        blob.upload_from_string(data, content_type="application/octet-stream")
+        return cls._remember(BlobInfo.from_blob(blob), data)
 
     @classmethod
     def delete_file(cls, filepath: str) -> None:
-        cls.client_provider.DATA_BUCKET.blob(filepath).delete()
+        cls.bucket().blob(filepath).delete()
+        if cls.mirror() is not None:
+            cls.mirror().forget(filepath)
+
+    @classmethod
+    def _transfer_many(
+        cls,
+        description: str,
+        transfer: Callable[[Any], Tuple[Any, int]],
+        items: List[Any],
+    ) -> List[Any]:
+        """
+        Runs transfers on a thread pool and prints their throughput
+
+        params:
+                description:
+                        What the transfers do, eg. "Downloaded"
+                transfer:
+                        Transfers one item, returning (result, bytes transferred)
+                items:
+                        The items to transfer
+
+        returns:
+                The results, in the order of the items
+        """
+        if not items:
+            return []
+
+        # Connected before the threads start, so they share one client and mirror
+        cls.bucket()
+        cls.mirror()
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=cls.transfer_workers()) as executor:
+            results = list(executor.map(transfer, items))
+        seconds = max(time.perf_counter() - start_time, 1e-9)
+
+        megabytes = sum(num_bytes for _, num_bytes in results) / 2**20
+        print(
+            "{} {} objects ({:.1f} MB) in {:.2f}s: {:.1f} objects/s, {:.1f} MB/s".format(
+                description,
+                len(results),
+                megabytes,
+                seconds,
+                len(results) / seconds,
+                megabytes / seconds,
+            )
+        )
+
+        return [result for result, _ in results]
+
+    @classmethod
+    def exists_many(cls, filepaths: List[str]) -> List[bool]:
+        return cls._transfer_many(
+            "Checked", lambda filepath: (cls.file_exists(filepath), 0), filepaths
+        )
+
+    @classmethod
+    def download_many(
+        cls, filepaths: List[str], local_paths: Optional[List[str]] = None
+    ) -> None:
+        """Downloads files to the same relative paths locally, or to local_paths"""
+
+        def download(paths: Tuple[str, str]) -> Tuple[None, int]:
+            cls.download_file(*paths)
+            return None, os.path.getsize(paths[1])
+
+        cls._transfer_many(
+            "Downloaded", download, list(zip(filepaths, local_paths or filepaths))
+        )
+
+    @classmethod
+    def upload_many(cls, filepaths: List[str]) -> List[BlobInfo]:
+        def upload(filepath: str) -> Tuple[BlobInfo, int]:
+            blob = cls.upload_file(filepath)
+            return blob, blob.size
+
+        return cls._transfer_many("Uploaded", upload, filepaths)
+
+    @classmethod
+    def read_texts(cls, filepaths: List[str]) -> List[str]:
+        """Reads text files, through the mirror"""
+
+        def read(filepath: str) -> Tuple[str, int]:
+            data = cls._download_bytes(filepath)
+            return decompress(data).decode("utf-8"), len(data)
+
+        return cls._transfer_many("Read", read, filepaths)
+
+    @classmethod
+    def upload_texts(
+        cls, texts: Dict[str, str], compression: Optional[str] = None
+    ) -> List[BlobInfo]:
+        """
+        Uploads strings as text files
+
+        params:
+                texts:
+                        The contents of each file, by file path
+                compression:
+                        As for upload_string_as_textfile
+
+        returns:
+                The uploaded objects, in the order of texts
+        """
+
+        def upload(item: Tuple[str, str]) -> Tuple[BlobInfo, int]:
+            blob = cls.upload_string_as_textfile(*item, compression)
+            return blob, blob.size
+
+        return cls._transfer_many("Uploaded", upload, list(texts.items()))
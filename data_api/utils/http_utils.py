@@ -0,0 +1,168 @@
+# System Imports
+import io
+import random
+import re
+import time
+from typing import Iterator, Optional
+
+# Third Party Imports
+import requests
+
+"""
+Streaming HTTP downloads that resume after interruptions, for piping large
+files (eg. episode audio) straight into GCS.
+"""
+
+# The size of the pieces read from the connection
+DOWNLOAD_CHUNK_BYTES = 2**20
+
+# Retry settings for interrupted downloads. A download that keeps making
+# progress is resumed any number of times.
+MAX_RETRIES = 6
+INITIAL_BACKOFF_SECONDS = 1.0
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Seconds to wait for the connection and between received bytes
+TIMEOUT_SECONDS = 60
+
+# eg. "bytes 1000-1999/5000" (the total may be "*")
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, requests.exceptions.HTTPError):
+        return e.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(e, RETRYABLE_ERRORS)
+
+
+class HTTPStream(io.RawIOBase):
+    """
+    A read-only file over the body of a GET request, holding at most one
+    DOWNLOAD_CHUNK_BYTES piece at a time.
+
+    When the connection drops, the download is resumed from the last byte
+    received with a Range request. Servers that ignore the range send the
+    whole body again, and the bytes already received are skipped.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        # The bytes handed to readers, and the bytes received from the server
+        self._position = 0
+        self._received = 0
+        # The size of the body, if the server sent it
+        self._total: Optional[int] = None
+        self._pending = b""
+        self._response: Optional[requests.Response] = None
+        self._chunks: Optional[Iterator[bytes]] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def _open(self) -> Iterator[bytes]:
+        # Compressed transfers would make the range offsets differ from the
+        # offsets of the received bytes
+        headers = {"Accept-Encoding": "identity"}
+        if self._received:
+            headers["Range"] = "bytes={}-".format(self._received)
+        self._response = requests.get(
+            self.url, headers=headers, stream=True, timeout=TIMEOUT_SECONDS
+        )
+        self._response.raise_for_status()
+
+        skip = 0
+        content_range = CONTENT_RANGE_PATTERN.match(
+            self._response.headers.get("Content-Range", "")
+        )
+        if self._response.status_code == 206 and content_range is not None:
+            if int(content_range.group(1)) != self._received:
+                raise ValueError(
+                    "Expected bytes from {} of {}, got: {}".format(
+                        self._received, self.url, content_range.group(0)
+                    )
+                )
+            if content_range.group(2) != "*":
+                self._total = int(content_range.group(2))
+        else:
+            skip = self._received
+            if "Content-Length" in self._response.headers:
+                self._total = int(self._response.headers["Content-Length"])
+
+        return self._receive(skip)
+
+    def _receive(self, skip: int) -> Iterator[bytes]:
+        for chunk in self._response.iter_content(DOWNLOAD_CHUNK_BYTES):
+            if skip:
+                skipped = min(skip, len(chunk))
+                chunk = chunk[skipped:]
+                skip -= skipped
+            if chunk:
+                self._received += len(chunk)
+                yield chunk
+
+        if self._total is not None and self._received < self._total:
+            raise requests.exceptions.ConnectionError(
+                "Connection closed after {} of {} bytes".format(
+                    self._received, self._total
+                )
+            )
+
+    def _close_response(self) -> None:
+        if self._response is not None:
+            self._response.close()
+        self._response = None
+        self._chunks = None
+
+    def _next_chunk(self) -> bytes:
+        """The next piece of the body, or b"" at its end"""
+        backoff = INITIAL_BACKOFF_SECONDS
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                if self._chunks is None:
+                    self._chunks = self._open()
+                return next(self._chunks, b"")
+            except Exception as e:
+                self._close_response()
+                if attempt == MAX_RETRIES or not is_retryable(e):
+                    raise e
+
+                print(
+                    "Download of {} interrupted after {} bytes ({}), resuming".format(
+                        self.url, self._received, e
+                    )
+                )
+                time.sleep(backoff * (1 + random.random()))
+                backoff *= 2
+
+    def read(self, size: int = -1) -> bytes:
+        # Returns fewer than size bytes only at the end of the body, which is how
+        # resumable uploads detect their last chunk
+        pieces = []
+        num_read = 0
+        while size < 0 or num_read < size:
+            if not self._pending:
+                self._pending = self._next_chunk()
+                if not self._pending:
+                    break
+
+            num_bytes = len(self._pending)
+            if size >= 0:
+                num_bytes = min(num_bytes, size - num_read)
+            pieces.append(self._pending[:num_bytes])
+            self._pending = self._pending[num_bytes:]
+            num_read += num_bytes
+
+        self._position += num_read
+        return b"".join(pieces)
+
+    def close(self) -> None:
+        self._close_response()
+        super().close()
@@ -0,0 +1,366 @@
+# System Imports
+import bisect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+"""
+Per-request latency breakdown for the /get endpoint.
+
+A request's measurements are collected in a RequestMetrics object that is made
+current (with a context variable, so it follows the request's greenlet or asyncio
+task) for the duration of the request. Code on the request path records into it
+with record_request_value / time_request_value, which do nothing outside of a
+request (eg. on the command line). When the request ends its measurements are
+added to process-wide histograms, exposed in the Prometheus text format by
+Metrics.render, and logged as one JSON line.
+
+Server workers are separate processes, so each one also writes its histograms
+and counters to its own file in METRICS_DIR, from a background thread every
+METRICS_FLUSH_SECONDS. Metrics.render sums the files of the running workers of
+the same server (identified by METRICS_SERVER_ID), so /metrics reports the same
+totals whichever worker serves it.
+"""
+
+METRIC_PREFIX = "podcast_gpt_"
+LATENCY_BUCKETS_SECONDS = [
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+]
+TOKEN_BUCKETS = [500, 1000, 2000, 4000, 8000, 12000, 16000]
+CHUNK_BUCKETS = [10, 50, 100, 250, 500, 1000, 2000]
+
+# The folder where workers share their metrics
+METRICS_DIR_ENV_VAR = "METRICS_DIR"
+DEFAULT_METRICS_DIR = os.path.join(tempfile.gettempdir(), "podcast_gpt_metrics")
+
+# Identifies the server whose workers share their metrics. The gunicorn master
+# sets it on startup (see gunicorn.conf.py). Without it, every process reports
+# only its own metrics.
+SERVER_ID_ENV_VAR = "METRICS_SERVER_ID"
+
+# Seconds between two writes of a worker's metrics file
+FLUSH_SECONDS_ENV_VAR = "METRICS_FLUSH_SECONDS"
+DEFAULT_FLUSH_SECONDS = 5
+
+# Fields of a histogram in a worker's metrics file
+COUNTS_KEY = "counts"
+SUM_KEY = "sum"
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running as another user
+        return True
+    return True
+
+
+class Histogram:
+    """A thread-safe cumulative histogram with fixed bucket upper bounds"""
+
+    def __init__(self, name: str, description: str, buckets: List[float]):
+        self.name = METRIC_PREFIX + name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {COUNTS_KEY: list(self._counts), SUM_KEY: self._sum}
+
+    def render(self, snapshots: List[Dict]) -> List[str]:
+        """Renders the sum of snapshots of this histogram from several processes"""
+        counts = [sum(c) for c in zip(*(s[COUNTS_KEY] for s in snapshots))]
+        total = sum(s[SUM_KEY] for s in snapshots)
+
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} histogram".format(self.name),
+        ]
+        cumulative = 0
+        for bound, count in zip(self.buckets + ["+Inf"], counts):
+            cumulative += count
+            lines.append('{}_bucket{{le="{}"}} {}'.format(self.name, bound, cumulative))
+        lines.append("{}_sum {}".format(self.name, total))
+        lines.append("{}_count {}".format(self.name, cumulative))
+        return lines
+
+
+@dataclass
+class RequestMetrics:
+    """Measurements for one /get request. Fields are None if not measured."""
+
+    # Time spent on the question's embeddings API call (None on a query cache hit)
+    embedding_seconds: Optional[float] = None
+
+    # Time spent searching the vector store (None on a query cache hit)
+    vector_search_seconds: Optional[float] = None
+
+    # The number of tokens in the GPT-4 prompt
+    prompt_tokens: Optional[int] = None
+
+    # Time from the start of the request until the first non-empty answer chunk
+    time_to_first_token_seconds: Optional[float] = None
+
+    # Time from the start of the answer stream until its end
+    stream_seconds: Optional[float] = None
+
+    # The number of non-empty answer chunks sent
+    num_chunks: int = 0
+
+    # Whether the request joined another request's in-flight answer
+    coalesced: bool = False
+
+    # Whether the whole answer was sent before the client disconnected
+    completed: bool = False
+
+    def __post_init__(self):
+        self._start_time = time.perf_counter()
+        self._stream_start_time = None
+
+    def stream_started(self) -> None:
+        self._stream_start_time = time.perf_counter()
+
+    def record_chunk(self, content: Optional[str]) -> None:
+        if not content:
+            return
+
+        if self.num_chunks == 0:
+            self.time_to_first_token_seconds = time.perf_counter() - self._start_time
+        self.num_chunks += 1
+
+    def finish(self, completed: bool) -> None:
+        """Adds the measurements to the histograms and logs them"""
+        self.completed = completed
+        if self._stream_start_time is not None:
+            self.stream_seconds = time.perf_counter() - self._stream_start_time
+
+        Metrics.observe(self)
+        print(
+            json.dumps(
+                dict(
+                    asdict(self),
+                    event="request",
+                    total_seconds=time.perf_counter() - self._start_time,
+                )
+            )
+        )
+
+
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def start_request() -> RequestMetrics:
+    """Starts collecting measurements for the current request"""
+    request_metrics = RequestMetrics()
+    _current_request.set(request_metrics)
+    return request_metrics
+
+
+def record_request_value(field: str, value) -> None:
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        setattr(request_metrics, field, value)
+
+
+@contextmanager
+def time_request_value(field: str) -> Iterator[None]:
+    """Records the time spent in the with block as field of the current request"""
+    start = time.perf_counter()
+    yield
+    record_request_value(field, time.perf_counter() - start)
+
+
+class Metrics:
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    # Histograms by the RequestMetrics field they are observed from
+    histograms = {
+        "embedding_seconds": Histogram(
+            "embedding_seconds",
+            "Latency of the question embeddings API call",
+            LATENCY_BUCKETS_SECONDS,
+        ),
+        "vector_search_seconds": Histogram(
+            "vector_search_seconds",
+            "Latency of the vector store search",
+            LATENCY_BUCKETS_SECONDS,
+        ),
+        "prompt_tokens": Histogram(
+            "prompt_tokens", "Number of tokens in the GPT-4 prompt", TOKEN_BUCKETS
+        ),
+        "time_to_first_token_seconds": Histogram(
+            "time_to_first_token_seconds",
+            "Time from the start of a request to its first answer chunk",
+            LATENCY_BUCKETS_SECONDS,
+        ),
+        "stream_seconds": Histogram(
+            "stream_seconds", "Duration of the answer stream", LATENCY_BUCKETS_SECONDS
+        ),
+        "num_chunks": Histogram(
+            "stream_chunks", "Number of answer chunks sent per request", CHUNK_BUCKETS
+        ),
+    }
+
+    # Additional counter values to export by metric name (without the metric
+    # prefix), see set_counters
+    counters: Callable[[], Dict[str, float]] = dict
+
+    _write_lock = threading.Lock()
+    _writer_pid = None
+
+    @classmethod
+    def set_counters(cls, counters: Callable[[], Dict[str, float]]) -> None:
+        cls.counters = counters
+
+    @classmethod
+    def _root_folder(cls) -> str:
+        return os.environ.get(METRICS_DIR_ENV_VAR, DEFAULT_METRICS_DIR)
+
+    @classmethod
+    def _folder(cls) -> str:
+        return os.path.join(
+            cls._root_folder(),
+            os.environ.get(SERVER_ID_ENV_VAR, str(os.getpid())),
+        )
+
+    @classmethod
+    def _write(cls) -> None:
+        """Writes this process's histograms and counters to its metrics file"""
+        metrics = {
+            "histograms": {
+                field: histogram.snapshot()
+                for field, histogram in cls.histograms.items()
+            },
+            "counters": cls.counters(),
+        }
+        folder = cls._folder()
+        path = os.path.join(folder, "{}.json".format(os.getpid()))
+        with cls._write_lock:
+            os.makedirs(folder, exist_ok=True)
+            # Readers only ever see complete files
+            with open(path + ".tmp", "w") as f:
+                json.dump(metrics, f)
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def _run_writer(cls) -> None:
+        flush_seconds = float(
+            os.environ.get(FLUSH_SECONDS_ENV_VAR, DEFAULT_FLUSH_SECONDS)
+        )
+        while True:
+            time.sleep(flush_seconds)
+            try:
+                cls._write()
+            except Exception as e:
+                print("Could not write metrics: {}".format(e))
+
+    @classmethod
+    def _start_writer(cls) -> None:
+        # Threads don't survive a fork, so each worker starts its own
+        with cls._write_lock:
+            if cls._writer_pid == os.getpid():
+                return
+            cls._writer_pid = os.getpid()
+
+        threading.Thread(target=cls._run_writer, daemon=True).start()
+
+    @classmethod
+    def _remove_exited(cls) -> None:
+        """Deletes the metrics files of exited processes, and folders left empty"""
+        root_folder = cls._root_folder()
+        for server_id in os.listdir(root_folder):
+            folder = os.path.join(root_folder, server_id)
+            for filename in os.listdir(folder):
+                pid = filename.split(".")[0]
+                if pid.isdigit() and not is_running(int(pid)):
+                    try:
+                        os.remove(os.path.join(folder, filename))
+                    except FileNotFoundError:
+                        pass
+
+            try:
+                os.rmdir(folder)
+            except OSError:
+                # Not empty, or already removed
+                pass
+
+    @classmethod
+    def _read_all(cls) -> List[Dict]:
+        """The metrics files of every running worker of this server"""
+        cls._remove_exited()
+        folder = cls._folder()
+        all_metrics = []
+        for filename in os.listdir(folder):
+            if filename.endswith(".json"):
+                with open(os.path.join(folder, filename)) as f:
+                    all_metrics.append(json.load(f))
+
+        return all_metrics
+
+    @classmethod
+    def observe(cls, request_metrics: RequestMetrics) -> None:
+        for field, histogram in cls.histograms.items():
+            value = getattr(request_metrics, field)
+            if value is not None:
+                histogram.observe(value)
+
+        cls._start_writer()
+
+    @classmethod
+    def render(cls) -> str:
+        """
+        Renders every histogram and counter, summed over the server's workers, in
+        the Prometheus text exposition format. Reads and writes files, so call it
+        off the event loop.
+        """
+        cls._write()
+        all_metrics = cls._read_all()
+
+        lines = []
+        for field, histogram in cls.histograms.items():
+            lines.extend(
+                histogram.render([m["histograms"][field] for m in all_metrics])
+            )
+
+        counters = {}
+        for metrics in all_metrics:
+            for name, value in metrics["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+
+        for name, value in counters.items():
+            lines.append("# TYPE {}{} counter".format(METRIC_PREFIX, name))
+            lines.append("{}{} {}".format(METRIC_PREFIX, name, value))
+
+        return "\n".join(lines) + "\n"
@@ -4,7 +4,13 @@ from concurrent.futures import (
     Future,
     ProcessPoolExecutor,
 )
-from typing import List
+from typing import Iterator, List
+
+
+def batched(items: List, size: int) -> Iterator[List]:
+    """Splits items into consecutive lists of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
 
 
 class ParallelProcessExecutor:
@@ -12,9 +12,22 @@ class Paths:
     QA_PAIRS_FOLDER = "qa_pairs"
     TXT_EXT = ".txt"
     JSON_EXT = ".json"
+    JSONL_EXT = ".jsonl"
+    NPY_EXT = ".npy"
+    NPZ_EXT = ".npz"
+    # The monolithic vector database, superseded by VECTOR_DB_FOLDER
     VECTOR_DB_PATH = "vector_db" + JSON_EXT
+    VECTOR_DB_FOLDER = "vector_db"
+    IVF_INDEX_PATH = "vector_db_ivf" + NPZ_EXT
+    BINARY_INDEX_FOLDER = "vector_db_bin"
+    # Records the last sync of the vector database to Qdrant
+    QDRANT_SYNC_PATH = "qdrant_sync" + JSON_EXT
+    EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
     METADATA_SUFFIX = "metadata"
     CHAPTERIZED_DATA_FOLDER = "chapterized_data"
+    PASSAGES_FOLDER = "passages"
+    PIPELINE_MANIFEST_FOLDER = "pipeline_manifests"
+    SQLITE_EXT = ".sqlite"
 
     @classmethod
     def get_title_from_path(cls, path: str) -> str:
@@ -89,6 +102,14 @@ class Paths:
             cls.get_chapterized_data_folder(podcast_name), title + cls.JSON_EXT
         )
 
+    @classmethod
+    def get_passages_folder(cls, podcast_name: str) -> str:
+        return os.path.join(cls.get_text_data_folder(podcast_name), cls.PASSAGES_FOLDER)
+
+    @classmethod
+    def get_passages_path(cls, podcast_name: str, title: str) -> str:
+        return os.path.join(cls.get_passages_folder(podcast_name), title + cls.JSON_EXT)
+
     @classmethod
     def get_metadata_file_name_for_title(cls, title: str) -> str:
         # Gets the file name (not full path) for a given episode title
@@ -108,3 +129,8 @@ class Paths:
             cls.get_text_data_folder(podcast_name),
             cls.QA_PAIRS_FOLDER,
         )
+
+    @classmethod
+    def get_pipeline_manifest_path(cls, podcast_name: str) -> str:
+        # Not under the podcast's folder, which stages delete when they finish
+        return os.path.join(cls.PIPELINE_MANIFEST_FOLDER, podcast_name + cls.SQLITE_EXT)
@@ -0,0 +1,326 @@
+# System Imports
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Package Imports
+from data_api.utils.file_utils import create_temp_local_directory
+from data_api.utils.gcs_utils import BlobInfo, GCSClient
+from data_api.utils.paths import Paths
+
+"""
+Per-podcast record of the data pipeline's artifacts and the status of each stage
+for each episode, so stages can find their pending episodes without listing GCS.
+
+The manifest is a local SQLite file mirrored to GCS at the same path. It holds:
+    artifacts:
+        One row per (episode title, artifact) that exists on GCS, with the
+        artifact's path, size and generation
+    stages:
+        One row per (episode title, stage). A stage is done once all of its output
+        artifacts exist, pending if it is not done and all of its input artifacts
+        exist, and waiting otherwise. Statuses are indexed, so listing a stage's
+        pending episodes reads only those rows.
+
+Stages record each artifact right after uploading it, and the pipeline uploads
+the manifest after each stage. PipelineManifest.reconcile rebuilds the manifest
+from GCS listings, eg. after artifacts were added or deleted by hand. Only one
+pipeline run may update a podcast's manifest at a time.
+"""
+
+
+class Artifact:
+    AUDIO = "audio"
+    METADATA = "metadata"
+    RAW_TRANSCRIPT = "raw_transcript"
+    SPEAKER_TRANSCRIPT = "speaker_transcript"
+    AAI_TRANSCRIPT = "aai_transcript"
+    CHAPTERIZED_TRANSCRIPT = "chapterized_transcript"
+    PASSAGES = "passages"
+
+
+class Stage:
+    DOWNLOAD = "download"
+    TRANSCRIBE = "transcribe"
+    CHAPTERIZE = "chapterize"
+    CHUNK = "chunk"
+
+    # The artifacts each stage reads and writes
+    INPUTS = {
+        DOWNLOAD: [],
+        TRANSCRIBE: [Artifact.AUDIO],
+        CHAPTERIZE: [Artifact.AAI_TRANSCRIPT, Artifact.METADATA],
+        CHUNK: [Artifact.AAI_TRANSCRIPT, Artifact.METADATA],
+    }
+    OUTPUTS = {
+        DOWNLOAD: [Artifact.AUDIO, Artifact.METADATA],
+        TRANSCRIBE: [
+            Artifact.RAW_TRANSCRIPT,
+            Artifact.SPEAKER_TRANSCRIPT,
+            Artifact.AAI_TRANSCRIPT,
+        ],
+        CHAPTERIZE: [Artifact.CHAPTERIZED_TRANSCRIPT],
+        CHUNK: [Artifact.PASSAGES],
+    }
+
+
+class Status:
+    WAITING = "waiting"
+    PENDING = "pending"
+    DONE = "done"
+
+
+def stage_status(stage: str, artifacts: Set[str]) -> str:
+    """The status of a stage for an episode that has the given artifacts"""
+    if all(a in artifacts for a in Stage.OUTPUTS[stage]):
+        return Status.DONE
+    if all(a in artifacts for a in Stage.INPUTS[stage]):
+        return Status.PENDING
+    return Status.WAITING
+
+
+class PipelineManifest:
+
+    def __init__(self, podcast_name: str):
+        self.podcast_name = podcast_name
+        self.filepath = Paths.get_pipeline_manifest_path(podcast_name)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def __getstate__(self):
+        # Stages run episodes in worker processes, which open their own connection
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_connection"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection inherited from a forked parent process must not be used
+        if self._connection is None or self._connection_pid != os.getpid():
+            create_temp_local_directory(os.path.dirname(self.filepath))
+            self._connection = sqlite3.connect(
+                self.filepath, check_same_thread=False, timeout=30
+            )
+            self._connection_pid = os.getpid()
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    title TEXT NOT NULL,
+                    artifact TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    generation INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (title, artifact)
+                );
+                CREATE TABLE IF NOT EXISTS stages (
+                    title TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    PRIMARY KEY (title, stage)
+                );
+                CREATE INDEX IF NOT EXISTS stages_by_status
+                    ON stages (stage, status, title);
+                """
+            )
+            self._connection.commit()
+
+        return self._connection
+
+    def _update_stages(self, connection: sqlite3.Connection, title: str) -> None:
+        artifacts = {
+            row[0]
+            for row in connection.execute(
+                "SELECT artifact FROM artifacts WHERE title = ?", [title]
+            )
+        }
+        connection.executemany(
+            "INSERT OR REPLACE INTO stages VALUES (?, ?, ?)",
+            [(title, stage, stage_status(stage, artifacts)) for stage in Stage.INPUTS],
+        )
+
+    def record(self, title: str, artifact: str, blob: BlobInfo) -> None:
+        """
+        Records an artifact of an episode that was just uploaded
+
+        params:
+                title:
+                        The episode title
+                artifact:
+                        One of the Artifact names
+                blob:
+                        The uploaded object, as returned by the GCSClient upload methods
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)",
+                [title, artifact, blob.path, blob.size, blob.generation, time.time()],
+            )
+            self._update_stages(connection, title)
+            connection.commit()
+
+    def titles(self, stage: str, status: str) -> List[str]:
+        """The titles of the episodes for which a stage has the given status"""
+        with self._lock:
+            return [
+                row[0]
+                for row in self._connect().execute(
+                    "SELECT title FROM stages WHERE stage = ? AND status = ? "
+                    "ORDER BY title",
+                    [stage, status],
+                )
+            ]
+
+    def pending(self, stage: str) -> List[str]:
+        return self.titles(stage, Status.PENDING)
+
+    def artifact(self, title: str, artifact: str) -> Optional[BlobInfo]:
+        """The recorded object of an episode's artifact, or None if it doesn't exist"""
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT path, size, generation FROM artifacts "
+                    "WHERE title = ? AND artifact = ?",
+                    [title, artifact],
+                )
+                .fetchone()
+            )
+
+        return BlobInfo(*row) if row is not None else None
+
+    def counts(self) -> Dict[Tuple[str, str], int]:
+        """The number of episodes by (stage, status)"""
+        with self._lock:
+            return {
+                (stage, status): count
+                for stage, status, count in self._connect().execute(
+                    "SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status"
+                )
+            }
+
+    def _list_artifacts(
+        self, audio_extension: str
+    ) -> Iterator[Tuple[str, str, BlobInfo]]:
+        """Lists the (title, artifact, object) of every artifact on GCS"""
+        audio_suffix = "." + audio_extension
+        metadata_suffix = Paths.get_metadata_file_name_for_title("")
+        for blob in GCSClient.list_blobs(
+            Paths.get_audio_data_folder(self.podcast_name), ""
+        ):
+            filename = os.path.basename(blob.path)
+            if filename.endswith(metadata_suffix):
+                yield filename[: -len(metadata_suffix)], Artifact.METADATA, blob
+            elif filename.endswith(audio_suffix):
+                yield filename[: -len(audio_suffix)], Artifact.AUDIO, blob
+
+        for artifact, folder, extension in [
+            (
+                Artifact.RAW_TRANSCRIPT,
+                Paths.get_raw_transcript_folder(self.podcast_name),
+                Paths.TXT_EXT,
+            ),
+            (
+                Artifact.SPEAKER_TRANSCRIPT,
+                Paths.get_speaker_transcript_folder(self.podcast_name),
+                Paths.TXT_EXT,
+            ),
+            (
+                Artifact.AAI_TRANSCRIPT,
+                Paths.get_aai_transcript_folder(self.podcast_name),
+                Paths.JSON_EXT,
+            ),
+            (
+                Artifact.CHAPTERIZED_TRANSCRIPT,
+                Paths.get_chapterized_data_folder(self.podcast_name),
+                Paths.JSON_EXT,
+            ),
+            (
+                Artifact.PASSAGES,
+                Paths.get_passages_folder(self.podcast_name),
+                Paths.JSON_EXT,
+            ),
+        ]:
+            for blob in GCSClient.list_blobs(folder, extension):
+                yield os.path.basename(blob.path)[: -len(extension)], artifact, blob
+
+    def reconcile(self, audio_extension: str) -> None:
+        """
+        Rebuilds the manifest from GCS listings of the podcast's folders
+
+        params:
+                audio_extension:
+                        The extension of the podcast's audio files, eg. "mp3"
+        """
+        print("Reconciling pipeline manifest with GCS: {}".format(self.podcast_name))
+        listed = list(self._list_artifacts(audio_extension))
+        now = time.time()
+
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM artifacts")
+            connection.execute("DELETE FROM stages")
+            connection.executemany(
+                "INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (title, artifact, blob.path, blob.size, blob.generation, now)
+                    for title, artifact, blob in listed
+                ],
+            )
+            for title in {title for title, _, _ in listed}:
+                self._update_stages(connection, title)
+            connection.commit()
+
+        print(self.report())
+
+    def download_from_gcs(self) -> bool:
+        """
+        Replaces the local manifest with the GCS copy
+
+        returns:
+                False if there is no GCS copy yet
+        """
+        if not GCSClient.file_exists(self.filepath):
+            return False
+
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            create_temp_local_directory(os.path.dirname(self.filepath))
+            GCSClient.download_file(self.filepath)
+
+        return True
+
+    def load(self, audio_extension: str) -> None:
+        """Downloads the manifest, or builds it from GCS listings the first time"""
+        if not self.download_from_gcs():
+            self.reconcile(audio_extension)
+            self.upload_to_gcs()
+
+    def upload_to_gcs(self) -> None:
+        with self._lock:
+            self._connect().commit()
+            GCSClient.upload_file(self.filepath)
+
+    def report(self) -> str:
+        counts = self.counts()
+        return "Pipeline manifest for {}: {}".format(
+            self.podcast_name,
+            ", ".join(
+                "{} {} done, {} pending".format(
+                    stage,
+                    counts.get((stage, Status.DONE), 0),
+                    counts.get((stage, Status.PENDING), 0),
+                )
+                for stage in Stage.INPUTS
+            ),
+        )
@@ -0,0 +1,18 @@
+# Package Imports
+from podcasts import PODCASTS
+
+"""
+Rebuilds each podcast's pipeline manifest from GCS listings and uploads it. Run
+it after adding or deleting pipeline artifacts on GCS by hand, so the stages see
+the change.
+"""
+
+
+def main():
+    for podcast in PODCASTS:
+        podcast.manifest.reconcile(podcast.feed_config.audio_extension)
+        podcast.manifest.upload_to_gcs()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# System Imports
+import gzip
+import os
+from typing import Optional
+
+# Third Party Imports
+import zstandard
+
+"""
+Compression of the text files stored on GCS (transcripts, chapterized
+transcripts, passages, metadata and vector database payloads).
+
+GCSClient.upload_string_as_textfile compresses with GCS_TEXT_COMPRESSION and
+records it as the object's Content-Encoding. Reads detect the format from the
+data itself: zstd and gzip frames start with bytes that valid UTF-8 text never
+starts with, so compressed and uncompressed objects can be mixed freely, eg.
+while a bucket is being migrated.
+"""
+
+TEXT_COMPRESSION_ENV_VAR = "GCS_TEXT_COMPRESSION"
+
+
+class Compression:
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
+
+    ALL = [NONE, GZIP, ZSTD]
+
+
+DEFAULT_TEXT_COMPRESSION = Compression.ZSTD
+
+# Levels with most of the size reduction of the maximum levels, at a fraction
+# of the compression time
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def text_compression() -> str:
+    """
+    returns:
+            The compression of uploaded text files (GCS_TEXT_COMPRESSION)
+    """
+    compression = os.environ.get(TEXT_COMPRESSION_ENV_VAR, DEFAULT_TEXT_COMPRESSION)
+    if compression not in Compression.ALL:
+        raise ValueError(
+            "Text compression must be one of {}: {}".format(
+                Compression.ALL, compression
+            )
+        )
+
+    return compression
+
+
+def content_encoding(compression: str) -> Optional[str]:
+    """The Content-Encoding recorded on objects with the given compression"""
+    return None if compression == Compression.NONE else compression
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == Compression.ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if compression == Compression.GZIP:
+        # mtime is fixed, so the same text always compresses to the same bytes
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return data
+
+
+def decompress(data: bytes) -> bytes:
+    """Decompresses zstd or gzip data, and returns anything else as is"""
+    if data.startswith(ZSTD_MAGIC):
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    return data
@@ -0,0 +1,115 @@
+# System Imports
+import os
+from typing import List, Tuple
+
+# Package Imports
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.parallel_utils import batched
+from data_api.utils.paths import Paths
+from data_api.utils.pipeline_manifest import Artifact
+from data_api.utils.text_compression import content_encoding, text_compression
+from podcasts import PODCASTS
+
+"""
+Recompresses the text files already on GCS with GCS_TEXT_COMPRESSION (zstd by
+default), so that they match what the pipeline now uploads. Files that already
+have that compression are skipped, so an interrupted migration can be rerun.
+The pipeline manifests are reconciled afterwards, since every recompressed file
+gets a new generation. Don't run the pipeline at the same time.
+"""
+
+VECTOR_DB_PAYLOADS = "vector_db_payloads"
+LEGACY_VECTOR_DB = "legacy_vector_db"
+
+
+def text_artifact_folders(podcast_names: List[str]) -> List[Tuple[str, str, str]]:
+    """
+    returns:
+            The (artifact name, folder, extension) of every kind of text file
+            stored on GCS
+    """
+    folders = []
+    for podcast_name in podcast_names:
+        folders += [
+            (
+                Artifact.RAW_TRANSCRIPT,
+                Paths.get_raw_transcript_folder(podcast_name),
+                Paths.TXT_EXT,
+            ),
+            (
+                Artifact.SPEAKER_TRANSCRIPT,
+                Paths.get_speaker_transcript_folder(podcast_name),
+                Paths.TXT_EXT,
+            ),
+            (
+                Artifact.AAI_TRANSCRIPT,
+                Paths.get_aai_transcript_folder(podcast_name),
+                Paths.JSON_EXT,
+            ),
+            (
+                Artifact.CHAPTERIZED_TRANSCRIPT,
+                Paths.get_chapterized_data_folder(podcast_name),
+                Paths.JSON_EXT,
+            ),
+            (
+                Artifact.PASSAGES,
+                Paths.get_passages_folder(podcast_name),
+                Paths.JSON_EXT,
+            ),
+            (
+                Artifact.METADATA,
+                Paths.get_audio_data_folder(podcast_name),
+                Paths.get_metadata_file_name_for_title(""),
+            ),
+        ]
+
+    return folders + [
+        # The trailing separator keeps the binary index folder out
+        (VECTOR_DB_PAYLOADS, os.path.join(Paths.VECTOR_DB_FOLDER, ""), Paths.JSONL_EXT),
+        (LEGACY_VECTOR_DB, Paths.VECTOR_DB_PATH, ""),
+    ]
+
+
+def main():
+    compression = text_compression()
+    for artifact, folder, extension in text_artifact_folders(
+        [podcast.name for podcast in PODCASTS]
+    ):
+        blobs = [
+            blob
+            for blob in GCSClient.list_blobs(folder, extension)
+            if blob.content_encoding != content_encoding(compression)
+        ]
+        print(
+            "Recompressing {} {} files in {} with {}".format(
+                len(blobs), artifact, folder, compression
+            )
+        )
+
+        bytes_before = 0
+        bytes_after = 0
+        # Batches bound the number of (eg. Assembly AI) transcripts in memory
+        for batch in batched(blobs, GCSClient.transfer_workers()):
+            filepaths = [blob.path for blob in batch]
+            texts = GCSClient.read_texts(filepaths)
+            uploaded = GCSClient.upload_texts(dict(zip(filepaths, texts)), compression)
+            bytes_before += sum(blob.size for blob in batch)
+            bytes_after += sum(blob.size for blob in uploaded)
+
+        if blobs:
+            print(
+                "{}: {:.1f} MB before, {:.1f} MB after ({:.1f}x compression)".format(
+                    artifact,
+                    bytes_before / 2**20,
+                    bytes_after / 2**20,
+                    bytes_before / max(bytes_after, 1),
+                )
+            )
+
+    for podcast in PODCASTS:
+        podcast.manifest.reconcile(podcast.feed_config.audio_extension)
+        podcast.manifest.upload_to_gcs()
+
+
+if __name__ == "__main__":
+    main()
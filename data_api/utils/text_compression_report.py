@@ -0,0 +1,123 @@
+# System Imports
+from collections import defaultdict
+import os
+import random
+import time
+
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from data_api.utils.gcs_mirror import MIRROR_MAX_MB_ENV_VAR
+from data_api.utils.gcs_utils import GCSClient
+from data_api.utils.text_compression import Compression, compress, decompress
+from data_api.utils.text_compression_migration import text_artifact_folders
+from podcasts import PODCASTS
+
+"""
+Reports the bytes and transfer time of each kind of stored text file, without
+compression and with gzip and zstd.
+
+The first table is the bucket as it is now, by content encoding. For the
+second, a sample of each kind of file is uploaded under a scratch folder with
+each compression and read back with the bulk transfer methods, like the
+pipeline does. The scratch files are deleted afterwards.
+"""
+
+SAMPLE_SIZE = 20
+SCRATCH_FOLDER = "text_compression_report"
+SEED = 0
+
+
+def main():
+    # Reads from the local mirror would time the local disk instead of GCS
+    os.environ[MIRROR_MAX_MB_ENV_VAR] = "0"
+
+    stored_bytes = defaultdict(int)
+    stored_files = defaultdict(int)
+    filepaths = defaultdict(list)
+    for artifact, folder, extension in text_artifact_folders(
+        [podcast.name for podcast in PODCASTS]
+    ):
+        for blob in GCSClient.list_blobs(folder, extension):
+            key = (artifact, blob.content_encoding or Compression.NONE)
+            stored_bytes[key] += blob.size
+            stored_files[key] += 1
+            filepaths[artifact].append(blob.path)
+
+    print(
+        tabulate(
+            [
+                [artifact, encoding, stored_files[(artifact, encoding)], size / 2**20]
+                for (artifact, encoding), size in sorted(stored_bytes.items())
+            ],
+            headers=["artifact", "stored as", "files", "MB"],
+            floatfmt=".1f",
+        )
+    )
+
+    rng = random.Random(SEED)
+    rows = []
+    for artifact, paths in filepaths.items():
+        sample = rng.sample(paths, min(SAMPLE_SIZE, len(paths)))
+        texts = GCSClient.read_texts(sample)
+        text_bytes = sum(len(text.encode("utf-8")) for text in texts)
+
+        for compression in Compression.ALL:
+            start = time.perf_counter()
+            compressed = [compress(t.encode("utf-8"), compression) for t in texts]
+            compress_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            for data in compressed:
+                decompress(data)
+            decompress_seconds = time.perf_counter() - start
+
+            scratch = {
+                os.path.join(SCRATCH_FOLDER, compression, artifact, str(i)): text
+                for i, text in enumerate(texts)
+            }
+            start = time.perf_counter()
+            GCSClient.upload_texts(scratch, compression)
+            upload_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            GCSClient.read_texts(list(scratch))
+            read_seconds = time.perf_counter() - start
+            for filepath in scratch:
+                GCSClient.delete_file(filepath)
+
+            compressed_bytes = sum(len(data) for data in compressed)
+            rows.append(
+                [
+                    artifact,
+                    compression,
+                    len(texts),
+                    compressed_bytes / 2**20,
+                    text_bytes / max(compressed_bytes, 1),
+                    compress_seconds,
+                    decompress_seconds,
+                    upload_seconds,
+                    read_seconds,
+                ]
+            )
+
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "artifact",
+                "compression",
+                "files",
+                "MB",
+                "ratio",
+                "compress s",
+                "decompress s",
+                "upload s",
+                "read s",
+            ],
+            floatfmt=".3f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
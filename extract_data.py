@@ -8,6 +8,8 @@ def main():
         podcast.run_data_extraction_pipeline()
 
     DBUpdate.generate_and_store_embeddings([podcast.name for podcast in PODCASTS])
+    DBUpdate.build_and_store_ann_index()
+    DBUpdate.build_and_store_binary_index()
     DBUpdate.create_and_deploy_index_and_endpoint()
 
 
@@ -0,0 +1,16 @@
+# System Imports
+import os
+import uuid
+
+# Package Imports
+from data_api.utils.metrics import SERVER_ID_ENV_VAR
+
+"""
+gunicorn server hooks, loaded from the working directory (or with --config).
+"""
+
+
+def on_starting(server):
+    # Runs in the master before any worker is forked, so all workers of this
+    # server share the id and sum each other's /metrics
+    os.environ[SERVER_ID_ENV_VAR] = uuid.uuid4().hex
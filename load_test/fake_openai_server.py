@@ -0,0 +1,131 @@
+# System Imports
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from typing import List, Union
+
+# Third Party Imports
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+
+"""
+Local stand-in for the OpenAI embeddings and chat completions APIs, for load
+testing without spending money. Point the app at it with
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake
+and run it with
+    uvicorn load_test.fake_openai_server:app --port 8100
+
+Latency is configured with environment variables:
+    FAKE_OPENAI_EMBEDDING_LATENCY_SECONDS:
+        Delay before an embeddings response
+    FAKE_OPENAI_FIRST_TOKEN_LATENCY_SECONDS:
+        Delay before the first token of a streamed completion
+    FAKE_OPENAI_TOKENS_PER_SECOND:
+        Rate at which completion tokens are streamed after the first one
+    FAKE_OPENAI_ANSWER_TOKENS:
+        Number of tokens in every completion
+"""
+
+EMBEDDING_LATENCY_SECONDS = float(
+    os.environ.get("FAKE_OPENAI_EMBEDDING_LATENCY_SECONDS", 0.2)
+)
+FIRST_TOKEN_LATENCY_SECONDS = float(
+    os.environ.get("FAKE_OPENAI_FIRST_TOKEN_LATENCY_SECONDS", 0.8)
+)
+TOKENS_PER_SECOND = float(os.environ.get("FAKE_OPENAI_TOKENS_PER_SECOND", 40))
+ANSWER_TOKENS = int(os.environ.get("FAKE_OPENAI_ANSWER_TOKENS", 400))
+
+ANSWER_WORDS = "The podcasts discuss this topic in detail and".split()
+
+
+def fake_embedding(
+    text: str, encoding_format: str, dimension: int
+) -> Union[List[float], str]:
+    # Deterministic per text, so repeated questions get the same embedding
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension, dtype=np.float32)
+    vector /= np.linalg.norm(vector)
+
+    # The openai client asks for base64 encoded float32s when numpy is installed
+    if encoding_format == "base64":
+        return base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+    return vector.tolist()
+
+
+async def embeddings(request):
+    body = await request.json()
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    await asyncio.sleep(EMBEDDING_LATENCY_SECONDS)
+
+    return JSONResponse(
+        {
+            "object": "list",
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": fake_embedding(
+                        text,
+                        body.get("encoding_format", "float"),
+                        body.get(
+                            "dimensions", VectorDBConstants.FULL_EMBEDDINGS_DIMENSION
+                        ),
+                    ),
+                }
+                for i, text in enumerate(inputs)
+            ],
+            "model": body["model"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+    )
+
+
+def completion_chunk(model: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return "data: {}\n\n".format(json.dumps(chunk))
+
+
+async def stream_completion(model: str):
+    yield completion_chunk(model, {"role": "assistant", "content": ""})
+    await asyncio.sleep(FIRST_TOKEN_LATENCY_SECONDS)
+
+    for index in range(ANSWER_TOKENS):
+        if index > 0:
+            await asyncio.sleep(1 / TOKENS_PER_SECOND)
+        yield completion_chunk(
+            model, {"content": ANSWER_WORDS[index % len(ANSWER_WORDS)] + " "}
+        )
+
+    yield completion_chunk(model, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+
+async def chat_completions(request):
+    body = await request.json()
+    # The app only uses streamed completions
+    assert body.get("stream"), "Only streamed completions are supported"
+    return StreamingResponse(
+        stream_completion(body["model"]), media_type="text/event-stream"
+    )
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/embeddings", embeddings, methods=["POST"]),
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    ]
+)
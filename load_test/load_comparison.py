@@ -0,0 +1,50 @@
+# System Imports
+import asyncio
+import os
+import time
+
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from load_test.sse_driver import RESULT_HEADERS, run_level
+
+"""
+Drives concurrent questions against a running server's /get endpoint and reports
+throughput and latency at increasing concurrency.
+
+Start one of the two servers, e.g.
+    gunicorn main:app --worker-class gevent --timeout 600
+    gunicorn asgi_main:app --worker-class uvicorn.workers.UvicornWorker --timeout 600
+then run this against it with the same LOAD_TEST_URL, and compare the tables.
+Use the same number of workers for both servers.
+"""
+
+URL_ENV_VAR = "LOAD_TEST_URL"
+DEFAULT_URL = "http://127.0.0.1:8000"
+CONCURRENCY_LEVELS = [1, 8, 32, 64]
+REQUESTS_PER_CLIENT = 4
+
+
+async def run(url: str) -> None:
+    start_time = int(time.time())
+    rows = []
+    for level_index, concurrency in enumerate(CONCURRENCY_LEVELS):
+        print("Running {} concurrent clients against {}".format(concurrency, url))
+        result = await run_level(
+            url,
+            concurrency,
+            REQUESTS_PER_CLIENT,
+            run_tag="{}-{}".format(start_time, level_index),
+        )
+        rows.append(result.row())
+
+    print(tabulate(rows, headers=RESULT_HEADERS, floatfmt=".1f"))
+
+
+def main():
+    asyncio.run(run(os.environ.get(URL_ENV_VAR, DEFAULT_URL)))
+
+
+if __name__ == "__main__":
+    main()
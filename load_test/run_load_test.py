@@ -0,0 +1,209 @@
+# System Imports
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+# Third Party Imports
+import httpx
+from tabulate import tabulate
+
+# Package Imports
+from data_api.embeddings.vector_db.constants import VectorDBConstants
+from data_api.utils.metrics import METRICS_DIR_ENV_VAR, SERVER_ID_ENV_VAR
+from load_test.sse_driver import RESULT_HEADERS, run_level
+
+"""
+Offline load test of the QA web app.
+
+Starts the fake OpenAI server (load_test/fake_openai_server.py) and the app under
+gunicorn with the synthetic in-memory vector store, so no OpenAI, qdrant or GCS
+requests are made. Then opens increasing numbers of concurrent /get streams and
+reports throughput, time to first byte and total latency percentiles, and the
+peak resident memory of each gunicorn worker.
+
+Configured with environment variables:
+    LOAD_TEST_APP:
+        "gevent" (default) serves main:app with gevent workers like the Procfile,
+        "asgi" serves asgi_main:app with uvicorn workers
+    LOAD_TEST_WORKERS:
+        The number of gunicorn workers (default 1)
+    LOAD_TEST_CLIENTS:
+        Comma separated numbers of concurrent clients (default 1,16,64,128)
+    LOAD_TEST_REQUESTS_PER_CLIENT:
+        Questions asked in a row by each client (default 2)
+and the FAKE_OPENAI_* latency settings of the fake OpenAI server.
+"""
+
+APP_PORT = 8200
+FAKE_OPENAI_PORT = 8100
+STARTUP_TIMEOUT_SECONDS = 120
+MEMORY_SAMPLE_INTERVAL_SECONDS = 0.5
+
+WORKER_CLASSES = {
+    "gevent": ("main:app", "gevent"),
+    "asgi": ("asgi_main:app", "uvicorn.workers.UvicornWorker"),
+}
+
+
+def child_pids(parent_pid: int) -> List[int]:
+    """Finds the direct children of a process (Linux only)"""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+
+        try:
+            with open("/proc/{}/stat".format(entry)) as f:
+                # The parent pid is the second field after the parenthesized name
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+
+        if int(fields[1]) == parent_pid:
+            pids.append(int(entry))
+
+    return pids
+
+
+def resident_memory_mb(pid: int) -> float:
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    return 0.0
+
+
+async def sample_peak_memory(master_pid: int, peaks: Dict[int, float]) -> None:
+    """Records the peak resident memory of each worker until cancelled"""
+    while True:
+        for pid in child_pids(master_pid):
+            peaks[pid] = max(peaks.get(pid, 0.0), resident_memory_mb(pid))
+        await asyncio.sleep(MEMORY_SAMPLE_INTERVAL_SECONDS)
+
+
+def wait_until_serving(url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server for {} exited on startup".format(url))
+
+        try:
+            httpx.get(url, timeout=5)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+
+    raise TimeoutError("{} did not start serving".format(url))
+
+
+async def run(
+    app_url: str, master_pid: int, client_levels: List[int], requests_per_client: int
+) -> None:
+    start_time = int(time.time())
+    rows = []
+    for level_index, concurrency in enumerate(client_levels):
+        print("Running {} concurrent clients".format(concurrency))
+        peaks = {}
+        sampler = asyncio.create_task(sample_peak_memory(master_pid, peaks))
+        result = await run_level(
+            app_url,
+            concurrency,
+            requests_per_client,
+            run_tag="{}-{}".format(start_time, level_index),
+        )
+        sampler.cancel()
+
+        rows.append(result.row() + [max(peaks.values(), default=float("nan"))])
+
+    print(
+        tabulate(rows, headers=RESULT_HEADERS + ["peak worker RSS MB"], floatfmt=".1f")
+    )
+
+
+def main():
+    app_module, worker_class = WORKER_CLASSES[os.environ.get("LOAD_TEST_APP", "gevent")]
+    num_workers = os.environ.get("LOAD_TEST_WORKERS", "1")
+    client_levels = [
+        int(c) for c in os.environ.get("LOAD_TEST_CLIENTS", "1,16,64,128").split(",")
+    ]
+    requests_per_client = int(os.environ.get("LOAD_TEST_REQUESTS_PER_CLIENT", 2))
+
+    app_url = "http://127.0.0.1:{}".format(APP_PORT)
+    fake_openai_url = "http://127.0.0.1:{}".format(FAKE_OPENAI_PORT)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app_env = dict(
+            os.environ,
+            OPENAI_BASE_URL=fake_openai_url + "/v1",
+            OPENAI_API_KEY="fake",
+            EMBEDDING_CACHE_PATH=os.path.join(temp_dir, "embedding_cache.sqlite"),
+        )
+        app_env[VectorDBConstants.VECTOR_STORE_BACKEND_ENV_VAR] = (
+            VectorDBConstants.SYNTHETIC_BACKEND
+        )
+        # gunicorn may not find gunicorn.conf.py from the working directory
+        app_env[METRICS_DIR_ENV_VAR] = os.path.join(temp_dir, "metrics")
+        app_env[SERVER_ID_ENV_VAR] = "load_test"
+
+        processes = []
+        try:
+            fake_openai_process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "uvicorn",
+                    "load_test.fake_openai_server:app",
+                    "--port",
+                    str(FAKE_OPENAI_PORT),
+                    "--log-level",
+                    "warning",
+                ]
+            )
+            processes.append(fake_openai_process)
+            app_process = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "gunicorn",
+                    app_module,
+                    "--worker-class",
+                    worker_class,
+                    "--workers",
+                    num_workers,
+                    "--bind",
+                    "127.0.0.1:{}".format(APP_PORT),
+                    "--timeout",
+                    "600",
+                ],
+                env=app_env,
+                # The app logs one line per request
+                stdout=subprocess.DEVNULL,
+            )
+            processes.append(app_process)
+
+            wait_until_serving(fake_openai_url, fake_openai_process)
+            wait_until_serving(app_url, app_process)
+            print(
+                "Serving {} with {} {} worker(s)".format(
+                    app_module, num_workers, worker_class
+                )
+            )
+            asyncio.run(
+                run(app_url, app_process.pid, client_levels, requests_per_client)
+            )
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
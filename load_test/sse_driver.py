@@ -0,0 +1,149 @@
+# System Imports
+import asyncio
+from dataclasses import dataclass, field
+import json
+import time
+from typing import Callable, List, Optional
+
+# Third Party Imports
+import httpx
+import numpy as np
+
+"""
+Opens concurrent EventSource-style streams against a server's /get endpoint and
+measures each one.
+"""
+
+REQUEST_TIMEOUT_SECONDS = 600
+
+# Distinct questions, so that the query and answer caches don't serve repeats
+QUESTION_TEMPLATE = "What do the podcasts say about {} (question {})?"
+TOPICS = ["sleep", "caffeine", "exercise", "fasting", "sunlight", "stress"]
+
+RESULT_HEADERS = [
+    "clients",
+    "requests",
+    "errors",
+    "requests/s",
+    "first byte p50 ms",
+    "first byte p95 ms",
+    "first byte p99 ms",
+    "first chunk p50 ms",
+    "total p50 ms",
+    "total p95 ms",
+    "total p99 ms",
+]
+
+
+@dataclass
+class StreamTiming:
+    """Encapsulates the timings of one /get stream, in seconds from the request"""
+
+    # Until the first line of the response body
+    first_byte: float
+
+    # Until the first non-empty answer chunk (None if the answer was empty)
+    first_chunk: Optional[float]
+
+    # Until the end of the response
+    total: float
+
+
+@dataclass
+class LevelResult:
+    """Encapsulates the results of running some number of concurrent clients"""
+
+    # The number of concurrent clients
+    concurrency: int
+
+    # Wall clock time of the whole run
+    elapsed_seconds: float
+
+    # Timings of every successful request
+    timings: List[StreamTiming] = field(default_factory=list)
+
+    # The number of failed requests
+    errors: int = 0
+
+    def percentile_ms(
+        self, get: Callable[[StreamTiming], Optional[float]], q: float
+    ) -> float:
+        values = [get(t) for t in self.timings if get(t) is not None]
+        return 1000 * float(np.percentile(values, q)) if values else float("nan")
+
+    def row(self) -> List:
+        """The result as a table row, see RESULT_HEADERS"""
+        return [
+            self.concurrency,
+            len(self.timings),
+            self.errors,
+            len(self.timings) / self.elapsed_seconds,
+            self.percentile_ms(lambda t: t.first_byte, 50),
+            self.percentile_ms(lambda t: t.first_byte, 95),
+            self.percentile_ms(lambda t: t.first_byte, 99),
+            self.percentile_ms(lambda t: t.first_chunk, 50),
+            self.percentile_ms(lambda t: t.total, 50),
+            self.percentile_ms(lambda t: t.total, 95),
+            self.percentile_ms(lambda t: t.total, 99),
+        ]
+
+
+async def ask(client: httpx.AsyncClient, url: str, question: str) -> StreamTiming:
+    """Streams one answer, reading events like the browser's EventSource does"""
+    start = time.perf_counter()
+    first_byte = None
+    first_chunk = None
+    async with client.stream("GET", url + "/get", params={"msg": question}) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            if not line.startswith("data: "):
+                continue
+
+            event = json.loads(line[len("data: ") :])
+            if event["type"] == "chunk" and event["text"] and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+
+    total = time.perf_counter() - start
+    return StreamTiming(
+        first_byte=first_byte if first_byte is not None else total,
+        first_chunk=first_chunk,
+        total=total,
+    )
+
+
+async def run_level(
+    url: str, concurrency: int, requests_per_client: int, run_tag: str
+) -> LevelResult:
+    """
+    Runs concurrency clients, each asking requests_per_client questions in a row
+
+    params:
+            run_tag:
+                    Included in every question, so that separate runs don't
+                    share cached answers
+    """
+    result = LevelResult(concurrency=concurrency, elapsed_seconds=0.0)
+
+    async def client_loop(client: httpx.AsyncClient, client_index: int) -> None:
+        for request_index in range(requests_per_client):
+            question = QUESTION_TEMPLATE.format(
+                TOPICS[client_index % len(TOPICS)],
+                "{}-{}-{}".format(run_tag, client_index, request_index),
+            )
+            try:
+                result.timings.append(await ask(client, url, question))
+            except httpx.HTTPError as e:
+                print("Request failed: {}".format(e))
+                result.errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        limits=limits, timeout=REQUEST_TIMEOUT_SECONDS
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, i) for i in range(concurrency)))
+        result.elapsed_seconds = time.perf_counter() - start
+
+    return result
@@ -0,0 +1,93 @@
+# System Imports
+import os
+import re
+import time
+from typing import Iterator, List, Optional, Tuple
+
+# Third Party Imports
+from tabulate import tabulate
+
+# Package Imports
+from qa_bot.sse_events import chunk_event, SSEWriter
+
+"""
+Compares the chunk events sent for one streamed answer with one event per model
+delta (as before SSEWriter) against SSEWriter with a few window settings.
+
+The model is simulated by streaming the words of a sample answer at
+BENCHMARK_TOKENS_PER_SECOND (default 50), with the empty first and last deltas
+the OpenAI API sends. Each setting takes ANSWER_TOKENS / BENCHMARK_TOKENS_PER_SECOND
+seconds to run.
+"""
+
+SAMPLE_ANSWER = (
+    "Dr. Huberman explains that viewing morning sunlight within an hour of waking "
+    "sets the circadian clock, which improves sleep onset later that night. "
+    "He recommends avoiding caffeine for the first 90 to 120 minutes after waking "
+    "to offset the afternoon crash, and keeping the bedroom cool and dark. "
+) * 6
+
+# (max delay seconds, max bytes) settings of the SSEWriter to compare
+WRITER_SETTINGS = [(0.025, 256), (0.05, 256), (0.1, 512), (0.25, 1024)]
+
+
+def simulated_deltas(
+    tokens: List[str], tokens_per_second: float
+) -> Iterator[Optional[str]]:
+    yield ""
+    for token in tokens:
+        time.sleep(1 / tokens_per_second)
+        yield token
+    yield None
+
+
+def measure(events: Iterator[str]) -> Tuple[int, int]:
+    """Returns the number of frames and bytes of a stream of SSE events"""
+    frames = 0
+    num_bytes = 0
+    for event in events:
+        frames += 1
+        num_bytes += len(event.encode("utf-8"))
+    return frames, num_bytes
+
+
+def main():
+    tokens_per_second = float(os.environ.get("BENCHMARK_TOKENS_PER_SECOND", 50))
+    # Roughly one token per word
+    tokens = re.findall(r"\S+\s*", SAMPLE_ANSWER)
+    print(
+        "Streaming {} tokens at {} tokens/s per setting".format(
+            len(tokens), tokens_per_second
+        )
+    )
+
+    rows = []
+    frames, num_bytes = measure(
+        chunk_event(d) for d in simulated_deltas(tokens, tokens_per_second)
+    )
+    rows.append(["one event per delta", "-", "-", frames, num_bytes])
+
+    for max_delay_seconds, max_bytes in WRITER_SETTINGS:
+        writer = SSEWriter(max_delay_seconds=max_delay_seconds, max_bytes=max_bytes)
+        frames, num_bytes = measure(
+            chunk_event(c)
+            for c in writer.coalesce(simulated_deltas(tokens, tokens_per_second))
+        )
+        rows.append(["SSEWriter", max_delay_seconds, max_bytes, frames, num_bytes])
+
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "writer",
+                "max delay s",
+                "max bytes",
+                "frames/answer",
+                "bytes/answer",
+            ],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
+from typing import Optional
+
 from flask import (
     Flask,
     render_template,
     request,
     Response,
 )
-import json
+from data_api.embeddings.vector_db.vector_store import SearchFilter
+from data_api.utils.metrics import Metrics, start_request
 from qa_bot.qa_bot import QABot
+from qa_bot.sse_events import (
+    chunk_event,
+    db_matches_event,
+    i_dont_know_event,
+    SSE_MIMETYPE,
+    SSEWriter,
+)
 
 app = Flask(__name__)
 
 podcast_gpt = QABot()
+Metrics.set_counters(podcast_gpt.counters)
+
+sse_writer = SSEWriter.from_env()
 
 
 @app.route("/")
@@ -17,27 +30,46 @@ def home():
     return render_template("index.html")
 
 
-def generate_response(user_text: str):
-    db_matches, response = podcast_gpt.answer_question(user_text)
+def generate_response(user_text: str, search_filter: Optional[SearchFilter]):
+    request_metrics = start_request()
+    completed = False
+    try:
+        db_matches, response = podcast_gpt.answer_question(user_text, search_filter)
 
-    # Use Server Sent Events (SSE) to send info to javascript
+        # Use Server Sent Events (SSE) to send info to javascript
 
-    # First send the answer string which is expected if the bot can't answer the question
-    yield f"data: {json.dumps({'type': 'i_dont_know', 'text': podcast_gpt.I_DONT_KNOW})}\n\n"
+        # First send the answer string which is expected if the bot can't answer the question
+        yield i_dont_know_event(podcast_gpt.I_DONT_KNOW)
 
-    # Then send the actual answer in chunks
-    for chunk in response:
-        content = chunk.choices[0].delta.content
-        yield f"data: {json.dumps({'type': 'chunk', 'text': content})}\n\n"
+        # Then send the actual answer in chunks, a few deltas per chunk
+        request_metrics.stream_started()
+        for content in sse_writer.coalesce(response):
+            request_metrics.record_chunk(content)
+            yield chunk_event(content)
 
-    # Finally send the vector DB matches
-    yield f"data: {json.dumps({'type': 'db_matches', 'matches': [m.to_dict() for m in db_matches]})}\n\n"
+        # Finally send the vector DB matches
+        yield db_matches_event(db_matches)
+        completed = True
+    finally:
+        request_metrics.finish(completed)
 
 
 @app.route("/get")
 def get_bot_response():
     user_text = request.args.get("msg")
-    return Response(generate_response(user_text), mimetype="text/event-stream")
+
+    # Optional podcast, guest, start_date and end_date (YYYY-MM-DD) filters
+    try:
+        search_filter = SearchFilter.from_params(request.args)
+    except ValueError as e:
+        return Response("Invalid filter: {}".format(e), status=400)
+
+    return Response(generate_response(user_text, search_filter), mimetype=SSE_MIMETYPE)
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(Metrics.render(), mimetype=Metrics.CONTENT_TYPE)
 
 
 if __name__ == "__main__":
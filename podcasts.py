@@ -13,7 +13,9 @@ from data_api.audio_download.feed_config import (
     YoutubeFeedConfig,
 )
 from data_api.speech_to_text.assembly_ai_transcriber import AudioTranscriber
+from data_api.chapterizer.passage_chunker import PassageChunker
 from data_api.chapterizer.transcript_chapterizer import TranscriptChapterizer
+from data_api.utils.pipeline_manifest import PipelineManifest
 
 
 @dataclass
@@ -29,6 +31,9 @@ class Podcast:
     # The feed configuration for this podcast's data source
     feed_config: Union[YoutubeFeedConfig, RSSFeedConfig]
 
+    # The record of the pipeline stages' artifacts and progress per episode
+    manifest: PipelineManifest = field(init=False)
+
     # The audio downloader instance
     audio_downloader: AudioDownloader = field(init=False)
 
@@ -38,24 +43,43 @@ class Podcast:
     # The transcript chapterizer instance
     transcript_chapterizer: TranscriptChapterizer = field(init=False)
 
+    # The passage chunker instance
+    passage_chunker: PassageChunker = field(init=False)
+
     def __post_init__(self):
-        self.audio_downloader = DownloaderFactory(self.name, self.feed_config)
+        self.manifest = PipelineManifest(self.name)
+        self.audio_downloader = DownloaderFactory(
+            self.name, self.feed_config, self.manifest
+        )
         self.audio_transcriber = AudioTranscriber(
-            self.name, self.feed_config.audio_extension
+            self.name, self.feed_config.audio_extension, self.manifest
         )
-        self.transcript_chapterizer = TranscriptChapterizer(self.name, self.host_name)
+        self.transcript_chapterizer = TranscriptChapterizer(
+            self.name, self.host_name, self.manifest
+        )
+        self.passage_chunker = PassageChunker(self.name, self.host_name, self.manifest)
 
     def run_data_extraction_pipeline(self):
         print("Extracting data for: {}".format(self.name))
+        self.manifest.load(self.feed_config.audio_extension)
 
         # Download all audios
         self.audio_downloader.download_all_audios()
+        self.manifest.upload_to_gcs()
 
         # Transcribe all episodes
         self.audio_transcriber.transcribe_all_audio_files()
+        self.manifest.upload_to_gcs()
 
         # Chapterize transcripts
         self.transcript_chapterizer.chapterize_all_transcripts()
+        self.manifest.upload_to_gcs()
+
+        # Split chapters into overlapping passages for retrieval
+        self.passage_chunker.chunk_all_transcripts()
+        self.manifest.upload_to_gcs()
+
+        print(self.manifest.report())
 
 
 huberman_lab = Podcast(
@@ -0,0 +1,126 @@
+# System Imports
+from collections import OrderedDict
+from dataclasses import dataclass
+import itertools
+import threading
+from typing import Dict, FrozenSet, Hashable, List, Optional
+
+# Third Party Imports
+import numpy as np
+
+# Package Imports
+from data_api.embeddings.vector_db.vector_math import normalize_vector
+
+
+@dataclass
+class CachedAnswer:
+    """Encapsulates one answered question"""
+
+    # The unit-norm embedding of the question
+    embedding: np.ndarray
+
+    # Identifiers of the chapters the answer was generated from
+    chapters: FrozenSet[Hashable]
+
+    # The full answer text
+    answer: str
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    A lookup hits when a cached question's embedding has cosine similarity of at
+    least similarity_threshold with the new question AND the same set of chapters
+    was retrieved for both, so the prompt would have had the same context.
+
+    A near miss is a lookup that did not hit, but either found a similar enough
+    question with different chapters, or a question with the same chapters that
+    fell short of the threshold by less than near_miss_margin. Near misses help
+    tune the threshold.
+
+    QABot invalidates the cache when the vector database version changes.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float,
+        max_size: int,
+        near_miss_margin: float = 0.05,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_size = max_size
+        self.near_miss_margin = near_miss_margin
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0
+        self.invalidations = 0
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self.invalidations += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def lookup(
+        self, embedding: List[float], chapters: FrozenSet[Hashable]
+    ) -> Optional[str]:
+        """
+        returns:
+                The cached answer on a hit, otherwise None
+        """
+        query = normalize_vector(embedding)
+        with self._lock:
+            best_id = None
+            best_similarity = -1.0
+            is_near_miss = False
+            for entry_id, entry in self._entries.items():
+                similarity = float(entry.embedding @ query)
+                if entry.chapters != chapters:
+                    is_near_miss |= similarity >= self.similarity_threshold
+                elif similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is not None and best_similarity >= self.similarity_threshold:
+                self.hits += 1
+                self._entries.move_to_end(best_id)
+                return self._entries[best_id].answer
+
+            self.misses += 1
+            if (
+                is_near_miss
+                or best_similarity >= self.similarity_threshold - self.near_miss_margin
+            ):
+                self.near_misses += 1
+
+            return None
+
+    def store(
+        self, embedding: List[float], chapters: FrozenSet[Hashable], answer: str
+    ) -> None:
+        entry = CachedAnswer(
+            embedding=normalize_vector(embedding), chapters=chapters, answer=answer
+        )
+        with self._lock:
+            self._entries[next(self._ids)] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "near_misses": self.near_misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
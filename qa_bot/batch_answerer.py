@@ -0,0 +1,235 @@
+# System Imports
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from dataclasses import dataclass
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Set
+
+# Third Party Imports
+import numpy as np
+from tqdm import tqdm
+
+# Package Imports
+from data_api.embeddings.embeddings_generator import EmbeddingsGenerator
+from data_api.embeddings.vector_db.vector_search import VectorSearch
+from data_api.embeddings.vector_db.vector_store import SearchFilter
+from data_api.utils.paths import Paths
+from qa_bot.qa_bot import QABot
+
+"""
+Batch question answering, for nightly evaluation and FAQ runs.
+
+Questions are read from a JSONL file of objects with a "question" key, or from
+a text file with one question per line. JSONL questions may also have an "id"
+and the filter keys of SearchFilter ("podcast", "guest", "start_date",
+"end_date"). Questions without an id are identified by their line number.
+
+All question embeddings are requested up front in batched embeddings calls and
+land in the embedding cache, where each question's search then finds them.
+Searches and completions run for up to `concurrency` questions at a time.
+
+Each answered question is appended to the output JSONL file as soon as it is
+done: the input object plus the answer, the matched chapters and the seconds
+it took. A rerun with the same output file skips the questions already in it,
+so an interrupted run resumes where it stopped. Questions that failed are not
+written, so they are retried.
+"""
+
+ID_KEY = "id"
+QUESTION_KEY = "question"
+ANSWER_KEY = "answer"
+MATCHES_KEY = "matches"
+SECONDS_KEY = "seconds"
+
+
+@dataclass
+class BatchQuestion:
+    """One question of a batch"""
+
+    # Identifies the question for resuming: the input id as a string, or the
+    # line number. The output record keeps the input id as it was.
+    id: str
+
+    # The question text
+    question: str
+
+    # Restricts the context to matching episodes (None for no restriction)
+    search_filter: Optional[SearchFilter]
+
+    # The input object, copied into the output record
+    record: Dict[str, Any]
+
+
+def read_questions(filepath: str) -> List[BatchQuestion]:
+    """
+    Reads questions from a JSONL file, or a text file with one question per line
+
+    raises:
+            ValueError if an input line is not valid, or two questions have the same id
+    """
+    questions = []
+    with open(filepath) as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+
+            if filepath.endswith(Paths.JSONL_EXT):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(
+                        "Invalid JSON on line {}: {}".format(line_number, e)
+                    )
+            else:
+                record = {QUESTION_KEY: line.strip()}
+
+            if not isinstance(record, dict) or not record.get(QUESTION_KEY):
+                raise ValueError("Missing question on line {}".format(line_number))
+
+            try:
+                search_filter = SearchFilter.from_params(record)
+            except ValueError as e:
+                raise ValueError("Invalid filter on line {}: {}".format(line_number, e))
+
+            questions.append(
+                BatchQuestion(
+                    id=str(record.get(ID_KEY, line_number)),
+                    question=record[QUESTION_KEY],
+                    search_filter=search_filter,
+                    record=record,
+                )
+            )
+
+    ids = [q.id for q in questions]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Question ids must be unique: {}".format(filepath))
+
+    return questions
+
+
+def read_answered_ids(filepath: str) -> Set[str]:
+    """
+    Reads the ids of the questions already in an output file.
+    A partially written last line, left by an interrupted run, is removed.
+    """
+    if not os.path.exists(filepath):
+        return set()
+
+    with open(filepath, "rb+") as f:
+        contents = f.read()
+        complete_length = contents.rfind(b"\n") + 1
+        if complete_length < len(contents):
+            print("Removing partially written last line of {}".format(filepath))
+            f.truncate(complete_length)
+
+    return {
+        str(json.loads(line)[ID_KEY])
+        for line in contents[:complete_length].decode("utf-8").splitlines()
+    }
+
+
+class BatchAnswerer:
+
+    def __init__(self, bot: QABot, concurrency: int):
+        self.bot = bot
+        self.concurrency = concurrency
+
+    def answer(self, question: BatchQuestion) -> Dict[str, Any]:
+        """Answers one question and returns its output record"""
+        start_time = time.perf_counter()
+        db_matches, chunks = self.bot.answer_question(
+            question.question, question.search_filter
+        )
+        answer = "".join(content for content in chunks if content)
+
+        return {
+            ID_KEY: question.id,
+            **question.record,
+            ANSWER_KEY: answer,
+            MATCHES_KEY: [m.to_dict() for m in db_matches],
+            SECONDS_KEY: time.perf_counter() - start_time,
+        }
+
+    def prefetch_embeddings(self, questions: List[BatchQuestion]) -> None:
+        # Questions over the token limit are left to fail on their own
+        texts = [
+            q.question
+            for q in questions
+            if EmbeddingsGenerator.count_tokens(q.question)
+            <= EmbeddingsGenerator.EMBEDDING_TOKEN_LIMIT
+        ]
+        EmbeddingsGenerator.get_embeddings_batch(
+            list(dict.fromkeys(texts)), VectorSearch.query_dimension
+        )
+
+    def run(self, input_filepath: str, output_filepath: str) -> None:
+        """
+        Answers every question of the input file that is not in the output file
+        yet, appending the answers to the output file
+        """
+        questions = read_questions(input_filepath)
+        answered_ids = read_answered_ids(output_filepath)
+        pending = [q for q in questions if q.id not in answered_ids]
+        print(
+            "{} questions, {} already answered, answering {}".format(
+                len(questions), len(questions) - len(pending), len(pending)
+            )
+        )
+        if not pending:
+            return
+
+        start_time = time.perf_counter()
+        self.prefetch_embeddings(pending)
+        embedding_seconds = time.perf_counter() - start_time
+
+        latencies = []
+        num_failed = 0
+        with open(output_filepath, "a") as f, ThreadPoolExecutor(
+            max_workers=self.concurrency
+        ) as executor:
+            futures = {executor.submit(self.answer, q): q for q in pending}
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Answering"
+            ):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    num_failed += 1
+                    print(
+                        "Failed to answer question {}: {}".format(futures[future].id, e)
+                    )
+                    continue
+
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                latencies.append(record[SECONDS_KEY])
+
+        elapsed_seconds = time.perf_counter() - start_time
+        print(
+            "Answered {} questions in {:.1f}s ({:.2f} questions/s), embeddings took {:.1f}s".format(
+                len(latencies),
+                elapsed_seconds,
+                len(latencies) / elapsed_seconds,
+                embedding_seconds,
+            )
+        )
+        if latencies:
+            print(
+                "Seconds per answer: p50 {:.1f}, p95 {:.1f}, max {:.1f}".format(
+                    np.percentile(latencies, 50),
+                    np.percentile(latencies, 95),
+                    max(latencies),
+                )
+            )
+        print(
+            "Answer cache hits: {}".format(
+                self.bot.counters()["answer_cache_hits_total"]
+            )
+        )
+        if num_failed:
+            print(
+                "{} questions failed, rerun to retry them: {}".format(
+                    num_failed, output_filepath
+                )
+            )
@@ -1,10 +1,42 @@
+# System Imports
+import os
+
 # Package Imports
+from qa_bot.batch_answerer import BatchAnswerer
 from qa_bot.qa_bot import QABot
 
+# Set QA_BATCH_INPUT to answer a file of questions instead of prompting for them
+BATCH_INPUT_ENV_VAR = "QA_BATCH_INPUT"
+BATCH_OUTPUT_ENV_VAR = "QA_BATCH_OUTPUT"
+BATCH_CONCURRENCY_ENV_VAR = "QA_BATCH_CONCURRENCY"
+DEFAULT_BATCH_CONCURRENCY = 8
+BATCH_OUTPUT_SUFFIX = "_answers.jsonl"
+
+
+def resolve_path(path: str) -> str:
+    # bazel run starts binaries in their runfiles folder, not the caller's
+    return os.path.join(os.environ.get("BUILD_WORKING_DIRECTORY", ""), path)
+
 
 def main():
     bot = QABot()
-    bot.answer_questions()
+
+    input_filepath = os.environ.get(BATCH_INPUT_ENV_VAR)
+    if input_filepath is None:
+        bot.answer_questions()
+        return
+
+    input_filepath = resolve_path(input_filepath)
+    output_filepath = resolve_path(
+        os.environ.get(
+            BATCH_OUTPUT_ENV_VAR,
+            os.path.splitext(input_filepath)[0] + BATCH_OUTPUT_SUFFIX,
+        )
+    )
+    concurrency = int(
+        os.environ.get(BATCH_CONCURRENCY_ENV_VAR, DEFAULT_BATCH_CONCURRENCY)
+    )
+    BatchAnswerer(bot, concurrency).run(input_filepath, output_filepath)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+# System Imports
+from typing import List, Tuple
+
+# Third Party Imports
+import tiktoken
+
+# Package Imports
+from data_api.embeddings.vector_db.vector_search import DatabaseMatch, VectorSearch
+
+TRUNCATION_MARKER = " ..."
+CHAPTER_HEADER_TEMPLATE = """Podcast Name: {}
+Episode Title: {}
+Chapter Title: {}
+Transcript:
+"""
+
+
+class PromptBuilder:
+    """
+    Assembles the GPT prompt for a question under a token budget.
+
+    The instructions appear once. Matches are kept while their score is within
+    max_score_gap of the best match, so a clear winner is not diluted by weakly
+    related chapters. Chapter transcripts are then trimmed so that the whole
+    prompt fits in token_budget: short transcripts are kept in full and the
+    remaining budget is split evenly among the longer ones.
+    """
+
+    def __init__(
+        self,
+        instructions: str,
+        token_budget: int,
+        max_score_gap: float,
+        encoding_name: str = "cl100k_base",
+    ):
+        self.instructions = instructions
+        self.token_budget = token_budget
+        self.max_score_gap = max_score_gap
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def select_matches(self, matches: List[DatabaseMatch]) -> List[DatabaseMatch]:
+        """Keeps the matches scoring within max_score_gap of the best one"""
+        if len(matches) == 0:
+            return []
+
+        matches = sorted(matches, key=lambda m: m.score, reverse=True)
+        best_score = matches[0].score
+        return [m for m in matches if best_score - m.score <= self.max_score_gap]
+
+    @classmethod
+    def _chapter_header(cls, match: DatabaseMatch) -> str:
+        return CHAPTER_HEADER_TEMPLATE.format(
+            VectorSearch.podcast_name_to_title[match.podcast_title],
+            match.episode_title,
+            match.chapter_title,
+        )
+
+    def _allocate(self, lengths: List[int], budget: int) -> List[int]:
+        """
+        Splits a token budget among transcripts of the given lengths, giving
+        short transcripts all they need and an even share to the rest
+        """
+        allocations = [0] * len(lengths)
+        remaining = max(budget, 0)
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        for position, index in enumerate(order):
+            share = remaining // (len(order) - position)
+            allocations[index] = min(lengths[index], share)
+            remaining -= allocations[index]
+
+        return allocations
+
+    def build(
+        self, question: str, matches: List[DatabaseMatch]
+    ) -> Tuple[str, List[DatabaseMatch], int]:
+        """
+        Builds a prompt
+
+        params:
+                question:
+                        The user's question
+                matches:
+                        The retrieved chapters
+
+        returns:
+                A tuple of (the prompt, the matches included in it, its token count)
+        """
+        selected = self.select_matches(matches)
+        headers = [self._chapter_header(m) for m in selected]
+        transcripts = [self.encoding.encode(m.chapter_transcript) for m in selected]
+
+        fixed_text = "\n\n".join([self.instructions] + headers + [question])
+        transcript_budget = (
+            self.token_budget
+            - self.count_tokens(fixed_text)
+            - len(selected) * self.count_tokens(TRUNCATION_MARKER + "\n\n")
+        )
+        allocations = self._allocate([len(t) for t in transcripts], transcript_budget)
+
+        sections = [self.instructions]
+        for header, tokens, allocation in zip(headers, transcripts, allocations):
+            transcript = self.encoding.decode(tokens[:allocation])
+            if allocation < len(tokens):
+                transcript += TRUNCATION_MARKER
+            sections.append(header + transcript)
+        sections.append(question)
+
+        prompt = "\n\n".join(sections)
+        return prompt, selected, self.count_tokens(prompt)
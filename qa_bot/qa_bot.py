@@ -1,24 +1,65 @@
 # System Imports
-from typing import List
+import os
+import re
+from typing import AsyncIterator, Dict, FrozenSet, Iterator, List, Optional, Tuple
 
 # Third Party Imports
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 # Package Imports
+from data_api.embeddings.vector_db.query_cache import normalize_question
 from data_api.embeddings.vector_db.vector_search import DatabaseMatch, VectorSearch
+from data_api.embeddings.vector_db.vector_store import SearchFilter
+from data_api.utils.metrics import record_request_value
+from qa_bot.answer_cache import AnswerCache
+from qa_bot.prompt_builder import PromptBuilder
+from qa_bot.request_coalescer import AsyncRequestCoalescer, RequestCoalescer
+
+# Splits an answer into words with their trailing whitespace, for replaying
+REPLAY_CHUNK_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+# (podcast, episode, chapter, start word index, end word index) of each match
+ChapterSet = FrozenSet[Tuple[str, str, str, Optional[int], Optional[int]]]
+
+
+def chapter_set(database_matches: List[DatabaseMatch]) -> ChapterSet:
+    # Identifies the transcript excerpts a set of matches covers
+    return frozenset(
+        (
+            m.podcast_title,
+            m.episode_title,
+            m.chapter_title,
+            m.start_word_index,
+            m.end_word_index,
+        )
+        for m in database_matches
+    )
 
 
 class QABot:
 
     client = OpenAI()
+    async_client = AsyncOpenAI()
     GPT_MODEL = "gpt-4-0125-preview"
     I_DONT_KNOW = "Sorry, the podcasts do not cover this topic."
 
+    # Semantic answer cache settings
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(
+        os.environ.get("ANSWER_CACHE_SIMILARITY_THRESHOLD", 0.95)
+    )
+    ANSWER_CACHE_MAX_SIZE = int(os.environ.get("ANSWER_CACHE_MAX_SIZE", 512))
+
+    # Prompt assembly settings
+    PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 12000))
+    MAX_SCORE_GAP = float(os.environ.get("MAX_SCORE_GAP", 0.1))
+
     def __init__(self):
         self.system_prompt = (
             "You answer the user's questions based on the provided context."
         )
-        self.k = 4
+        # Passages are much shorter than chapters, so more of them fit in the prompt
+        self.k = 8
 
         self.base_prompt = f"""
 		The following is a set of discussions from podcasts that may be helpful in answering a question.
@@ -32,44 +73,214 @@ class QABot:
 
         self.quit_string = "q"
 
+        self.answer_cache = AnswerCache(
+            similarity_threshold=self.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            max_size=self.ANSWER_CACHE_MAX_SIZE,
+        )
+        # Cached answers are dropped when the vector database changes
+        VectorSearch.version_watcher.add_listener(
+            lambda version: self.answer_cache.invalidate()
+        )
+
+        # Identical in-flight questions share one upstream answer
+        self.coalescer = RequestCoalescer()
+        self.async_coalescer = AsyncRequestCoalescer()
+
+        self.prompt_builder = PromptBuilder(
+            instructions=self.base_prompt,
+            token_budget=self.PROMPT_TOKEN_BUDGET,
+            max_score_gap=self.MAX_SCORE_GAP,
+        )
+
     def construct_prompt(
         self, question: str, database_matches: List[DatabaseMatch]
-    ) -> str:
-        return "\n".join(
-            [
-                """
-			{}
-			Podcast Name: {}
-			Episode Title: {}
-			Chapter Title: {}
-			Transcript: 
-			{}
-			""".format(
-                    self.base_prompt,
-                    VectorSearch.podcast_name_to_title[match.podcast_title],
-                    match.episode_title,
-                    match.chapter_title,
-                    match.chapter_transcript,
-                )
-                for match in database_matches
-            ]
-            + [question]
-        )
-
-    def answer_question(self, question: str) -> None:
-        db_matches = VectorSearch.get_topk_matches(question, self.k)
-        return db_matches, self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {
-                    "role": "user",
-                    "content": self.construct_prompt(question, db_matches),
-                },
-            ],
+    ) -> Tuple[str, List[DatabaseMatch]]:
+        """
+        Builds the prompt within the token budget
+
+        returns:
+                A tuple of (the prompt, the matches included in it)
+        """
+        prompt, selected_matches, num_tokens = self.prompt_builder.build(
+            question, database_matches
+        )
+        record_request_value("prompt_tokens", num_tokens)
+        print(
+            "Prompt tokens: {} ({} of {} matches)".format(
+                num_tokens, len(selected_matches), len(database_matches)
+            )
+        )
+        return prompt, selected_matches
+
+    def counters(self) -> Dict[str, float]:
+        """Cache and request coalescing counts, as exported on /metrics"""
+        query_cache_stats = VectorSearch.query_cache.stats()
+        answer_cache_stats = self.answer_cache.stats()
+        coalescer_stats = [self.coalescer.stats(), self.async_coalescer.stats()]
+        return {
+            "query_cache_hits_total": query_cache_stats["hits"],
+            "query_cache_misses_total": query_cache_stats["misses"],
+            "answer_cache_hits_total": answer_cache_stats["hits"],
+            "answer_cache_misses_total": answer_cache_stats["misses"],
+            "answer_cache_near_misses_total": answer_cache_stats["near_misses"],
+            "upstream_requests_total": sum(
+                s["upstream_requests"] for s in coalescer_stats
+            ),
+            "coalesced_requests_total": sum(
+                s["coalesced_requests"] for s in coalescer_stats
+            ),
+        }
+
+    def _completion_messages(self, prompt: str) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _stream_completion(self, prompt: str) -> Iterator[Optional[str]]:
+        response = self.client.chat.completions.create(
+            messages=self._completion_messages(prompt),
+            model=self.GPT_MODEL,
+            temperature=0,
+            stream=True,
+        )
+        for chunk in response:
+            yield chunk.choices[0].delta.content
+
+    async def _stream_completion_async(
+        self, prompt: str
+    ) -> AsyncIterator[Optional[str]]:
+        response = await self.async_client.chat.completions.create(
+            messages=self._completion_messages(prompt),
             model=self.GPT_MODEL,
             temperature=0,
             stream=True,
         )
+        async for chunk in response:
+            yield chunk.choices[0].delta.content
+
+    def _stream_and_cache(
+        self,
+        deltas: Iterator[Optional[str]],
+        embedding: List[float],
+        chapters: ChapterSet,
+    ) -> Iterator[Optional[str]]:
+        answer = []
+        for content in deltas:
+            if content:
+                answer.append(content)
+            yield content
+
+        # Only answers that streamed to completion are cached
+        self.answer_cache.store(embedding, chapters, "".join(answer))
+
+    async def _stream_and_cache_async(
+        self,
+        deltas: AsyncIterator[Optional[str]],
+        embedding: List[float],
+        chapters: ChapterSet,
+    ) -> AsyncIterator[Optional[str]]:
+        answer = []
+        async for content in deltas:
+            if content:
+                answer.append(content)
+            yield content
+
+        self.answer_cache.store(embedding, chapters, "".join(answer))
+
+    @classmethod
+    def _replay(cls, answer: str) -> Iterator[str]:
+        return iter(REPLAY_CHUNK_PATTERN.findall(answer))
+
+    @classmethod
+    async def _replay_async(cls, answer: str) -> AsyncIterator[str]:
+        for content in cls._replay(answer):
+            yield content
+
+    def answer_question(
+        self, question: str, search_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[DatabaseMatch], Iterator[Optional[str]]]:
+        """
+        Answers a question from the podcasts
+
+        params:
+                question:
+                        The question
+                search_filter:
+                        If set, only episodes that match it are used as context
+
+        returns:
+                A tuple of (the chapters used as context, an iterator over the
+                answer text).
+                The answer is streamed from GPT-4, or replayed from the answer cache
+                if a similar question with the same matched chapters was answered
+                before. The iterator may yield None for empty deltas.
+
+                Concurrent requests for the same normalized question and filter
+                share one answer: a request that arrives while it is being streamed
+                first gets every chunk emitted so far, then the rest as they arrive.
+        """
+        return self.coalescer.answer(
+            (normalize_question(question), search_filter),
+            lambda: self._start_answer(question, search_filter),
+        )
+
+    async def answer_question_async(
+        self, question: str, search_filter: Optional[SearchFilter] = None
+    ) -> Tuple[List[DatabaseMatch], AsyncIterator[Optional[str]]]:
+        """
+        Same as answer_question, for use from an event loop. The embeddings call,
+        vector search and completion stream don't block the loop.
+        """
+        return await self.async_coalescer.answer(
+            (normalize_question(question), search_filter),
+            lambda: self._start_answer_async(question, search_filter),
+        )
+
+    def _lookup_answer(
+        self, embedding: List[float], chapters: ChapterSet
+    ) -> Optional[str]:
+        # While the database version is unknown, cached answers might be stale
+        if VectorSearch.version_watcher.version() is None:
+            return None
+
+        return self.answer_cache.lookup(embedding, chapters)
+
+    def _start_answer(
+        self, question: str, search_filter: Optional[SearchFilter]
+    ) -> Tuple[List[DatabaseMatch], Iterator[Optional[str]]]:
+        embedding, db_matches = VectorSearch.get_query_embedding_and_matches(
+            question, self.k, search_filter
+        )
+        prompt, db_matches = self.construct_prompt(question, db_matches)
+        chapters = chapter_set(db_matches)
+
+        cached_answer = self._lookup_answer(embedding, chapters)
+        if cached_answer is not None:
+            return db_matches, self._replay(cached_answer)
+
+        return db_matches, self._stream_and_cache(
+            self._stream_completion(prompt), embedding, chapters
+        )
+
+    async def _start_answer_async(
+        self, question: str, search_filter: Optional[SearchFilter]
+    ) -> Tuple[List[DatabaseMatch], AsyncIterator[Optional[str]]]:
+        embedding, db_matches = (
+            await VectorSearch.get_query_embedding_and_matches_async(
+                question, self.k, search_filter
+            )
+        )
+        prompt, db_matches = self.construct_prompt(question, db_matches)
+        chapters = chapter_set(db_matches)
+
+        cached_answer = self._lookup_answer(embedding, chapters)
+        if cached_answer is not None:
+            return db_matches, self._replay_async(cached_answer)
+
+        return db_matches, self._stream_and_cache_async(
+            self._stream_completion_async(prompt), embedding, chapters
+        )
 
     def answer_questions(self):
         print(
@@ -89,9 +300,7 @@ class QABot:
                 break
 
             _, response = self.answer_question(curr_question)
-            for chunk in response:
-                content = chunk.choices[0].delta.content
+            for content in response:
                 if content:
                     print(content, end="")
-                else:
-                    print("")
+            print("")
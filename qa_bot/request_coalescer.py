@@ -0,0 +1,255 @@
+# System Imports
+import asyncio
+import contextvars
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# Package Imports
+from data_api.utils.metrics import record_request_value
+
+"""
+Single-flight coalescing of identical in-flight questions.
+
+The first request for a key (the leader) starts one upstream answer, which is
+driven to completion by a background thread (or asyncio task) and published to
+an in-flight entry. Every request for the same key that arrives before the
+answer completes, including the leader, reads from that entry: it gets the same
+database matches, then every chunk emitted so far followed by the rest as they
+arrive. The upstream answer is not cancelled when readers disconnect, so it is
+still cached once complete.
+"""
+
+# The database matches and a stream of answer chunks, as returned by QABot
+Answer = Tuple[List[Any], Iterator[Optional[str]]]
+AsyncAnswer = Tuple[List[Any], AsyncIterator[Optional[str]]]
+
+
+class CoalescingStats:
+    """Counts upstream answers and the requests coalesced onto them"""
+
+    def __init__(self):
+        self.upstream_requests = 0
+        self.coalesced_requests = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.upstream_requests + self.coalesced_requests
+        return {
+            "upstream_requests": self.upstream_requests,
+            "coalesced_requests": self.coalesced_requests,
+            "coalesced_rate": self.coalesced_requests / total if total else 0.0,
+        }
+
+
+class InFlightAnswer:
+    """One upstream answer, shared by every request that joined it"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.db_matches: Optional[List[Any]] = None
+        self.chunks: List[Optional[str]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+
+    def publish(self, start: Callable[[], Answer]) -> None:
+        try:
+            db_matches, chunks = start()
+            with self.condition:
+                self.db_matches = db_matches
+                self.condition.notify_all()
+
+            for chunk in chunks:
+                with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+        except Exception as e:
+            with self.condition:
+                self.error = e
+        finally:
+            with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    def wait_for_matches(self) -> List[Any]:
+        with self.condition:
+            self.condition.wait_for(lambda: self.db_matches is not None or self.done)
+            if self.db_matches is None:
+                raise self.error
+
+            return self.db_matches
+
+    def stream(self) -> Iterator[Optional[str]]:
+        # Starts from the first chunk, so late joiners replay what they missed
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.chunks) or self.done)
+                new_chunks = self.chunks[index:]
+                index = len(self.chunks)
+                if not new_chunks and self.error is not None:
+                    raise self.error
+                finished = not new_chunks and self.done
+
+            if finished:
+                return
+
+            yield from new_chunks
+
+
+class RequestCoalescer(CoalescingStats):
+    """Coalesces identical questions across threads (or gevent greenlets)"""
+
+    def __init__(self):
+        super().__init__()
+        self._in_flight: Dict[Hashable, InFlightAnswer] = {}
+        self._lock = threading.Lock()
+
+    def answer(self, key: Hashable, start: Callable[[], Answer]) -> Answer:
+        """
+        params:
+                key:
+                        Requests with equal keys share one upstream answer
+                start:
+                        Starts the upstream answer, called only by the leader
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = InFlightAnswer()
+                self._in_flight[key] = in_flight
+                self.upstream_requests += 1
+                is_leader = True
+            else:
+                self.coalesced_requests += 1
+                is_leader = False
+
+        if is_leader:
+            # The leader's request context goes along, so that its measurements
+            # are recorded (see data_api/utils/metrics.py)
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run,
+                args=(self._run, key, in_flight, start),
+                daemon=True,
+            ).start()
+        else:
+            record_request_value("coalesced", True)
+            print("Coalesced request onto in-flight answer ({})".format(self.stats()))
+
+        return in_flight.wait_for_matches(), in_flight.stream()
+
+    def _run(
+        self, key: Hashable, in_flight: InFlightAnswer, start: Callable[[], Answer]
+    ) -> None:
+        try:
+            in_flight.publish(start)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+
+class AsyncInFlightAnswer:
+    """Same as InFlightAnswer, for use from an event loop"""
+
+    def __init__(self):
+        self.condition = asyncio.Condition()
+        self.db_matches: Optional[List[Any]] = None
+        self.chunks: List[Optional[str]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def publish(self, start: Callable[[], Awaitable[AsyncAnswer]]) -> None:
+        try:
+            db_matches, chunks = await start()
+            async with self.condition:
+                self.db_matches = db_matches
+                self.condition.notify_all()
+
+            async for chunk in chunks:
+                async with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+        except Exception as e:
+            async with self.condition:
+                self.error = e
+        finally:
+            async with self.condition:
+                self.done = True
+                self.condition.notify_all()
+
+    async def wait_for_matches(self) -> List[Any]:
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.db_matches is not None or self.done
+            )
+            if self.db_matches is None:
+                raise self.error
+
+            return self.db_matches
+
+    async def stream(self) -> AsyncIterator[Optional[str]]:
+        index = 0
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(
+                    lambda: index < len(self.chunks) or self.done
+                )
+                new_chunks = self.chunks[index:]
+                index = len(self.chunks)
+                if not new_chunks and self.error is not None:
+                    raise self.error
+                finished = not new_chunks and self.done
+
+            if finished:
+                return
+
+            for chunk in new_chunks:
+                yield chunk
+
+
+class AsyncRequestCoalescer(CoalescingStats):
+    """Coalesces identical questions within one event loop"""
+
+    def __init__(self):
+        super().__init__()
+        self._in_flight: Dict[Hashable, AsyncInFlightAnswer] = {}
+
+    async def answer(
+        self, key: Hashable, start: Callable[[], Awaitable[AsyncAnswer]]
+    ) -> AsyncAnswer:
+        """Same as RequestCoalescer.answer, start returns an awaitable"""
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = AsyncInFlightAnswer()
+            self._in_flight[key] = in_flight
+            self.upstream_requests += 1
+            # The entry keeps a reference to the task so it isn't garbage collected
+            in_flight.task = asyncio.create_task(self._run(key, in_flight, start))
+        else:
+            self.coalesced_requests += 1
+            record_request_value("coalesced", True)
+            print("Coalesced request onto in-flight answer ({})".format(self.stats()))
+
+        return await in_flight.wait_for_matches(), in_flight.stream()
+
+    async def _run(
+        self,
+        key: Hashable,
+        in_flight: AsyncInFlightAnswer,
+        start: Callable[[], Awaitable[AsyncAnswer]],
+    ) -> None:
+        try:
+            await in_flight.publish(start)
+        finally:
+            del self._in_flight[key]
@@ -0,0 +1,157 @@
+# System Imports
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+"""
+Server Sent Events (SSE) sent by the /get endpoint, in order:
+    i_dont_know:
+        The answer string which is expected if the bot can't answer the question
+    chunk:
+        A piece of the answer, sent as it is generated. Consecutive deltas from
+        the model are coalesced into one chunk by SSEWriter.
+    db_matches:
+        The vector DB matches used to answer the question
+"""
+
+SSE_MIMETYPE = "text/event-stream"
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event)}\n\n"
+
+
+def i_dont_know_event(text: str) -> str:
+    return format_event({"type": "i_dont_know", "text": text})
+
+
+def chunk_event(text: str) -> str:
+    return format_event({"type": "chunk", "text": text})
+
+
+def db_matches_event(db_matches: List[Any]) -> str:
+    # db_matches are DatabaseMatch objects. Not imported, so that this module
+    # loads without API clients (see load_test/sse_framing_benchmark.py)
+    return format_event(
+        {"type": "db_matches", "matches": [m.to_dict() for m in db_matches]}
+    )
+
+
+class SSEWriter:
+    """
+    Coalesces the answer deltas streamed by the model into fewer, larger chunk
+    events. Empty deltas are dropped.
+
+    The first non-empty delta is sent immediately, to keep the time to first
+    token low. After that, deltas are buffered until max_delay_seconds have passed
+    since the first buffered delta, or the buffer holds max_bytes of text.
+    """
+
+    def __init__(self, max_delay_seconds: float, max_bytes: int):
+        self.max_delay_seconds = max_delay_seconds
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls) -> "SSEWriter":
+        return cls(
+            max_delay_seconds=float(os.environ.get("SSE_COALESCE_SECONDS", 0.05)),
+            max_bytes=int(os.environ.get("SSE_COALESCE_BYTES", 256)),
+        )
+
+    def coalesce(self, deltas: Iterator[Optional[str]]) -> Iterator[str]:
+        """
+        A blocking iterator can't be interrupted when the delay expires, so the
+        buffer is flushed when the next delta arrives after the delay (or at the
+        end of the answer).
+        """
+        buffer = []
+        buffer_bytes = 0
+        buffer_start = 0.0
+        sent_first = False
+        for content in deltas:
+            if not content:
+                continue
+
+            if not sent_first:
+                sent_first = True
+                yield content
+                continue
+
+            if not buffer:
+                buffer_start = time.monotonic()
+            buffer.append(content)
+            buffer_bytes += len(content.encode("utf-8"))
+
+            if (
+                buffer_bytes >= self.max_bytes
+                or time.monotonic() - buffer_start >= self.max_delay_seconds
+            ):
+                yield "".join(buffer)
+                buffer = []
+                buffer_bytes = 0
+
+        if buffer:
+            yield "".join(buffer)
+
+    async def coalesce_async(
+        self, deltas: AsyncIterator[Optional[str]]
+    ) -> AsyncIterator[str]:
+        """Same as coalesce, but the buffer is flushed as soon as the delay expires"""
+        buffer = []
+        buffer_bytes = 0
+        flush_at = None
+        sent_first = False
+
+        iterator = deltas.__aiter__()
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(iterator.__anext__())
+
+                timeout = (
+                    None if flush_at is None else max(0.0, flush_at - time.monotonic())
+                )
+                done, _ = await asyncio.wait({pending}, timeout=timeout)
+                if not done:
+                    # The delay expired while waiting for the next delta
+                    yield "".join(buffer)
+                    buffer = []
+                    buffer_bytes = 0
+                    flush_at = None
+                    continue
+
+                try:
+                    content = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+
+                if not content:
+                    continue
+
+                if not sent_first:
+                    sent_first = True
+                    yield content
+                    continue
+
+                if not buffer:
+                    flush_at = time.monotonic() + self.max_delay_seconds
+                buffer.append(content)
+                buffer_bytes += len(content.encode("utf-8"))
+
+                if buffer_bytes >= self.max_bytes:
+                    yield "".join(buffer)
+                    buffer = []
+                    buffer_bytes = 0
+                    flush_at = None
+        finally:
+            # Only set if the consumer stopped before the end of the answer
+            if pending is not None:
+                pending.cancel()
+
+        if buffer:
+            yield "".join(buffer)